@@ -0,0 +1,58 @@
+import contextlib
+import io
+import os
+import shutil
+import statistics
+import tempfile
+
+import click
+
+import iot_to_linkml.metrics as mt
+import iot_to_linkml.pipeline as pl
+import iot_to_linkml.sheet2yaml as s2y
+import iot_to_linkml.synthetic as sy
+
+# how much fetching the sheet while MIxS is loaded saves (pipeline.load_inputs), against one after the other
+#   poetry run python -m benchmarks.bench_inputs --delay 0.5 --mixs-slots 2000
+# the Sheets API is the synthetic FakeSheetService, which spends --delay seconds on every request
+# without --cached-mixs, every run parses the MIxS sources from scratch, like the first run after they change
+
+
+@click.command()
+@click.option('--terms', default=5000, show_default=True, help="distinct glossary names")
+@click.option('--mixs-slots', default=2000, show_default=True, help="slots in the synthetic MIxS schema")
+@click.option('--delay', default=0.5, show_default=True, help="seconds per fake Sheets API request")
+@click.option('--cached-mixs', is_flag=True, help="reuse the compiled MIxS index after the first run")
+@click.option('--repeat', default=3, show_default=True, help="runs per mode; the median is reported")
+def main(terms, mixs_slots, delay, cached_mixs, repeat):
+    """Times the inputs phase of becli with and without overlapping the MIxS load and the sheet fetch."""
+    tabs = sy.make_tabs(terms=terms, mixs_slot_count=mixs_slots)
+    with tempfile.TemporaryDirectory() as workdir:
+        mixs_path = sy.write_mixs_schema(os.path.join(workdir, "mixs"), slot_count=mixs_slots)
+        cache_dir = os.path.join(workdir, "cache")
+        results = {}
+        for overlap in [False, True]:
+            runs = []
+            for _ in range(repeat):
+                if not cached_mixs:
+                    shutil.rmtree(cache_dir, ignore_errors=True)
+                session = s2y.SheetSession(revision="rev1", sheet_service=sy.FakeSheetService(tabs, delay=delay))
+                metrics = mt.RunMetrics()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    pl.load_inputs(session, mixs_path, cache_dir, metrics, overlap=overlap)
+                runs.append(metrics.report())
+            results[overlap] = runs
+
+    print(f"{'mode':>12} {'mixs_index':>11} {'sheet_fetch':>12} {'inputs':>8} {'saved':>8}")
+    for overlap, runs in results.items():
+        stage_seconds = {stage: statistics.median(run["stages"][stage]["wall_seconds"] for run in runs)
+                         for stage in ["mixs_index", "sheet_fetch"]}
+        inputs = statistics.median(run["overlaps"]["inputs"]["wall_seconds"] for run in runs)
+        saved = statistics.median(run["overlaps"]["inputs"]["saved_seconds"] for run in runs)
+        mode = "overlapped" if overlap else "sequential"
+        print(f"{mode:>12} {stage_seconds['mixs_index']:>11.3f} {stage_seconds['sheet_fetch']:>12.3f} "
+              f"{inputs:>8.3f} {saved:>8.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+
+import click
+
+import iot_to_linkml.metrics as mt
+import iot_to_linkml.pipeline as pl
+import iot_to_linkml.sheet2yaml as s2y
+import iot_to_linkml.synthetic as sy
+
+# times each stage of make_iot_yaml on synthetic data, served by an in-process fake Sheets service
+#   poetry run python -m benchmarks.bench_stages --compare benchmarks/baseline.json
+# the stages are the ones the pipeline records in its RunMetrics, so the benchmark runs exactly what becli runs
+
+stages = ["mixs_index", "sheet_fetch", "sheet_parse", "package_expansion", "dedup", "glossary_index", "slot_build",
+          "range_pull_in", "yaml_dump"]
+
+
+def time_stages(tabs, mixs_path, engine, workdir):
+    metrics = mt.RunMetrics()
+    session = s2y.SheetSession(sheet_service=sy.FakeSheetService(tabs), revision="synthetic")
+    # make_iot_yaml's progress messages aren't part of the benchmark output
+    with contextlib.redirect_stdout(io.StringIO()):
+        # without overlap, so that mixs_index and sheet_fetch are timed on their own
+        mixs_index, glossary_tab, ct_tab = pl.load_inputs(session, mixs_path, None, metrics, overlap=False)
+        pl.build_iot_yaml(glossary_tab, ct_tab, mixs_index, os.path.join(workdir, "iot.yaml"), engine=engine,
+                          metrics=metrics, dupes_out=os.path.join(workdir, "duplicated_names.tsv"))
+    return {name: stage["wall_seconds"] for name, stage in metrics.stages.items()}
+
+
+def run_benchmark(parameters, engines, repeat):
+    """Median seconds per stage and engine, over repeat runs on the same synthetic data."""
+    tab_parameters = {k: v for k, v in parameters.items() if k != "mixs_enum_count"}
+    with tempfile.TemporaryDirectory() as workdir:
+        mixs_path = sy.write_mixs_schema(os.path.join(workdir, "mixs"), slot_count=parameters["mixs_slot_count"],
+                                         enum_count=parameters["mixs_enum_count"], seed=parameters["seed"])
+        results = {}
+        for engine in engines:
+            runs = []
+            for _ in range(repeat):
+                # every run gets fresh tabs, since package expansion adds to them
+                tabs = sy.make_tabs(**tab_parameters)
+                runs.append(time_stages(tabs, mixs_path, engine, workdir))
+            results[engine] = {name: statistics.median(run[name] for run in runs) for name in stages}
+    return results
+
+
+def compare(results, baseline, tolerance, noise):
+    # returns the lines of the comparison table and whether any stage regressed
+    lines = [f"{'engine':<8} {'stage':<18} {'baseline':>10} {'now':>10} {'ratio':>7}"]
+    regressed = False
+    for engine, timings in results.items():
+        for name, seconds in timings.items():
+            before = baseline.get("results", {}).get(engine, {}).get(name)
+            if before is None:
+                lines.append(f"{engine:<8} {name:<18} {'-':>10} {seconds:>10.4f}")
+                continue
+            ratio = seconds / before if before else float("inf")
+            flag = ""
+            if ratio > tolerance and seconds - before > noise:
+                flag = "  REGRESSION"
+                regressed = True
+            lines.append(f"{engine:<8} {name:<18} {before:>10.4f} {seconds:>10.4f} {ratio:>7.2f}{flag}")
+    return lines, regressed
+
+
+@click.command()
+@click.option('--terms', default=2000, show_default=True, help="distinct glossary names")
+@click.option('--packages', default=15, show_default=True, help="number of packages")
+@click.option('--all-rate', default=0.1, show_default=True, help="share of rows associated with all packages")
+@click.option('--dupe-rate', default=0.02, show_default=True, help="share of names that get a second row")
+@click.option('--ct-rate', default=0.1, show_default=True, help="share of names with a controlled terms column")
+@click.option('--enum-size', default=20, show_default=True, help="values per controlled terms column")
+@click.option('--mixs-rate', default=0.5, show_default=True, help="share of names that are MIxS slots")
+@click.option('--mixs-slots', default=400, show_default=True, help="slots in the synthetic MIxS schema")
+@click.option('--mixs-enums', default=20, show_default=True, help="enums in the synthetic MIxS schema")
+@click.option('--seed', default=0, show_default=True)
+@click.option('--engine', 'engines', multiple=True, default=['pandas', 'records'], show_default=True,
+              type=click.Choice(['pandas', 'records']))
+@click.option('--repeat', default=5, show_default=True, help="runs per engine; the median is reported")
+@click.option('--save', type=click.Path(dir_okay=False), help="write the results here, e.g. to update the baseline")
+@click.option('--compare', 'compare_path', type=click.Path(exists=True, dir_okay=False),
+              help="compare with earlier results, e.g. benchmarks/baseline.json")
+@click.option('--tolerance', default=1.5, show_default=True, help="slowdown ratio that counts as a regression")
+@click.option('--noise', default=0.005, show_default=True, help="slowdowns of fewer seconds than this are ignored")
+def main(terms, packages, all_rate, dupe_rate, ct_rate, enum_size, mixs_rate, mixs_slots, mixs_enums, seed, engines,
+         repeat, save, compare_path, tolerance, noise):
+    """Benchmarks every stage of make_iot_yaml on a synthetic Index of Terms."""
+    parameters = {"terms": terms, "packages": packages, "all_rate": all_rate, "dupe_rate": dupe_rate,
+                  "ct_rate": ct_rate, "enum_size": enum_size, "mixs_rate": mixs_rate, "mixs_slot_count": mixs_slots,
+                  "mixs_enum_count": mixs_enums, "seed": seed}
+    results = run_benchmark(parameters, engines, repeat)
+    report = {"parameters": parameters, "repeat": repeat, "python": platform.python_version(),
+              "platform": platform.platform(), "results": results}
+
+    if compare_path:
+        with open(compare_path) as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline.get("parameters") != parameters:
+            print("warning: the baseline was recorded with different parameters")
+        lines, regressed = compare(results, baseline, tolerance, noise)
+    else:
+        lines, regressed = compare(results, {}, tolerance, noise)
+    print("\n".join(lines))
+
+    if save:
+        with open(save, "w") as save_file:
+            json.dump(report, save_file, indent=2)
+            save_file.write("\n")
+        print(f"wrote {save}")
+    if regressed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
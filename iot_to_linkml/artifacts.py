@@ -0,0 +1,181 @@
+import ast
+import hashlib
+import json
+import os
+import pickle
+from importlib.metadata import version
+
+import yaml
+
+# faster-loading copies of iot.yaml, written next to it from the same made_yaml:
+#   iot.json     compact JSON, in the same key order as the YAML
+#   iot.msgpack  the same, as msgpack (if the msgpack package is installed)
+#   iot.pickle   a linkml_runtime SchemaDefinition, ready for SchemaView(...)
+# and the slots of every package with their inheritance resolved (generate.induce_class_slots),
+#   iot.induced.json, for looking up without SchemaView.induced_slot
+# each carries the sha256 of the YAML it was written with, and the loaders only use an artifact
+#   whose hash matches the YAML that's there now, so a stale artifact can never be read instead of the YAML
+# bump ARTIFACT_FORMAT whenever the content of an artifact changes shape
+
+ARTIFACT_FORMAT = 1
+artifact_extensions = {"json": ".json", "msgpack": ".msgpack", "pickle": ".pickle", "induced": ".induced.json"}
+
+try:
+    from yaml import CSafeLoader as FastLoader
+except ImportError:
+    FastLoader = yaml.SafeLoader
+
+
+def artifact_path(yaml_path, kind):
+    return os.path.splitext(yaml_path)[0] + artifact_extensions[kind]
+
+
+def hash_file(path):
+    with open(path, "rb") as hashed_file:
+        return hashlib.sha256(hashed_file.read()).hexdigest()
+
+
+def pickle_format():
+    # a SchemaDefinition pickled by one linkml-runtime may not unpickle (correctly) with another
+    return f"{ARTIFACT_FORMAT} {version('linkml-runtime')}"
+
+
+def write_atomically(path, content):
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as artifact_file:
+        artifact_file.write(content)
+    os.replace(temp_path, path)
+
+
+def schema_definition_fields(schema):
+    # generate.build_slot writes a MIxS slot's see_also as the text of a Python list, like "['MIXS:0000001']",
+    #   which is what the YAML has to keep, but a SchemaDefinition needs the list itself
+    slots = {}
+    for slot, slot_def in (schema.get('slots') or {}).items():
+        see_also = (slot_def or {}).get('see_also')
+        if isinstance(see_also, str) and see_also.startswith("["):
+            try:
+                slot_def = dict(slot_def, see_also=list(ast.literal_eval(see_also)))
+            except (ValueError, SyntaxError):
+                pass
+        slots[slot] = slot_def
+    return dict(schema, slots=slots) if slots else schema
+
+
+def dump_artifact(made_yaml, yaml_hash, kind):
+    # returns the artifact's bytes, or raises ValueError if made_yaml can't be written as that kind
+    header = {"artifact_format": ARTIFACT_FORMAT, "yaml_sha256": yaml_hash}
+    if kind == "json":
+        return json.dumps(dict(header, schema=made_yaml), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if kind == "msgpack":
+        try:
+            import msgpack
+        except ImportError:
+            raise ValueError("the msgpack package isn't installed")
+        return msgpack.packb(dict(header, schema=made_yaml), use_bin_type=True)
+    from linkml_runtime.linkml_model.meta import SchemaDefinition
+
+    # what yaml_loader.load(yaml_path, SchemaDefinition) would do, from a copy instead of the parsed YAML
+    try:
+        schema_definition = SchemaDefinition(**json.loads(json.dumps(schema_definition_fields(made_yaml))))
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"it isn't a valid SchemaDefinition: {e}")
+    # the header is pickled separately, so a loader can check it without unpickling the schema
+    header["artifact_format"] = pickle_format()
+    return pickle.dumps(header, protocol=pickle.HIGHEST_PROTOCOL) + pickle.dumps(
+        schema_definition, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def write_artifacts(made_yaml, yaml_path, kinds):
+    """Writes the artifacts of the given kinds for the schema that was just written to yaml_path.
+
+    Returns the paths written; kinds that can't be written are reported and skipped."""
+    yaml_hash = hash_file(yaml_path)
+    written = []
+    for kind in kinds:
+        path = artifact_path(yaml_path, kind)
+        try:
+            content = dump_artifact(made_yaml, yaml_hash, kind)
+        except ValueError as e:
+            print(f"Not writing {path}, {e}")
+            continue
+        write_atomically(path, content)
+        written.append(path)
+    return written
+
+
+def read_artifact(yaml_path, kind, yaml_hash):
+    # the artifact's schema, or None if there is no artifact of that kind for this exact YAML
+    path = artifact_path(yaml_path, kind)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "rb") as artifact_file:
+            if kind == "pickle":
+                header = pickle.load(artifact_file)
+                if header.get("artifact_format") != pickle_format() or header.get("yaml_sha256") != yaml_hash:
+                    return None
+                return pickle.load(artifact_file)
+            if kind == "msgpack":
+                try:
+                    import msgpack
+                except ImportError:
+                    return None
+                artifact = msgpack.unpackb(artifact_file.read(), raw=False)
+            else:
+                artifact = json.load(artifact_file)
+    except (pickle.UnpicklingError, EOFError, AttributeError, ImportError, ValueError) as e:
+        print(f"Ignoring unreadable {path}: {e}")
+        return None
+    if artifact.get("artifact_format") != ARTIFACT_FORMAT or artifact.get("yaml_sha256") != yaml_hash:
+        return None
+    return artifact["schema"]
+
+
+def write_induced_slots(induced_classes, yaml_path):
+    path = artifact_path(yaml_path, "induced")
+    artifact = {"artifact_format": ARTIFACT_FORMAT, "yaml_sha256": hash_file(yaml_path), "schema": induced_classes}
+    write_atomically(path, json.dumps(artifact, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+    return path
+
+
+def load_induced_slots(yaml_path):
+    """{class name: {slot name: induced slot}} for the package classes of the generated schema at yaml_path,
+    or None if becli make didn't write them for the YAML that's there now."""
+    return read_artifact(yaml_path, "induced", hash_file(yaml_path))
+
+
+def load_schema_dict(yaml_path, yaml_hash=None):
+    """The generated schema at yaml_path as plain dicts and lists, like yaml.safe_load would give,
+    from its msgpack or JSON artifact if either is up to date, otherwise from the YAML itself.
+
+    Returns the schema and the path it was read from."""
+    if yaml_hash is None:
+        yaml_hash = hash_file(yaml_path)
+    for kind in ["msgpack", "json"]:
+        schema = read_artifact(yaml_path, kind, yaml_hash)
+        if schema is not None:
+            return schema, artifact_path(yaml_path, kind)
+    with open(yaml_path) as yaml_file:
+        return yaml.load(yaml_file, Loader=FastLoader), yaml_path
+
+
+def load_schema_definition(yaml_path):
+    """The generated schema at yaml_path as a linkml_runtime SchemaDefinition,
+    unpickled from its pickle artifact if that's up to date, otherwise built from load_schema_dict.
+
+    Returns the SchemaDefinition and the path it was read from."""
+    yaml_hash = hash_file(yaml_path)
+    schema_definition = read_artifact(yaml_path, "pickle", yaml_hash)
+    if schema_definition is not None:
+        return schema_definition, artifact_path(yaml_path, "pickle")
+    from linkml_runtime.linkml_model.meta import SchemaDefinition
+
+    schema, source_path = load_schema_dict(yaml_path, yaml_hash)
+    return SchemaDefinition(**schema_definition_fields(schema)), source_path
+
+
+def load_schema_view(yaml_path):
+    from linkml_runtime.utils.schemaview import SchemaView
+
+    return SchemaView(load_schema_definition(yaml_path)[0])
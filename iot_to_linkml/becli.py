@@ -1,425 +1,267 @@
-import re
-from io import StringIO
+import importlib.util
+import os
 
 import click
-import numpy as np
-import pandas as pd
-import yaml
-from linkml.generators import yamlgen
-from linkml_runtime.utils.schemaview import SchemaView
 
+# keep the imports at module level light, so that becli --help and option errors don't pay for
+#   pandas, numpy, linkml or the Google client libraries; those are imported by the stages that use them
+import iot_to_linkml.metrics as mt
 import iot_to_linkml.sheet2yaml as s2y
 
-dupe_unresolved_filename = "iot_duplciated_names.tsv"
 
-# TODO review these with other stakeholders
-mixs_uri = "https://gensc.org/mixs/"
-emsl_uri = "https://www.emsl.pnnl.gov/"
-
-hardcoded_prefixes = {"MIXS": mixs_uri, "IoT": emsl_uri}
-
-required_categories = ["sample identification", "required", "required where applicable"]
-recommended_categories = []
-
-
-# def coalesce_package_names(df, orig_col_name,
-#                            repaired_col_name,
-#                            coalesced="coalesced", ):
-#     df[coalesced] = df[repaired_col_name]
-#     df[coalesced].loc[
-#         df[coalesced] == ""
-#         ] = df[orig_col_name].loc[df[coalesced] == ""]
-#     return df
-
-
-@click.command()
-@click.option('--cred', default='google_api_credentials.json', help="path to google_api_credentials.json",
-              type=click.Path(exists=True), show_default=True)
-@click.option('--mixs', default='../mixs-source/model/schema/mixs.yaml', help="path to mixs.yaml and friends",
-              type=click.Path(exists=True), show_default=True)
-@click.option('--yamlout', default='iot.yaml', help="YAML output file name",
-              type=click.Path(), show_default=True)
-@click.option('--idcol', default='Globally Unique ID', help="this column will get unique validation in DH",
-              show_default=True)
-def make_iot_yaml(cred, mixs, yamlout, idcol):
+class DefaultGroup(click.Group):
+    """A group that runs default_command when there are no arguments or the first one is an option,
+    so that `becli --yamlout iot.yaml` still means `becli make --yamlout iot.yaml`.
+
+    `becli --help` is the group's own help, listing the commands, and an unknown command is an error."""
+
+    def __init__(self, *args, default_command=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.default_command = default_command
+
+    def parse_args(self, ctx, args):
+        if not args or (args[0].startswith("-") and args[0] not in ctx.help_option_names):
+            args = [self.default_command] + list(args)
+        return super().parse_args(ctx, args)
+
+
+@click.group(cls=DefaultGroup, default_command="make", context_settings={"help_option_names": ["-h", "--help"]})
+def cli():
+    """Converts the Index of Terms into LinkML."""
+
+
+def check_ontologies(ctx, param, paths):
+    # what ontology_index.read_terms can read, checked before anything slow starts
+    for path in paths:
+        if not path.endswith((".obo", ".json", ".tsv", ".txt")):
+            raise click.BadParameter(f"{path} isn't an .obo, .json or .tsv file")
+    return paths
+
+
+def check_engine(ctx, param, engine):
+    # pandas is an optional extra; find_spec looks for it without importing it
+    if engine == "pandas" and importlib.util.find_spec("pandas") is None:
+        raise click.BadParameter("pandas isn't installed; install it with `poetry install -E pandas`, "
+                                 "or use --engine records, which doesn't need it")
+    return engine
+
+
+def source_options(function):
+    # the options shared by make and watch
+    options = [
+        click.option('--cred', default='google_api_credentials.json', help="path to google_api_credentials.json",
+                     type=click.Path(dir_okay=False), show_default=True),
+        click.option('--mixs', default='../mixs-source/model/schema/mixs.yaml', help="path to mixs.yaml and friends",
+                     type=click.Path(exists=True), show_default=True),
+        click.option('--yamlout', default='iot.yaml', help="YAML output file name",
+                     type=click.Path(), show_default=True),
+        click.option('--idcol', default='Globally Unique ID', help="this column will get unique validation in DH",
+                     show_default=True),
+        click.option('--cache-dir', default='.iot_cache',
+                     help="where to keep snapshots of the Index of Terms tabs and the compiled MIxS index",
+                     type=click.Path(file_okay=False), show_default=True),
+        click.option('--sheet-file', type=click.Path(exists=True, dir_okay=False),
+                     help="read the tabs from this JSON file, {range: {\"values\": rows}}, instead of Google Sheets"),
+        click.option('--workbook', type=click.Path(exists=True, dir_okay=False),
+                     help="read the tabs from this .xlsx or .ods export of the Index of Terms, "
+                          "instead of Google Sheets"),
+        click.option('--incremental', is_flag=True,
+                     help="only rebuild slots whose glossary row, controlled terms or MIxS slot changed "
+                          "since the last run"),
+        click.option('--engine', type=click.Choice(['pandas', 'records']), default='pandas', show_default=True,
+                     callback=check_engine,
+                     help="process the glossary with pandas frames, or as plain records without pandas"),
+        click.option('--intern-enums', is_flag=True,
+                     help="slots whose controlled terms are the same set of values share one enum"),
+        click.option('--artifact', 'artifacts', multiple=True, type=click.Choice(['json', 'msgpack', 'pickle']),
+                     help="also write this faster-loading copy of the YAML next to it; can be repeated"),
+        click.option('--induced-slots', type=click.Choice(['artifact', 'inline']),
+                     help="materialize every package's slots with their is_a inheritance resolved, "
+                          "in a separate .induced.json or inline as each package's slot_usage"),
+        click.option('--self-contained', is_flag=True,
+                     help="also pull in whatever the MIxS classes, slots and enums that are pulled in refer to, "
+                          "so the YAML can be used without MIxS"),
+        click.option('--ontology', 'ontologies', multiple=True, type=click.Path(exists=True, dir_okay=False),
+                     callback=check_ontologies,
+                     help="an .obo, OBO Graphs .json or id/label .tsv file of terms, for the enums of slots with "
+                          "{termLabel} {[termID]} syntax; indexed in --cache-dir; can be repeated"),
+    ]
+    for option in reversed(options):
+        function = option(function)
+    return function
+
+
+def open_session(cred, cache_dir, offline, sheet_file, workbook=None):
+    if sheet_file is not None and workbook is not None:
+        raise click.UsageError("--sheet-file and --workbook can't be used together")
+    if workbook is not None:
+        import iot_to_linkml.workbook as wb
+
+        if not workbook.endswith((".xlsx", ".xlsm", ".ods")):
+            raise click.BadParameter(f"{workbook} isn't an .xlsx or .ods file", param_hint="'--workbook'")
+        print(f"Reading the Index of Terms from {workbook}")
+        return s2y.SheetSession(sheet_id=s2y.local_sheet_id(workbook), cache_dir=cache_dir, offline=offline,
+                                sheet_service=wb.WorkbookSheetService(workbook))
+    if sheet_file is not None:
+        print(f"Reading the Index of Terms from {sheet_file}")
+        return s2y.SheetSession(sheet_id=s2y.local_sheet_id(sheet_file), cache_dir=cache_dir, offline=offline,
+                                sheet_service=s2y.LocalSheetService(sheet_file))
+    if not offline and not os.path.exists(cred):
+        raise click.BadParameter(f"{cred} does not exist", param_hint="'--cred'")
+    if offline:
+        print(f"Working offline from {cache_dir}")
+    else:
+        print(f"Getting credentials from {cred}")
+    return s2y.SheetSession(client_secret_file=cred, cache_dir=cache_dir, offline=offline)
+
+
+@cli.command(name="make")
+@source_options
+@click.option('--offline', is_flag=True, help="build from the snapshots in --cache-dir without contacting Google")
+@click.option('--metrics-out', type=click.Path(dir_okay=False),
+              help="write a JSON report of per-stage time and memory, counts and cache hit rates here")
+@click.option('--profile', 'profile_out', type=click.Path(dir_okay=False),
+              help="profile every stage and write the slowest one's cProfile stats here; implies --sequential-inputs")
+@click.option('--sequential-inputs', is_flag=True,
+              help="load MIxS and then fetch the sheet, instead of both at once; for measuring what the overlap saves")
+def make_iot_yaml(cred, mixs, yamlout, idcol, cache_dir, sheet_file, workbook, incremental, engine, intern_enums,
+                  artifacts, induced_slots, self_contained, ontologies, offline, metrics_out, profile_out,
+                  sequential_inputs):
     """Command line wrapper for converting the Index of Terms into LinkML,
-    for subsequent conversion into a DataHarmonizer template."""
-
-    mixs_view = SchemaView(mixs)
-    mixs_slotnames = list(mixs_view.all_slots().keys())
-    mixs_slotnames.sort()
-
-    mixs_classnames = list(mixs_view.all_classes().keys())
-    mixs_classnames.sort()
-
-    mixs_parent_classes = set()
-
-    iot_parent_slots = set()
-
-    # especially interested in those with mixins but not subclasses of anything else?
-    # can also get packages from some enum?
-    # mixs_view.all_enums()
-    for one_mc in mixs_classnames:
-        current_class = mixs_view.get_class(one_mc)
-        current_parent = current_class.is_a
-        if current_parent is not None:
-            mixs_parent_classes.add(current_parent)
-
-    mixs_parent_classes = list(mixs_parent_classes)
-    mixs_parent_classes.sort()
-
-    print(f"Getting credentials from {cred}")
-
-    ctf = s2y.get_iot_controlled_terms_frame()
-    ct_dol = s2y.get_ct_dol(ctf)
-    ct_keys = s2y.get_ct_keys(ct_dol)
-
-    my_iot_glossary_frame = s2y.get_iot_glossary_frame(client_secret_file="google_api_credentials.json")
-
-    # # TIDY UP SLOT NAMES AND RECONCILE WITH MIXS (PREFERRING MIXS)
-    # # SHOULD USE coalesced FROM HERE ON OUT
-    # # replace leading ?s in slot names with Q
-    # # apply any other name tidying?
-    # my_iot_glossary_frame['no_quest'] = my_iot_glossary_frame['name'].str.replace(r'^\?+', 'Q', regex=True)
-    # my_iot_glossary_frame = coalesce_package_names(my_iot_glossary_frame, "no_quest", "mixs_6_slot_name", "coalesced")
-
-    # CONVERT PACKAGE "LIST" string, INCLUDING "all" ALIAS
-    # TO REAL LISTS
-    # CHECK FOR DUPLICATE NAMES AFTER THAT
-    # AND THEN EXPLODE FOR UNIQUE SLOT NAME/PACKAGE ROWS
-    iot_packages = list(my_iot_glossary_frame['Associated Packages'].unique())
-    iot_packages = [i for i in iot_packages if i not in ['all', '', None]]
-    iot_packages = [re.split('; *', i) for i in iot_packages]
-    iot_packages = [item for sublist in iot_packages for item in sublist]
-    iot_packages = list(set(iot_packages))
-    iot_packages.sort()
-    all_packages_str = '; '.join(iot_packages)
-    my_iot_glossary_frame['explicit_packs'] = my_iot_glossary_frame['Associated Packages']
-    my_iot_glossary_frame['explicit_packs'].loc[
-        my_iot_glossary_frame['Associated Packages'].eq('all')] = all_packages_str
-    my_iot_glossary_frame['packlist'] = my_iot_glossary_frame['explicit_packs'].str.split(pat='; *')
-
-    # are there any rows that share names?
-    dupe_search = my_iot_glossary_frame['name'].value_counts()
-    dupe_yes = dupe_search.loc[dupe_search > 1]
-    dupe_yes_slots = dupe_yes.index
-    dupe_yes_frame = my_iot_glossary_frame.loc[my_iot_glossary_frame['name'].isin(dupe_yes_slots)]
-    dupe_no_frame = my_iot_glossary_frame.loc[~ my_iot_glossary_frame['name'].isin(dupe_yes_slots)]
-    dupe_unresolved_frame = pd.DataFrame(columns=dupe_no_frame.columns)
-    # working agreement with Montana:
-    #   if there are two rows with the same name, use the one with the larger number of packages
-    #   if that is inclusive of the other row
-    #   no attributes from the discarded row will be propagated
-
-    # FOLLOWING CODE prints a report to the screen and saves dataframe dupe_unresolved_frame,
-    #   which can be used to update or delete rows
-    # could also use slot_usages to customize per-class (package) slot usage
-    print("\n")
-    dysl = list(dupe_yes_slots)
-    dysl.sort()
-    for i in dysl:
-        print(f"{i} defined on more than one row.")
-        per_slot_frame = dupe_yes_frame.loc[dupe_yes_frame['name'].eq(i)]
-        dupe_unresolved_frame = dupe_unresolved_frame.append(per_slot_frame)
-        dupe_row_count = len(per_slot_frame.index)
-        if dupe_row_count > 2:
-            print("Actually defined on two or more rows! Discarding.")
-            break
-        packlists = list(per_slot_frame["packlist"])
-        pl0 = packlists[0]
-        pl0_len = len(pl0)
-        pl1 = packlists[1]
-        pl1_len = len(pl1)
-        pl0_only = set(pl0) - set(pl0)
-        pl1_only = set(pl1) - set(pl0)
-        if pl0_len > pl1_len:
-            print("Row 0 has more packages")
-            pl1_only = set(pl1) - set(pl0)
-            if len(pl1_only) > 0:
-                print(f"But discarding because only row 1 contains {pl1_only}")
-            else:
-                print("and includes all row 1 packages")
-                temp = per_slot_frame.iloc[[0]]
-                dupe_no_frame = dupe_no_frame.append(temp)
-        elif pl0_len < pl1_len:
-            print("Row 1 has more packages")
-            if len(pl0_only) > 0:
-                print(f"But discarding because only row 0 contains {pl0_only}")
-            else:
-                print("and includes all row 0 packages")
-                temp = per_slot_frame.iloc[[1]]
-                dupe_no_frame = dupe_no_frame.append(temp)
-        elif pl0_len == pl1_len == 0:
-            print("Both rows have 0 packages")
-        else:
-            print("Both rows have the same, non-zero number of packages")
-            if len(pl0_only) > 0:
-                print(f"but only row 0 contains packages: {pl0_only}")
-            elif len(pl1_only) > 0:
-                print(f"but only row 1 contains packages: {pl1_only}")
-            else:
-                print("and both rows contain the same packages")
-                temp = per_slot_frame.iloc[[0]]
-                dupe_no_frame = dupe_no_frame.append(temp)
-        print("\n")
-    dupe_unresolved_frame.to_csv(dupe_unresolved_filename, index=False, sep="\t")
-
-    # DUPLICATE SLOT NAME/PACKAGE ROWS HAVE BEEN RESOLVED, SO NOW EXPLODE
-    iot_glossary_exploded = dupe_no_frame.explode('packlist')
-
-    made_yaml = s2y.initialize_yaml()
-
-    # create YAML that says which slots go with which packages
-    # we are looping over the IoT slots
-    # and what are we gathering in all_used_iot_slots?
-    collected_classes = {}
-    all_used_iot_slots = set()
-    for package in iot_packages:
-        package_details_row = iot_glossary_exploded.loc[iot_glossary_exploded['packlist'].eq(package)]
-        pack_slots = []
-        # slot_usages = {}
-        sorted_packages = list(package_details_row['name'])
-        sorted_packages.sort()
-        for slot in sorted_packages:
-            pack_slots.append(slot)
-            all_used_iot_slots.add(slot)
-        collected_classes[package] = {'slots': pack_slots}
-
-    made_yaml['classes'] = collected_classes
-    # how is this different from the mixs slot list or the IoT slot list?
-    all_used_iot_slots = list(all_used_iot_slots)
-    all_used_iot_slots.sort()
-
-    enums = {}
-
-    model_slots = {}
-    ranges = []
-    for slot in all_used_iot_slots:
-        model_slots[slot] = {}
-        slot_details = dupe_no_frame.loc[dupe_no_frame['name'].eq(slot)].to_dict(orient="records")
-        if len(slot_details) == 1:
-            sd_row = slot_details[0]
-        annotations = []
-
-        if slot in mixs_slotnames:
-            # when to take value as is
-            #   when to explicitly cast to str
-            #   when to iterate?
-            mixs_slot_def = mixs_view.get_slot(slot)
-            model_slots[slot]['comments'] = []
-            for one_comment in mixs_slot_def.comments:
-                model_slots[slot]['comments'].append(str(one_comment))
-            model_slots[slot]['conforms_to'] = mixs_uri
-            model_slots[slot]['description'] = str(mixs_slot_def.description)
-            model_slots[slot]['examples'] = []
-            for one_example in mixs_slot_def.examples:
-                temp = {"value": str(one_example['value'])}
-                model_slots[slot]['examples'].append(temp)
-            model_slots[slot]['notes'] = mixs_slot_def.notes
-
-            mrq = mixs_slot_def.required
-            mrc = mixs_slot_def.recommended
-            irq = sd_row['Category'] in required_categories
-            irc = sd_row['Category'] in recommended_categories
-
-            if mrq or irq:
-                # model_slots[slot]["is_a"] = "required"
-                # iot_parent_slots.add("required")
-                model_slots[slot]['required'] = True
-            elif mrc or irc:
-                # model_slots[slot]["is_a"] = "required where applicable"
-                # iot_parent_slots.add("required where applicable")
-                model_slots[slot]['recommended'] = True
-            else:
-                pass
-                # model_slots[slot]["is_a"] = "optional"
-                # iot_parent_slots.add("optional")
-
-            model_slots[slot]["is_a"] = sd_row['Category']
-            iot_parent_slots.add(sd_row['Category'])
-
-            # don't assert a range that isn't already defined as an element
-            # some ranges will be enums
-            # does IoT overwrite them?
-            model_slots[slot]['range'] = str(mixs_slot_def.range)
-            current_range = str(mixs_slot_def.range)
-            ranges.append(current_range)
-
-            model_slots[slot]['slot_uri'] = str(mixs_slot_def.slot_uri)
-            model_slots[slot]['see_also'] = str(mixs_slot_def.see_also)
-            model_slots[slot]['title'] = str(mixs_slot_def.title)
-            model_slots[slot]['pattern'] = str(mixs_slot_def.pattern)
-            model_slots[slot]['multivalued'] = str(mixs_slot_def.multivalued)
-
-        else:
-            if len(slot_details) == 1:
-                if sd_row['Category'] in required_categories:
-                    model_slots[slot]['required'] = True
-                elif sd_row['Category'] in recommended_categories:
-                    model_slots[slot]['recommended'] = True
-                else:
-                    pass
-
-                if sd_row['Category'] != "" and sd_row['Category'] is not None:
-                    model_slots[slot]["is_a"] = sd_row['Category']
-                    # iot_parent_slots.add(sd_row['Category'])
-                else:
-                    pass
-                    # model_slots[slot]["is_a"] = "other"
-                    # iot_parent_slots.add("other")
-
-                if sd_row['Notes'] != "":
-                    model_slots[slot]['notes'] = sd_row['Notes']
-                if sd_row['Origin'] == "EMSL":
-                    model_slots[slot]['conforms_to'] = emsl_uri
-                if sd_row['syntax'] != "":
-                    model_slots[slot]['pattern'] = sd_row['syntax']
-                model_slots[slot]['description'] = sd_row['Definition']
-                model_slots[slot]['slot_uri'] = "IoT:" + slot
-
-        # what if len(slot_details) != 1 ???
-        if len(slot_details) == 1:
-            # allow IoT "Column Header" to override title
-            if sd_row['Column Header'] != "" and sd_row['Column Header'] is not None:
-                # temp = {"local_name_source": "IoT", "local_name_value": sd_row['Column Header']}
-                # model_slots[slot]['local_names'] = temp
-                # print(model_slots[slot])
-                if 'alias' in model_slots[slot]:
-                    print('alias')
-                    # print(model_slots[slot]['alias'])
-                if 'aliases' in model_slots[slot]:
-                    print('aliases')
-                    # print(model_slots[slot]['aliases'])
-                if 'local_names' in model_slots[slot]:
-                    print('local names')
-                    # print(model_slots[slot]['local_names'])
-                if "title" in list(model_slots[slot].keys()):
-                    prev = model_slots[slot]['title']
-                    if prev != sd_row['Column Header']:
-                        annotations.append({"overwritten_title": prev})
-                        # todo make it an alias
-                model_slots[slot]['title'] = sd_row['Column Header']
-            # might not even make it into DH so don't overwrite
-            if sd_row['GitHub Ticket'] != "" and sd_row['GitHub Ticket'] is not None:
-                annotations.append({"ticket": sd_row['GitHub Ticket']})
-            # allow IoT "Guidance" to override comments
-            if sd_row['Guidance'] != "" and sd_row['Guidance'] is not None:
-                if "comments" in list(model_slots[slot].keys()):
-                    prev = model_slots[slot]['comments']
-                    prev = "|".join(prev)
-                    # hard to believe that IoT Guidance will even match the previous comments
-                    #   not checking for opportunities to omit a useless annotation
-                    annotations.append({"overwritten_comments": prev})
-                model_slots[slot]['comments'] = sd_row['Guidance']
-                # annotations.append({"Guidance": sd_row['Guidance']})
-
-            # if sd_row['name'] != '' and sd_row['mixs_6_slot_name'] != '' and sd_row['name'] != sd_row[
-            #     'mixs_6_slot_name']:
-            #     if "aliases" in list(model_slots[slot].keys()):
-            #         prev = model_slots[slot]['aliases']
-            #         prev = "|".join(prev)
-            #         # not checking for opportunities to omit a useless annotation
-            #         annotations.append({"overwritten_aliases": prev})
-            #     model_slots[slot]['aliases'] = sd_row['name']
-            #     # model_slots[slot]['aliases'] = sd_row['name']
-
-            if sd_row["Column Header"] == idcol:
-                # # print(f"{sd_row['Column Header']} is the unique ID col")
-                # annotations.append({"unique_id": True})
-                model_slots[slot]['identifier'] = True
-
-        model_slots[slot]['annotations'] = annotations
-
-        # process enums
-        # identify and uniqify enums with duplicate permitted values
-        if slot in ct_keys:
-            current_pvs = ct_dol[slot]
-            current_pvs.sort()
-            values, counts = np.unique(current_pvs, return_counts=True)
-            any_over = any(guilty for guilty in counts if guilty > 1)
-            if any_over:
-                print(f"{slot} has duplicated enumerated values")
-                unique_count = len(counts)
-                for current_index in range(unique_count):
-                    if counts[current_index] > 1:
-                        print("  " + values[current_index])
-            enum_name = slot + "_enum"
-            model_slots[slot]['range'] = enum_name
-            current_pvs_set = list(set(current_pvs))
-            enums[enum_name] = {"permissible_values": current_pvs_set}
-    print("\n")
-
-    made_yaml['slots'] = model_slots
-    made_yaml['enums'] = enums
-
-    made_yaml_enums = list(made_yaml['enums'].keys())
-    made_yaml_enums.sort()
-
-    ranges = list(set(ranges))
-    ranges.sort()
-    for one_range in ranges:
-        type_attempt = mixs_view.get_type(one_range)
-        class_attempt = mixs_view.get_class(one_range)
-        mixs_enum_attempt = mixs_view.get_enum(one_range)
-        mixs_enum_finding = mixs_enum_attempt is not None
-        iot_enum_finding = one_range in made_yaml_enums
-        if mixs_enum_finding:
-            # both
-            if iot_enum_finding:
-                pass
-            # mixs only
-            else:
-                print(f"{one_range} only defined in MIxS")
-                yaml_string = yamlgen.as_yaml(mixs_enum_attempt)
-                s = StringIO(yaml_string)
-                loaded_yaml = yaml.safe_load(s)
-                made_yaml['enums'][one_range] = loaded_yaml
-        else:
-            # iot only
-            if iot_enum_finding:
-                pass
-            # neither !?
-            else:
-                pass
-
-        if type_attempt is not None:
-            # yaml_string = yamlgen.as_yaml(type_attempt)
-            # s = StringIO(yaml_string)
-            # loaded_yaml = yaml.safe_load(s)
-            # # assume all types are from linkml anyway?
-            # made_yaml['types'][one_range] = loaded_yaml
-            pass
-        if class_attempt is not None:
-            yaml_string = yamlgen.as_yaml(class_attempt)
-            s = StringIO(yaml_string)
-            loaded_yaml = yaml.safe_load(s)
-            made_yaml['classes'][one_range] = loaded_yaml
-
-    print("\n")
-
-    # use slot usage in cases where a slot name appears on two rows,
-    #   with completely different packages on the two rows?
-    # made_yaml['classes']['soil']['slot_usage'] = {"samp_name": {'required': True, 'aliases': ['specimen moniker 2']}}
-
-    for k, v in hardcoded_prefixes.items():
-        print(f"expanding prefix {k} as {v}")
-        made_yaml['prefixes'][k] = v
-    print("\n")
-
-    # iot_parent_slots = list(iot_parent_slots)
-
-    iot_parent_slots = list(set(list(my_iot_glossary_frame['Category'])))
-    iot_parent_slots = [slot for slot in iot_parent_slots if slot != "" and slot is not None]
-
-    iot_parent_slots.sort()
-    print("parent slots:")
-    for one_parent in iot_parent_slots:
-        print(f"  {one_parent}")
-        made_yaml['slots'][one_parent] = {}
-
-    with open(yamlout, 'w') as outfile:
-        yaml.dump(made_yaml, outfile, default_flow_style=False, sort_keys=False)
+    for subsequent conversion into a DataHarmonizer template.
+
+    This is what plain `becli` runs; see `becli watch --help` for regenerating whenever the sheet changes."""
+
+    session = open_session(cred, cache_dir, offline, sheet_file, workbook)
+
+    import iot_to_linkml.pipeline as pl
+
+    # tracemalloc slows everything down, so memory is only traced for a metrics report
+    metrics = mt.RunMetrics(memory=metrics_out is not None, profile=profile_out is not None)
+    metrics.start()
+
+    # a stage in another thread can't be profiled alongside the main thread's, so profiling loads the inputs in turn
+    sequential_inputs = sequential_inputs or profile_out is not None
+    mixs_index, glossary_tab, ct_tab = pl.load_inputs(session, mixs, cache_dir, metrics, overlap=not sequential_inputs)
+
+    written = pl.build_iot_yaml(glossary_tab, ct_tab, mixs_index, yamlout, idcol=idcol, cache_dir=cache_dir,
+                                incremental=incremental, engine=engine, metrics=metrics,
+                                intern_enums=intern_enums, artifacts=artifacts, induced_slots=induced_slots,
+                                self_contained=self_contained, ontologies=ontologies)
+    metrics.stop()
+
+    if profile_out is not None:
+        profiled_stage = metrics.dump_profile(profile_out)
+        print(f"wrote the profile of the slowest stage, {profiled_stage}, to {profile_out}")
+    if metrics_out is not None:
+        metrics.cache("sheet_snapshots", session.snapshot_hits, session.snapshot_misses)
+        metrics.cache("mixs_index", int(mixs_index.from_cache), int(not mixs_index.from_cache))
+        metrics.mixs_lookups = mixs_index.lookups
+        metrics.write(metrics_out, engine=engine, offline=offline, incremental=incremental,
+                      intern_enums=intern_enums, sequential_inputs=sequential_inputs, output_written=written)
+        print(f"wrote metrics to {metrics_out}")
+
+
+@cli.command()
+@source_options
+@click.option('--interval', default=60.0, show_default=True, help="seconds between checks for changes")
+@click.option('--debounce', default=10.0, show_default=True,
+              help="seconds a change has to stay unchanged before iot.yaml is regenerated")
+def watch(cred, mixs, yamlout, idcol, cache_dir, sheet_file, workbook, incremental, engine, intern_enums,
+          artifacts, induced_slots, self_contained, ontologies, interval, debounce):
+    """Keeps running, and regenerates the YAML whenever the spreadsheet's revision or the MIxS sources change.
+
+    Credentials, the Sheets client and the MIxS index are set up once, instead of on every run."""
+    import iot_to_linkml.watch as wa
+
+    session = open_session(cred, cache_dir, False, sheet_file, workbook)
+    watcher = wa.Watcher(session, mixs, yamlout, idcol=idcol, cache_dir=cache_dir, incremental=incremental,
+                         engine=engine, intern_enums=intern_enums,
+                         artifacts=artifacts, induced_slots=induced_slots, self_contained=self_contained,
+                         ontologies=ontologies, debounce=debounce)
+    watcher.run(interval)
+
+
+@cli.command()
+@source_options
+@click.option('--host', default='127.0.0.1', show_default=True, help="address to listen on")
+@click.option('--port', default=8000, show_default=True, help="port to listen on")
+@click.option('--cache-size', default=4, show_default=True, type=click.IntRange(min=1),
+              help="generated schemas to keep, one per spreadsheet revision and MIxS version")
+@click.option('--check-interval', default=30.0, show_default=True,
+              help="seconds between checks of the spreadsheet's revision and the MIxS sources")
+def serve(cred, mixs, yamlout, idcol, cache_dir, sheet_file, workbook, incremental, engine, intern_enums,
+          artifacts, induced_slots, self_contained, ontologies, host, port, cache_size, check_interval):
+    """Serves the generated schema over HTTP, from a cache keyed on the spreadsheet revision and MIxS sources.
+
+    GET /schema.yaml, /schema.json, /classes/<package>.yaml, /classes/<package>.json or /status.
+    --yamlout isn't used; the schemas are built in --cache-dir."""
+    import iot_to_linkml.serve as sv
+
+    session = open_session(cred, cache_dir, False, sheet_file, workbook)
+    service = sv.SchemaService(session, mixs, cache_dir=cache_dir, cache_size=cache_size,
+                               check_interval=check_interval, idcol=idcol, incremental=incremental, engine=engine,
+                               intern_enums=intern_enums, artifacts=artifacts,
+                               induced_slots=induced_slots, self_contained=self_contained, ontologies=ontologies)
+    server = sv.make_server(service, host, port)
+    print(f"Serving the schema on http://{host}:{server.server_port}/schema.yaml, stop with Ctrl-C")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+@cli.command()
+@click.option('--yamlout', default='iot.yaml', help="the schema becli make wrote",
+              type=click.Path(exists=True, dir_okay=False), show_default=True)
+@click.option('--out-dir', default='templates', help="writes <package>/data.tsv in here",
+              type=click.Path(file_okay=False), show_default=True)
+@click.option('--package', 'packages', multiple=True, help="only export this package; can be repeated")
+@click.option('--workers', default=4, show_default=True, type=click.IntRange(min=1),
+              help="write this many templates at once")
+def templates(yamlout, out_dir, packages, workers):
+    """Writes a DataHarmonizer data.tsv template for every package in the generated schema."""
+    import iot_to_linkml.dh_export as dh
+
+    try:
+        paths = dh.export_templates(yamlout, out_dir, packages=list(packages), workers=workers)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="'--package'")
+    for path in paths:
+        print(f"wrote {path}")
+
+
+@cli.command()
+@click.argument('submission', type=click.Path(exists=True, dir_okay=False))
+@click.option('--yamlout', default='iot.yaml', help="the schema becli make wrote",
+              type=click.Path(exists=True, dir_okay=False), show_default=True)
+@click.option('--package', help="also require the columns of this package's required slots")
+@click.option('--chunk-size', default=10000, show_default=True, type=click.IntRange(min=1),
+              help="rows read and checked at a time")
+@click.option('--max-errors', default=100, show_default=True, help="invalid values to list; all are counted")
+@click.option('--ontology', 'ontologies', multiple=True, type=click.Path(exists=True, dir_okay=False),
+              callback=check_ontologies,
+              help="also check that {termLabel} {[termID]} values are terms in this .obo, .json or .tsv file, "
+                   "with the right label; can be repeated")
+@click.option('--cache-dir', default='.iot_cache', help="where the ontology index is kept",
+              type=click.Path(file_okay=False), show_default=True)
+def validate(submission, yamlout, package, chunk_size, max_errors, ontologies, cache_dir):
+    """Checks a sample metadata TSV, with a slot name for each column header, against the generated schema.
+
+    Exits with status 1 if anything is invalid."""
+    import iot_to_linkml.validate as va
+
+    try:
+        report = va.validate_file(yamlout, submission, package=package, chunk_size=chunk_size, max_errors=max_errors,
+                                  ontologies=ontologies, cache_dir=cache_dir)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="'--package'")
+    print(report.summary())
+    if not report.valid:
+        raise SystemExit(1)
 
 
 if __name__ == '__main__':
-    make_iot_yaml()
+    cli()
@@ -0,0 +1,145 @@
+import csv
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import iot_to_linkml.artifacts as art
+
+# DataHarmonizer data.tsv templates, one per package, from the schema that becli make writes
+#   (this replaces the commented out sheet2yaml.template_package, which scanned the glossary frame
+#   once per slot of every package)
+# every slot's template row and its enum's rows are rendered once, in a single pass over the schema,
+#   and each package's template is then just those pre-rendered lines in the package's slot order,
+#   so exporting every package costs little more than exporting one
+
+template_columns = ["Ontology ID", "parent class", "label", "datatype", "source", "data status", "requirement",
+                    "min value", "max value", "capitalize", "pattern", "description", "guidance", "examples"]
+template_filename = "data.tsv"
+
+# IoT syntax -> DataHarmonizer datatype; everything else is xs:token
+# day resolution may not be specific enough for {timestamp}
+#   and {integer} doesn't actually = xs:nonNegativeInteger
+syntax_datatypes = {"{timestamp}": "xs:date", "{float}": "xs:decimal", "{value}": "xs:decimal",
+                    "{integer}": "xs:nonNegativeInteger"}
+syntax_patterns = {"{float} {unit}": r"^[+-]?([0-9]*[.])?[0-9]+ \S+$"}
+
+
+def load_schema(path):
+    # from the JSON or msgpack artifact, if becli make wrote one and it's up to date
+    return art.load_schema_dict(path)[0]
+
+
+def cell_text(value):
+    # the generator writes some MIxS values through str(), so a missing one can be the string "None"
+    if value is None or value == "None":
+        return ""
+    if isinstance(value, list):
+        return "|".join(str(one_value) for one_value in value)
+    return str(value)
+
+
+def render_row(row):
+    # quoted like pandas' to_csv(sep="\t") did in template_package
+    line = io.StringIO()
+    writer = csv.writer(line, delimiter="\t", lineterminator="\n")
+    writer.writerow([row.get(column, "") for column in template_columns])
+    return line.getvalue()
+
+
+def permissible_values(enum):
+    values = enum.get('permissible_values') or []
+    # the generator writes a list, MIxS enums pulled in from the source schema have a mapping;
+    #   list() gives the values either way
+    return list(values)
+
+
+def slot_row(slot, slot_def, select):
+    syntax = cell_text(slot_def.get('pattern'))
+    row = {"parent class": cell_text(slot_def.get('is_a')), "label": slot,
+           "datatype": syntax_datatypes.get(syntax, "xs:token"),
+           "pattern": syntax_patterns.get(syntax, ""),
+           "description": cell_text(slot_def.get('title')),
+           "guidance": cell_text(slot_def.get('comments')),
+           "examples": syntax}
+    if slot_def.get('identifier'):
+        row["datatype"] = "xs:unique"
+    if slot_def.get('required'):
+        row["requirement"] = "required"
+    if select:
+        row["datatype"] = "select"
+    return row
+
+
+def is_package(class_def):
+    # the generator writes each package as a class with just its slots;
+    #   the classes pulled in from MIxS as slot ranges have an is_a or a from_schema
+    return 'is_a' not in class_def and 'from_schema' not in class_def
+
+
+class TemplateIndex:
+    """Every slot's DataHarmonizer rows, rendered once from a generated schema.
+
+    slot_lines maps each slot name to its own row, and enum_lines to the rows of its enum's values
+    (as the slot's children), so a package template only joins the lines of the slots it uses."""
+
+    def __init__(self, schema):
+        self.enums = schema.get('enums') or {}
+        self.packages = {name: list(class_def.get('slots') or []) for name, class_def in
+                         (schema.get('classes') or {}).items() if is_package(class_def or {})}
+        self.slot_sections = {}
+        self.slot_lines = {}
+        self.enum_lines = {}
+        # rendered once per enum, however many slots use it
+        enum_values = {}
+        for slot, slot_def in (schema.get('slots') or {}).items():
+            slot_def = slot_def or {}
+            enum_name = slot_def.get('range')
+            select = enum_name in self.enums
+            row = slot_row(slot, slot_def, select)
+            self.slot_sections[slot] = row["parent class"]
+            self.slot_lines[slot] = render_row(row)
+            if select:
+                if enum_name not in enum_values:
+                    enum_values[enum_name] = sorted(permissible_values(self.enums[enum_name] or {}))
+                self.enum_lines[slot] = "".join(render_row({"parent class": slot, "label": value})
+                                                for value in enum_values[enum_name])
+
+    def template(self, package):
+        """The data.tsv text for one package: its sections, then its slots, then their enums' values."""
+        package_slots = [slot for slot in self.packages[package] if slot in self.slot_lines]
+        sections = sorted({self.slot_sections[slot] for slot in package_slots} - {""})
+        parts = [render_row(dict(zip(template_columns, template_columns)))]
+        parts.extend(render_row({"label": section}) for section in sections)
+        parts.extend(self.slot_lines[slot] for slot in package_slots)
+        parts.extend(self.enum_lines[slot] for slot in package_slots if slot in self.enum_lines)
+        return "".join(parts)
+
+
+def template_dirname(package):
+    # keep package names that don't make good directory names out of the path
+    return package.replace(os.sep, "_").replace(" ", "_")
+
+
+def write_template(template_index, package, out_dir):
+    directory = os.path.join(out_dir, template_dirname(package))
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, template_filename)
+    with open(path, "w", newline="") as template_file:
+        template_file.write(template_index.template(package))
+    return path
+
+
+def export_templates(schema_path, out_dir, packages=None, workers=4):
+    """Writes out_dir/<package>/data.tsv for every package class in the schema at schema_path,
+    or just the named packages.
+
+    Returns the paths written, in package order."""
+    template_index = TemplateIndex(load_schema(schema_path))
+    if not packages:
+        packages = list(template_index.packages)
+    unknown = [package for package in packages if package not in template_index.packages]
+    if unknown:
+        raise ValueError(f"not packages in {schema_path}: {', '.join(unknown)}")
+    # writing is I/O, so threads are enough
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(lambda package: write_template(template_index, package, out_dir), packages))
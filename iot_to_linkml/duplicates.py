@@ -0,0 +1,130 @@
+import csv
+from functools import reduce
+from operator import or_
+
+import iot_to_linkml.glossary as gl
+
+# working agreement with Montana:
+#   if several rows share a name, use the one with the largest set of packages,
+#   provided that set includes every package from the other rows
+#   no attributes from the discarded rows will be propagated
+# otherwise, all of the rows are discarded and reported as unresolved
+# the package sets are glossary.PackageMembership masks, so "includes every package" is missing == 0,
+#   with missing = union of the group's masks & ~ the candidate's mask
+
+
+def resolve_duplicate_names(glossary_frame, name_col='name', packlist_col='packlist', mask_col='packmask',
+                            membership=None):
+    """Resolves every group of rows that share a name in one pass.
+
+    The rows' packages are the PackageMembership masks in mask_col, or else the lists in packlist_col.
+    Returns the deduplicated frame, the frame of rows from unresolved groups
+    and a report with one dict per duplicated name, sorted by name."""
+    import pandas as pd
+
+    if membership is None:
+        membership = gl.PackageMembership([])
+
+    name_counts = glossary_frame[name_col].map(glossary_frame[name_col].value_counts())
+    is_dupe = name_counts > 1
+    dupe_frame = glossary_frame.loc[is_dupe]
+    dupe_no_frame = glossary_frame.loc[~is_dupe]
+    if dupe_frame.empty:
+        return dupe_no_frame, dupe_frame, []
+
+    names = dupe_frame[name_col]
+    if mask_col in dupe_frame.columns:
+        pack_masks = dupe_frame[mask_col]
+    else:
+        pack_masks = pd.Series([membership.mask(packlist) for packlist in dupe_frame[packlist_col]],
+                               index=dupe_frame.index, dtype=object)
+    grouped_masks = pack_masks.groupby(names, sort=True)
+    # the first row with the most packages is the candidate for each name
+    winners = pack_masks.map(gl.popcount).astype(int).groupby(names, sort=True).idxmax()
+    all_packages = grouped_masks.agg(lambda masks: reduce(or_, masks, 0))
+    row_counts = grouped_masks.size()
+
+    report = []
+    kept_rows = []
+    unresolved_names = []
+    for name, winner in winners.items():
+        missing = all_packages[name] & ~pack_masks[winner]
+        resolved = not missing
+        if resolved:
+            kept_rows.append(winner)
+        else:
+            unresolved_names.append(name)
+        report.append({
+            'name': name,
+            'rows': int(row_counts[name]),
+            'resolved': resolved,
+            'kept_row': winner if resolved else None,
+            'packages_only_in_other_rows': sorted(membership.packages(missing)),
+        })
+
+    dupe_no_frame = pd.concat([dupe_no_frame, dupe_frame.loc[kept_rows]])
+    dupe_unresolved_frame = dupe_frame.loc[names.isin(unresolved_names)]
+    return dupe_no_frame, dupe_unresolved_frame, report
+
+
+def resolve_duplicate_records(records, name_col='name', packlist_col='packlist', mask_col='packmask',
+                              membership=None):
+    """resolve_duplicate_names for a list of row dicts instead of a frame.
+
+    Returns the same rows in the same order, and the same report,
+    except that kept_row is the position of the kept row in records rather than its frame index."""
+    positions_by_name = {}
+    for position, record in enumerate(records):
+        # like value_counts, rows without a name are never duplicates
+        if record[name_col] is not None:
+            positions_by_name.setdefault(record[name_col], []).append(position)
+    dupe_names = sorted(name for name, positions in positions_by_name.items() if len(positions) > 1)
+    dupe_no_records = [record for record in records
+                       if record[name_col] is None or len(positions_by_name[record[name_col]]) == 1]
+
+    if membership is None:
+        membership = gl.PackageMembership([])
+    report = []
+    unresolved_names = set()
+    for name in dupe_names:
+        positions = positions_by_name[name]
+        pack_masks = [records[position][mask_col] if mask_col in records[position]
+                      else membership.mask(records[position][packlist_col]) for position in positions]
+        # the first row with the most packages is the candidate
+        winner_index = max(range(len(positions)), key=lambda index: gl.popcount(pack_masks[index]))
+        missing = reduce(or_, pack_masks, 0) & ~pack_masks[winner_index]
+        resolved = not missing
+        if resolved:
+            dupe_no_records.append(records[positions[winner_index]])
+        else:
+            unresolved_names.add(name)
+        report.append({
+            'name': name,
+            'rows': len(positions),
+            'resolved': resolved,
+            'kept_row': positions[winner_index] if resolved else None,
+            'packages_only_in_other_rows': sorted(membership.packages(missing)),
+        })
+
+    dupe_unresolved_records = [record for record in records if record[name_col] in unresolved_names]
+    return dupe_no_records, dupe_unresolved_records, report
+
+
+def write_records_tsv(records, columns, path):
+    # writes what DataFrame(records, columns=columns).to_csv(path, index=False, sep="\t") would
+    with open(path, "w", newline="") as tsv_file:
+        writer = csv.writer(tsv_file, delimiter="\t", lineterminator="\n")
+        writer.writerow(columns)
+        for record in records:
+            writer.writerow([record[column] for column in columns])
+
+
+def summarize_duplicate_report(report):
+    lines = []
+    resolved = [group for group in report if group['resolved']]
+    lines.append(f"{len(report)} names defined on more than one row, {len(resolved)} resolved")
+    for group in report:
+        if not group['resolved']:
+            lines.append(f"  {group['name']} ({group['rows']} rows) discarded, because the row with the most packages "
+                         f"lacks {group['packages_only_in_other_rows']}")
+    return "\n".join(lines)
@@ -0,0 +1,104 @@
+import re
+
+import yaml
+
+# writes the generated schema one top level section at a time,
+#   so that only one section's node graph is ever held in memory,
+#   with libyaml's emitter where it produces exactly the same bytes as yaml.dump(made_yaml, ...) did
+#
+# libyaml wraps long double-quoted scalars differently from the pure python emitter,
+#   so anything that might be double-quoted (i.e. any string that isn't printable ASCII)
+#   goes through the pure python emitter instead
+# nested items are dumped as top level mappings and indented afterwards,
+#   with the line width reduced by the indentation, which is how the emitter would have wrapped them in place
+
+try:
+    from yaml import CDumper as FastDumper
+except ImportError:
+    FastDumper = yaml.Dumper
+
+# yaml.dump's default
+BEST_WIDTH = 80
+SECTION_INDENT = "  "
+# items per call to the emitter
+CHUNK_SIZE = 200
+
+plain_key_pattern = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+
+class SharedValueError(Exception):
+    pass
+
+
+def c_emitter_safe(values, seen):
+    """True if every string in values is printable ASCII.
+
+    Raises SharedValueError if a container appears twice in the document,
+    since splitting the document would lose the anchor yaml.dump gives it."""
+    stack = list(values)
+    safe = True
+    while stack:
+        current = stack.pop()
+        if isinstance(current, str):
+            if safe and not (current.isascii() and current.isprintable()):
+                safe = False
+        elif isinstance(current, (dict, list)):
+            if id(current) in seen:
+                raise SharedValueError()
+            seen.add(id(current))
+            if isinstance(current, dict):
+                stack.extend(current.keys())
+                stack.extend(current.values())
+            else:
+                stack.extend(current)
+    return safe
+
+
+def dump_top_level(content, stream, dumper, width=BEST_WIDTH):
+    yaml.dump(content, stream, Dumper=dumper, default_flow_style=False, sort_keys=False, width=width)
+
+
+def write_indented(text, stream):
+    for line in text.splitlines(keepends=True):
+        # blank lines inside block scalars aren't indented by the emitter either
+        if line.strip("\n"):
+            stream.write(SECTION_INDENT)
+        stream.write(line)
+
+
+def plan_sections(made_yaml):
+    # [(key, [(item chunk, dumper), ...] or None for "dump the section whole", dumper)]
+    seen = set()
+    plan = []
+    for key, value in made_yaml.items():
+        if isinstance(value, dict) and value and plain_key_pattern.fullmatch(key):
+            chunks = []
+            for item_key, item_value in value.items():
+                dumper = FastDumper if c_emitter_safe([item_key, item_value], seen) else yaml.Dumper
+                if chunks and chunks[-1][1] is dumper and len(chunks[-1][0]) < CHUNK_SIZE:
+                    chunks[-1][0][item_key] = item_value
+                else:
+                    chunks.append(({item_key: item_value}, dumper))
+            plan.append((key, chunks, None))
+        else:
+            dumper = FastDumper if c_emitter_safe([key, value], seen) else yaml.Dumper
+            plan.append((key, None, dumper))
+    return plan
+
+
+def dump_schema(made_yaml, stream):
+    """Writes made_yaml to stream, byte for byte as
+    yaml.dump(made_yaml, stream, default_flow_style=False, sort_keys=False) would."""
+    try:
+        plan = plan_sections(made_yaml)
+    except SharedValueError:
+        dump_top_level(made_yaml, stream, yaml.Dumper)
+        return
+    for key, chunks, dumper in plan:
+        if chunks is None:
+            dump_top_level({key: made_yaml[key]}, stream, dumper)
+            continue
+        stream.write(f"{key}:\n")
+        for chunk, chunk_dumper in chunks:
+            write_indented(yaml.dump(chunk, Dumper=chunk_dumper, default_flow_style=False, sort_keys=False,
+                                     width=BEST_WIDTH - len(SECTION_INDENT)), stream)
@@ -0,0 +1,148 @@
+import re
+from functools import reduce
+from operator import or_
+
+# lookups over the deduplicated Index of Terms glossary,
+#   built in one pass so that make_iot_yaml doesn't have to scan the whole frame for every slot or package
+
+package_separator = re.compile('; *')
+
+
+def list_packages(associated_packages):
+    """Sorted package names from the "Associated Packages" values, without the "all" alias."""
+    packages = set()
+    for value in set(associated_packages):
+        if value not in ['all', '', None]:
+            packages.update(package_separator.split(value))
+    return sorted(packages)
+
+
+def popcount(mask):
+    return bin(mask).count("1")
+
+
+class PackageMembership:
+    """Package name -> bit, so that the packages of a glossary row are one int,
+    and "all", subset checks and per-package lookups are bitwise operations on it.
+
+    The packages get the low bits, in order; anything else a row lists (like the "" of a trailing "; ")
+    gets the next free bit when it's first seen, so that it still counts as a member, as it did in a package list."""
+
+    def __init__(self, packages):
+        self.names = list(packages)
+        self.bits = {package: 1 << position for position, package in enumerate(self.names)}
+        self.all_mask = (1 << len(self.names)) - 1
+        # "Associated Packages" value -> mask; a sheet has few distinct values, so each is only split once
+        self.parsed = {}
+
+    def bit(self, name):
+        if name not in self.bits:
+            self.bits[name] = 1 << len(self.names)
+            self.names.append(name)
+        return self.bits[name]
+
+    def mask(self, packlist):
+        # rows without any "Associated Packages" have NaN or None instead of a list
+        mask = 0
+        if isinstance(packlist, list):
+            for name in packlist:
+                mask |= self.bit(name)
+        return mask
+
+    def parse(self, associated_packages):
+        # the mask for an "Associated Packages" value, with "all" standing for every package
+        if not isinstance(associated_packages, str):
+            return 0
+        if associated_packages not in self.parsed:
+            if associated_packages == 'all':
+                self.parsed[associated_packages] = self.all_mask
+            else:
+                self.parsed[associated_packages] = self.mask(package_separator.split(associated_packages))
+        return self.parsed[associated_packages]
+
+    def packages(self, mask):
+        # the names of the bits set in mask, packages first
+        return [name for name in self.names if mask & self.bits[name]]
+
+
+def add_package_mask_column(glossary_frame, membership):
+    # packmask is "Associated Packages" as a PackageMembership mask, in an object column,
+    #   so that more than 63 packages don't overflow
+    import pandas as pd
+
+    associated_packages = glossary_frame['Associated Packages']
+    masks = {value: membership.parse(value) for value in associated_packages.unique()}
+    glossary_frame['packmask'] = pd.Series([masks[value] for value in associated_packages],
+                                           index=glossary_frame.index, dtype=object)
+
+
+def add_package_masks(records, membership):
+    # the records counterpart of add_package_mask_column
+    for record in records:
+        record['packmask'] = membership.parse(record['Associated Packages'])
+
+
+def add_packlist_columns(glossary_frame, packages):
+    # explicit_packs is "Associated Packages" with "all" spelled out, packlist is it split into a list
+    #   only needed for writing out rows, like the unresolved duplicates; everything else uses packmask
+    all_packages_str = '; '.join(packages)
+    glossary_frame['explicit_packs'] = glossary_frame['Associated Packages']
+    glossary_frame.loc[glossary_frame['Associated Packages'].eq('all'), 'explicit_packs'] = all_packages_str
+    glossary_frame['packlist'] = glossary_frame['explicit_packs'].str.split(pat='; *')
+
+
+def add_packlists(records, packages):
+    # the records counterpart of add_packlist_columns
+    #   "all" stands for every package; rows without any "Associated Packages" get None instead of a list
+    all_packages_str = '; '.join(packages)
+    for record in records:
+        explicit_packs = record['Associated Packages']
+        if explicit_packs == 'all':
+            explicit_packs = all_packages_str
+        record['explicit_packs'] = explicit_packs
+        record['packlist'] = None if explicit_packs is None else package_separator.split(explicit_packs)
+
+
+class GlossaryIndex:
+    """name -> glossary rows, package -> sorted slot names, and which slot names are also MIxS slots.
+
+    records are the deduplicated glossary rows as dicts, with their packages as a PackageMembership mask
+    in 'packmask', or else as a list in 'packlist'."""
+
+    def __init__(self, records, packages, mixs_slotnames, membership=None):
+        if membership is None:
+            membership = PackageMembership(packages)
+        self.membership = membership
+        self.rows_by_name = {}
+        # name -> the packages of all of its rows, as one mask
+        self.slot_masks = {}
+        for record in records:
+            name = record['name']
+            self.rows_by_name.setdefault(name, []).append(record)
+            mask = record['packmask'] if 'packmask' in record else membership.mask(record['packlist'])
+            self.slot_masks[name] = self.slot_masks.get(name, 0) | mask
+        self.package_slots = {package: [] for package in packages}
+        slots_by_bit = {membership.bit(package): self.package_slots[package] for package in packages}
+        self.package_mask = reduce(or_, slots_by_bit, 0)
+        # mask -> the slot lists of its packages; there are only as many distinct masks as package combinations
+        targets_by_mask = {}
+        for name, mask in self.slot_masks.items():
+            if mask not in targets_by_mask:
+                targets_by_mask[mask] = [slot_names for bit, slot_names in slots_by_bit.items() if mask & bit]
+            for slot_names in targets_by_mask[mask]:
+                slot_names.append(name)
+        for slot_names in self.package_slots.values():
+            slot_names.sort()
+        mixs_slotnames = set(mixs_slotnames)
+        self.mixs_slots = frozenset(name for name in self.rows_by_name if name in mixs_slotnames)
+
+    def slot_details(self, name):
+        # all rows for name, usually exactly one
+        return self.rows_by_name.get(name, [])
+
+    def is_mixs_slot(self, name):
+        return name in self.mixs_slots
+
+    def used_slots(self):
+        # every slot that is associated with at least one package, sorted
+        return sorted(name for name, mask in self.slot_masks.items() if mask & self.package_mask)
@@ -0,0 +1,65 @@
+import hashlib
+import json
+import os
+
+# sidecar manifest for incremental regeneration of iot.yaml
+#   for every slot, a hash of each input (the glossary row columns generate.build_slot reads,
+#   controlled terms column, MIxS slot projection)
+#   and the fragment generate.build_slot produced from them
+# bump FRAGMENT_FORMAT whenever build_slot would produce something different from the same inputs
+
+FRAGMENT_FORMAT = 1
+
+
+def hash_json(content):
+    canonical = json.dumps(content, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def manifest_path_for(yamlout, cache_dir):
+    return os.path.join(cache_dir, os.path.basename(yamlout) + ".manifest.json")
+
+
+class IncrementalManifest:
+    """Slot fragments from the previous run, keyed by the hashes of their inputs.
+
+    Only the fragments used in this run are written back, so slots that have disappeared are pruned."""
+
+    def __init__(self, path):
+        self.path = path
+        self.previous = {}
+        self.current = {}
+        self.hits = 0
+        self.misses = 0
+        if os.path.exists(path):
+            with open(path) as manifest_file:
+                content = json.load(manifest_file)
+            if content.get("format") == FRAGMENT_FORMAT:
+                self.previous = content["slots"]
+
+    @staticmethod
+    def hash_slot_inputs(slot_details, mixs_slot_def, ct_values, idcol):
+        return {
+            "glossary_rows": hash_json([slot_details, idcol]),
+            "controlled_terms": hash_json(ct_values),
+            "mixs": hash_json(mixs_slot_def),
+        }
+
+    def get_fragment(self, slot, input_hashes):
+        entry = self.previous.get(slot)
+        if entry is not None and entry["inputs"] == input_hashes:
+            self.hits += 1
+            self.current[slot] = entry
+            return entry["fragment"]
+        self.misses += 1
+        return None
+
+    def put_fragment(self, slot, input_hashes, fragment):
+        self.current[slot] = {"inputs": input_hashes, "fragment": fragment}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as manifest_file:
+            json.dump({"format": FRAGMENT_FORMAT, "slots": self.current}, manifest_file)
+        os.replace(temp_path, self.path)
@@ -0,0 +1,143 @@
+import contextlib
+import json
+import os
+import time
+
+# per-stage timings, counts and cache statistics for one make_iot_yaml run, written as JSON for dashboards
+#   wall and CPU time are always measured, since that's nearly free
+#   tracemalloc (memory) and cProfile (profile) slow the run down, so they're only on when asked for
+
+
+def hit_rate(hits, misses):
+    lookups = hits + misses
+    return {"hits": hits, "misses": misses, "hit_rate": hits / lookups if lookups else None}
+
+
+class RunMetrics:
+    """Wrap each stage in `with metrics.stage(name):`, then report() or write(path).
+
+    With memory, the report includes tracemalloc's peak for each stage and for the whole run.
+    With profile, every stage that isn't concurrent runs under its own cProfile.Profile,
+    and dump_profile(path) saves the slowest one.
+
+    A stage that runs in another thread, alongside the main thread's stages, is marked concurrent:
+    its CPU time is the thread's own, and it has no memory peak, since tracemalloc's peak is process-wide,
+    and no profile, since only one profiler can be enabled at a time (Python 3.12 raises ValueError for a second).
+    `with metrics.overlapping(name, stage_names):` around such stages reports how much running them together saved."""
+
+    def __init__(self, memory=False, profile=False):
+        self.memory = memory
+        self.profile = profile
+        self.stages = {}
+        self.profiles = {}
+        self.counts = {}
+        self.caches = {}
+        self.overlaps = {}
+        self.mixs_lookups = None
+        self.peak_memory = 0
+        self.start_wall = None
+        self.start_cpu = None
+        self.end_wall = None
+        self.end_cpu = None
+
+    def start(self):
+        if self.memory:
+            import tracemalloc
+
+            tracemalloc.start()
+        self.start_wall = time.perf_counter()
+        self.start_cpu = time.process_time()
+
+    def stop(self):
+        self.end_wall = time.perf_counter()
+        self.end_cpu = time.process_time()
+        if self.memory:
+            import tracemalloc
+
+            self.peak_memory = max(self.peak_memory, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+
+    @contextlib.contextmanager
+    def stage(self, name, concurrent=False):
+        if self.memory and not concurrent:
+            import tracemalloc
+
+            # keep the run's peak so far, before reset_peak forgets it
+            self.peak_memory = max(self.peak_memory, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        profiler = None
+        if self.profile and not concurrent:
+            import cProfile
+
+            profiler = cProfile.Profile()
+            profiler.enable()
+        cpu_time = time.thread_time if concurrent else time.process_time
+        start_wall = time.perf_counter()
+        start_cpu = cpu_time()
+        try:
+            yield
+        finally:
+            stage = {"wall_seconds": time.perf_counter() - start_wall, "cpu_seconds": cpu_time() - start_cpu}
+            if profiler is not None:
+                profiler.disable()
+                self.profiles[name] = profiler
+            if self.memory and not concurrent:
+                stage_peak = tracemalloc.get_traced_memory()[1]
+                stage["peak_memory_bytes"] = stage_peak
+                self.peak_memory = max(self.peak_memory, stage_peak)
+            self.stages[name] = stage
+
+    @contextlib.contextmanager
+    def overlapping(self, name, stage_names):
+        start_wall = time.perf_counter()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - start_wall
+            sequential = sum(self.stages[stage]["wall_seconds"] for stage in stage_names if stage in self.stages)
+            self.overlaps[name] = {"stages": list(stage_names), "wall_seconds": wall,
+                                   "sequential_wall_seconds": sequential, "saved_seconds": sequential - wall}
+
+    def count(self, name, value):
+        self.counts[name] = value
+
+    def cache(self, name, hits, misses):
+        self.caches[name] = hit_rate(hits, misses)
+
+    def slowest_stage(self):
+        if not self.stages:
+            return None
+        return max(self.stages, key=lambda name: self.stages[name]["wall_seconds"])
+
+    def dump_profile(self, path):
+        # pstats-compatible, e.g. python -m pstats path or snakeviz path
+        name = self.slowest_stage()
+        if name is None or name not in self.profiles:
+            return None
+        self.profiles[name].dump_stats(path)
+        return name
+
+    def report(self):
+        total = {}
+        if self.end_wall is not None:
+            total = {"wall_seconds": self.end_wall - self.start_wall, "cpu_seconds": self.end_cpu - self.start_cpu}
+            if self.memory:
+                total["peak_memory_bytes"] = self.peak_memory
+        return {
+            "total": total,
+            "stages": self.stages,
+            "slowest_stage": self.slowest_stage(),
+            "counts": self.counts,
+            "mixs_lookups": self.mixs_lookups,
+            "caches": self.caches,
+            "overlaps": self.overlaps,
+        }
+
+    def write(self, path, **extra):
+        # extra items, e.g. the options of the run, are added to the top level of the report
+        report = dict(self.report(), **extra)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as report_file:
+            json.dump(report, report_file, indent=2)
+            report_file.write("\n")
+        return report
@@ -0,0 +1,219 @@
+import hashlib
+import os
+import pickle
+from importlib.metadata import version
+
+# a precompiled, pickled projection of the parts of MIxS that make_iot_yaml uses,
+#   so the SchemaView parse of mixs.yaml and its imports only happens when the MIxS sources change
+# bump INDEX_FORMAT whenever the content of the index changes shape
+
+INDEX_FORMAT = 2
+INDEX_FILENAME = "mixs_index.pickle"
+
+
+def list_mixs_sources(mixs_path):
+    # every schema file next to (or below) mixs.yaml, in a stable order
+    schema_dir = os.path.dirname(os.path.abspath(mixs_path))
+    source_files = []
+    for dirpath, dirnames, filenames in os.walk(schema_dir):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.endswith((".yaml", ".yml")):
+                source_files.append(os.path.join(dirpath, filename))
+    return schema_dir, source_files
+
+
+def stat_mixs_sources(mixs_path):
+    # (file, mtime, size) of every schema file, a cheap first check for changes before hashing them
+    schema_dir, source_files = list_mixs_sources(mixs_path)
+    signature = []
+    for source_file in source_files:
+        source_stat = os.stat(source_file)
+        signature.append((os.path.relpath(source_file, schema_dir), source_stat.st_mtime_ns, source_stat.st_size))
+    return tuple(signature)
+
+
+def hash_mixs_sources(mixs_path):
+    # content hash of every schema file next to (or below) mixs.yaml,
+    #   plus the linkml-runtime version, since that's what resolves the imports
+    schema_dir, source_files = list_mixs_sources(mixs_path)
+    source_hash = hashlib.sha256()
+    source_hash.update(f"{INDEX_FORMAT} {version('linkml-runtime')} {os.path.basename(mixs_path)}".encode("utf-8"))
+    for source_file in source_files:
+        source_hash.update(os.path.relpath(source_file, schema_dir).encode("utf-8"))
+        with open(source_file, "rb") as source:
+            source_hash.update(hashlib.sha256(source.read()).digest())
+    return source_hash.hexdigest()
+
+
+def plain_str(value):
+    # linkml_runtime hands back str subclasses, which would need linkml to unpickle
+    if value is None:
+        return None
+    return str(value)
+
+
+def project_slot(slot_def):
+    # plain python values only, so the index can be unpickled without linkml
+    return {
+        "comments": [str(one_comment) for one_comment in slot_def.comments],
+        "description": plain_str(slot_def.description),
+        "examples": [plain_str(one_example['value']) for one_example in slot_def.examples],
+        "notes": [str(one_note) for one_note in slot_def.notes],
+        "required": slot_def.required,
+        "recommended": slot_def.recommended,
+        "range": plain_str(slot_def.range),
+        "slot_uri": plain_str(slot_def.slot_uri),
+        "see_also": [str(one_see_also) for one_see_also in slot_def.see_also],
+        "title": plain_str(slot_def.title),
+        "pattern": plain_str(slot_def.pattern),
+        "multivalued": slot_def.multivalued,
+    }
+
+
+def plain_value(value, linkml_types):
+    # mirrors linkml_runtime's root_representer for yaml.SafeDumper, followed by yaml.safe_load:
+    #   YAMLRoot and JsonObj become dicts without private, None or empty container fields,
+    #   enum values become their text, and str/int/float subclasses become the plain type
+    yaml_root, json_obj, enum_definition_impl = linkml_types
+    if isinstance(value, enum_definition_impl):
+        return str(value._as_value())
+    if isinstance(value, (yaml_root, json_obj)):
+        return {k: plain_value(v, linkml_types) for k, v in vars(value).items()
+                if not k.startswith("_") and v is not None and (not isinstance(v, (dict, list)) or v)}
+    if isinstance(value, dict):
+        return {plain_value(k, linkml_types): plain_value(v, linkml_types) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [plain_value(v, linkml_types) for v in value]
+    if isinstance(value, bool):
+        return bool(value)
+    if isinstance(value, str):
+        return str(value)
+    if isinstance(value, int):
+        return int(value)
+    if isinstance(value, float):
+        return float(value)
+    return value
+
+
+class ElementConverter:
+    """Converts linkml_runtime EnumDefinitions, ClassDefinitions etc. straight into the plain dicts
+    that yaml.safe_load(yamlgen.as_yaml(element)) would give, without serializing and re-parsing them.
+
+    Conversions are memoized per element, so callers must not modify the dicts they get back."""
+
+    def __init__(self):
+        from jsonasobj2 import JsonObj
+        from linkml_runtime.utils.enumerations import EnumDefinitionImpl
+        from linkml_runtime.utils.yamlutils import YAMLRoot
+
+        self.linkml_types = (YAMLRoot, JsonObj, EnumDefinitionImpl)
+        # id -> (element, dict), keeping the element alive so that its id can't be reused
+        self.converted = {}
+
+    def __call__(self, element):
+        key = id(element)
+        if key not in self.converted:
+            self.converted[key] = (element, plain_value(element, self.linkml_types))
+        return self.converted[key][1]
+
+
+def build_mixs_index_content(mixs_path, source_hash=None):
+    from linkml_runtime.utils.schemaview import SchemaView
+
+    element_to_dict = ElementConverter()
+    mixs_view = SchemaView(mixs_path)
+    all_classes = mixs_view.all_classes()
+    all_enums = mixs_view.all_enums()
+    return {
+        "format": INDEX_FORMAT,
+        "source_hash": source_hash,
+        "slots": {str(name): project_slot(mixs_view.get_slot(name)) for name in mixs_view.all_slots()},
+        # whole slot definitions, for pulling in the slots that pulled in classes refer to
+        "slot_definitions": {str(name): element_to_dict(mixs_view.get_slot(name)) for name in mixs_view.all_slots()},
+        "classes": {str(name): element_to_dict(class_def) for name, class_def in all_classes.items()},
+        "enums": {str(name): element_to_dict(enum_def) for name, enum_def in all_enums.items()},
+        "types": sorted(str(name) for name in mixs_view.all_types()),
+        "type_definitions": {str(name): element_to_dict(type_def) for name, type_def in mixs_view.all_types().items()},
+    }
+
+
+class MixsIndex:
+    """Read-only lookups over a compiled MIxS index,
+    with the SchemaView method names make_iot_yaml used before.
+    Slots come back as plain dicts of the projected fields.
+
+    from_cache says whether load_mixs_index reused a compiled index,
+    and lookups counts the get_* calls and how many of them found something, for run metrics."""
+
+    def __init__(self, content, from_cache=False):
+        self.source_hash = content["source_hash"]
+        self.slots = content["slots"]
+        self.slot_definitions = content["slot_definitions"]
+        self.classes = content["classes"]
+        self.enums = content["enums"]
+        self.types = frozenset(content["types"])
+        self.type_definitions = content["type_definitions"]
+        self.from_cache = from_cache
+        self.lookups = {kind: {"lookups": 0, "found": 0}
+                        for kind in ["slot", "slot_definition", "class", "enum", "type", "type_definition"]}
+
+    def count_lookup(self, kind, result):
+        counts = self.lookups[kind]
+        counts["lookups"] += 1
+        if result is not None:
+            counts["found"] += 1
+        return result
+
+    @property
+    def slot_names(self):
+        return sorted(self.slots.keys())
+
+    def get_slot(self, slot_name):
+        return self.count_lookup("slot", self.slots.get(slot_name))
+
+    def get_slot_definition(self, slot_name):
+        # the whole slot definition as a plain dict, rather than get_slot's projection
+        return self.count_lookup("slot_definition", self.slot_definitions.get(slot_name))
+
+    def get_class(self, class_name):
+        return self.count_lookup("class", self.classes.get(class_name))
+
+    def get_enum(self, enum_name):
+        return self.count_lookup("enum", self.enums.get(enum_name))
+
+    def get_type_definition(self, type_name):
+        return self.count_lookup("type_definition", self.type_definitions.get(type_name))
+
+    def get_type(self, type_name):
+        if type_name in self.types:
+            return self.count_lookup("type", type_name)
+        return self.count_lookup("type", None)
+
+
+def load_mixs_index(mixs_path, cache_dir=None):
+    """Returns a MixsIndex for mixs_path,
+    reusing the one in cache_dir if it was compiled from the same MIxS sources."""
+    source_hash = hash_mixs_sources(mixs_path)
+    index_path = None
+    if cache_dir is not None:
+        index_path = os.path.join(cache_dir, INDEX_FILENAME)
+        if os.path.exists(index_path):
+            try:
+                with open(index_path, "rb") as index_file:
+                    content = pickle.load(index_file)
+            except (pickle.UnpicklingError, EOFError, AttributeError, ImportError) as e:
+                print(f"Ignoring unreadable MIxS index {index_path}: {e}")
+                content = {}
+            if content.get("format") == INDEX_FORMAT and content.get("source_hash") == source_hash:
+                return MixsIndex(content, from_cache=True)
+
+    print(f"Indexing MIxS from {mixs_path}")
+    content = build_mixs_index_content(mixs_path, source_hash)
+    if index_path is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        temp_path = index_path + ".tmp"
+        with open(temp_path, "wb") as index_file:
+            pickle.dump(content, index_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, index_path)
+    return MixsIndex(content)
@@ -0,0 +1,265 @@
+import csv
+import hashlib
+import json
+import os
+import re
+import sqlite3
+
+# a persistent label/ID index of local ontology files (OBO, OBO Graphs JSON as made by ROBOT from OWL, or TSV),
+#   for turning the controlled terms of IoT slots with {termLabel} {[termID]} in their syntax into enums of terms,
+#   and for validating the values of those slots
+# the terms are kept in SQLite, so a run only queries the terms it needs instead of loading whole ontologies
+# each file is only re-read when its content has changed since it was indexed
+# bump INDEX_FORMAT whenever the tables change shape, or what goes into them
+
+INDEX_FORMAT = 1
+INDEX_FILENAME = "ontology_index.sqlite"
+
+# the term placeholder, anywhere in a syntax, e.g. {text}|{termLabel} {[termID]},
+#   optionally after the prefix of the one ontology its terms come from, as in CHEBI {termLabel} {[termID]}
+term_syntax = re.compile(r"(?:(?:^|(?<=[;|{]))\s*(?P<prefix>[A-Za-z][\w.]*) +)?\{termLabel\} *\{\[termID\]\}")
+curie_pattern = re.compile(r"^[A-Za-z][\w.]*:\S+$")
+# "label [PREFIX:id]", the value a {termLabel} {[termID]} slot takes
+term_value = re.compile(r"^(?P<label>.*?) *\[(?P<id>[^\[\]]+)\]$")
+# the same, anywhere in a value, e.g. soil [ENVO:00001998];2022-03-01 for {termLabel} {[termID]};{timestamp}
+term_in_value = re.compile(r"(?P<label>[^\[\];|]*?) *\[(?P<id>[A-Za-z][\w.]*:[^\[\]\s]+)\]")
+obo_purl = "http://purl.obolibrary.org/obo/"
+
+
+def hash_source(path):
+    source_hash = hashlib.sha256()
+    with open(path, "rb") as source:
+        for block in iter(lambda: source.read(1 << 20), b""):
+            source_hash.update(block)
+    return source_hash.hexdigest()
+
+
+def curie_prefix(curie):
+    return curie.split(":", 1)[0].upper() if ":" in curie else ""
+
+
+def term_prefixes(syntax):
+    """None if syntax has no {termLabel} {[termID]} placeholder, otherwise the (upper case) prefixes of the ontologies
+    its terms have to come from, or an empty frozenset if they can come from any."""
+    prefixes = [match.group("prefix") for match in term_syntax.finditer(syntax)]
+    if not prefixes:
+        return None
+    if None in prefixes:
+        return frozenset()
+    return frozenset(prefix.upper() for prefix in prefixes)
+
+
+def format_term(label, curie):
+    return f"{label} [{curie}]"
+
+
+def read_obo(path):
+    # yields (id, label, obsolete) for every [Term] stanza
+    term = None
+    with open(path, encoding="utf-8") as obo_file:
+        for line in obo_file:
+            line = line.strip()
+            if line.startswith("["):
+                if term is not None and term.get("id"):
+                    yield term["id"], term.get("name", ""), term.get("obsolete", False)
+                term = {} if line == "[Term]" else None
+            elif term is not None and ": " in line:
+                tag, value = line.split(": ", 1)
+                if tag in ["id", "name"] and tag not in term:
+                    term[tag] = value.split(" ! ")[0].strip()
+                elif tag == "is_obsolete":
+                    term["obsolete"] = value.strip() == "true"
+    if term is not None and term.get("id"):
+        yield term["id"], term.get("name", ""), term.get("obsolete", False)
+
+
+def iri_to_curie(iri):
+    # http://purl.obolibrary.org/obo/CHEBI_15377 -> CHEBI:15377
+    if iri.startswith(obo_purl):
+        local = iri[len(obo_purl):]
+        if "_" in local:
+            prefix, local_id = local.split("_", 1)
+            return f"{prefix}:{local_id}"
+    return iri
+
+
+def read_obographs_json(path):
+    # OBO Graphs JSON, e.g. robot convert --input chebi.owl --output chebi.json
+    with open(path, encoding="utf-8") as json_file:
+        graphs = json.load(json_file).get("graphs", [])
+    for graph in graphs:
+        for node in graph.get("nodes", []):
+            if node.get("type", "CLASS") != "CLASS" or not node.get("id"):
+                continue
+            yield iri_to_curie(node["id"]), node.get("lbl", ""), bool(node.get("meta", {}).get("deprecated"))
+
+
+def read_tsv(path):
+    # id and label columns, found by header name if there's a header, otherwise the first two columns
+    with open(path, newline="", encoding="utf-8") as tsv_file:
+        reader = csv.reader(tsv_file, delimiter="\t")
+        header = next(reader, None)
+        if header is None:
+            return
+        lowered = [column.strip().lower() for column in header]
+        if "id" in lowered and "label" in lowered:
+            id_column, label_column = lowered.index("id"), lowered.index("label")
+        else:
+            id_column, label_column = 0, 1
+            if curie_pattern.match(header[0]):
+                yield header[0], header[1] if len(header) > 1 else "", False
+        for row in reader:
+            if len(row) > id_column and row[id_column]:
+                yield row[id_column], row[label_column] if len(row) > label_column else "", False
+
+
+def read_terms(path):
+    if path.endswith(".obo"):
+        return read_obo(path)
+    if path.endswith(".json"):
+        return read_obographs_json(path)
+    if path.endswith((".tsv", ".txt")):
+        return read_tsv(path)
+    raise ValueError(f"don't know how to read ontology terms from {path}; expected .obo, .json or .tsv")
+
+
+class OntologyIndex:
+    """Term lookups over the SQLite index at db_path.
+
+    update(paths) (re)indexes the files among paths that changed since they were last indexed."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.connection = sqlite3.connect(db_path)
+        # prefix: whether any terms have it
+        self.prefixes = {}
+        if self.connection.execute("PRAGMA user_version").fetchone()[0] != INDEX_FORMAT:
+            # an index in an older format is rebuilt from scratch
+            self.connection.executescript("DROP TABLE IF EXISTS sources; DROP TABLE IF EXISTS terms;")
+            self.connection.execute(f"PRAGMA user_version = {INDEX_FORMAT}")
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS sources (path TEXT PRIMARY KEY, signature TEXT, terms INTEGER);
+            CREATE TABLE IF NOT EXISTS terms (id TEXT, prefix TEXT, label TEXT, label_key TEXT, obsolete INTEGER,
+                                              source TEXT);
+            CREATE INDEX IF NOT EXISTS terms_by_id ON terms (id);
+            CREATE INDEX IF NOT EXISTS terms_by_label ON terms (label_key);
+            CREATE INDEX IF NOT EXISTS terms_by_prefix ON terms (prefix);
+            CREATE INDEX IF NOT EXISTS terms_by_source ON terms (source);
+        """)
+
+    def close(self):
+        self.connection.close()
+
+    def update(self, paths):
+        """Indexes the ontology files in paths that are new or changed, and forgets the terms of any others.
+
+        Returns the paths that were (re)indexed."""
+        indexed = []
+        sources = {os.path.abspath(path): path for path in paths}
+        known = dict(self.connection.execute("SELECT path, signature FROM sources"))
+        with self.connection:
+            for source in set(known) - set(sources):
+                self.connection.execute("DELETE FROM terms WHERE source = ?", (source,))
+                self.connection.execute("DELETE FROM sources WHERE path = ?", (source,))
+            for source, path in sources.items():
+                signature = hash_source(path)
+                if known.get(source) == signature:
+                    continue
+                self.connection.execute("DELETE FROM terms WHERE source = ?", (source,))
+                # read and inserted a term at a time, so a large ontology is never all in memory
+                rows = ((curie, curie_prefix(curie), label, label.lower(), int(obsolete), source)
+                        for curie, label, obsolete in read_terms(path))
+                self.connection.executemany("INSERT INTO terms VALUES (?, ?, ?, ?, ?, ?)", rows)
+                count = self.connection.execute("SELECT count(*) FROM terms WHERE source = ?", (source,)).fetchone()
+                self.connection.execute("INSERT OR REPLACE INTO sources VALUES (?, ?, ?)",
+                                        (source, signature, count[0]))
+                indexed.append(path)
+        self.prefixes.clear()
+        return indexed
+
+    def has_prefix(self, prefix):
+        if prefix not in self.prefixes:
+            self.prefixes[prefix] = self.connection.execute("SELECT 1 FROM terms WHERE prefix = ? LIMIT 1",
+                                                            (prefix.upper(),)).fetchone() is not None
+        return self.prefixes[prefix]
+
+    def get_term(self, curie):
+        # (id, label, obsolete) or None
+        row = self.connection.execute("SELECT id, label, obsolete FROM terms WHERE id = ? LIMIT 1",
+                                      (curie,)).fetchone()
+        if row is None:
+            return None
+        return row[0], row[1], bool(row[2])
+
+    def find_label(self, label, prefixes=()):
+        # the non-obsolete (id, label) with this label, ignoring case, from the ontologies with these prefixes if any,
+        #   or None
+        query = "SELECT id, label FROM terms WHERE label_key = ? AND obsolete = 0"
+        if prefixes:
+            query += f" AND prefix IN ({', '.join('?' * len(prefixes))})"
+        return self.connection.execute(query + " ORDER BY id LIMIT 1",
+                                       [label.strip().lower()] + sorted(prefixes)).fetchone()
+
+    def resolve(self, value, prefixes=()):
+        """Resolves a controlled term written as a CURIE, a label, or "label [CURIE]" to a (CURIE, label),
+        or returns None.
+
+        With prefixes (upper case), only terms from the ontologies with those prefixes are resolved."""
+        value = value.strip()
+        match = term_value.match(value)
+        if match is not None:
+            value = match.group("id").strip()
+        if curie_pattern.match(value):
+            if prefixes and curie_prefix(value) not in prefixes:
+                return None
+            term = self.get_term(value)
+            return None if term is None or term[2] else (term[0], term[1])
+        found = self.find_label(value, prefixes)
+        return None if found is None else (found[0], found[1])
+
+
+def open_ontology_index(ontology_paths, cache_dir, db_path=None):
+    """Opens (creating it if need be) the ontology index in cache_dir, or at db_path,
+    and brings it up to date with ontology_paths."""
+    ontology_index = OntologyIndex(db_path or os.path.join(cache_dir, INDEX_FILENAME))
+    for path in ontology_index.update(ontology_paths):
+        print(f"Indexed ontology terms from {path}")
+    return ontology_index
+
+
+def term_enum(slot, permissible_values):
+    # LinkML permissible values as "label [CURIE]", with the CURIE as the meaning
+    return [slot + "_enum", {"permissible_values": {
+        format_term(label, curie): {"meaning": curie} for curie, label in permissible_values}}]
+
+
+def build_term_enums(made_yaml, ontology_index, ct_dol):
+    """Turns the controlled terms of the slots with {termLabel} {[termID]} in their syntax into enums of ontology terms,
+    each resolved in the index from its label, its CURIE or both, and from the syntax's ontology if it names one.
+
+    A slot keeps its plain controlled terms enum if any of its terms can't be resolved.
+    Returns {slot: enum name} for the slots given term enums, and {slot: [unresolved values]}."""
+    converted = {}
+    unresolved = {}
+    for slot, model_slot in made_yaml['slots'].items():
+        if slot not in ct_dol:
+            continue
+        prefixes = term_prefixes(str((model_slot or {}).get('pattern') or ""))
+        if prefixes is None:
+            continue
+        permissible_values = []
+        for value in sorted(set(ct_dol[slot])):
+            term = ontology_index.resolve(value, prefixes)
+            if term is None:
+                unresolved.setdefault(slot, []).append(value)
+            elif term not in permissible_values:
+                permissible_values.append(term)
+        if slot in unresolved:
+            # rather than silently losing values
+            continue
+        enum_name, enum_def = term_enum(slot, permissible_values)
+        made_yaml['enums'][enum_name] = enum_def
+        model_slot['range'] = enum_name
+        converted[slot] = enum_name
+    return converted, unresolved
@@ -0,0 +1,295 @@
+import copy
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import iot_to_linkml.artifacts as art
+import iot_to_linkml.duplicates as dd
+import iot_to_linkml.generate as gen
+import iot_to_linkml.glossary as gl
+import iot_to_linkml.incremental as inc
+import iot_to_linkml.metrics as mt
+import iot_to_linkml.mixs_index as mi
+import iot_to_linkml.ontology_index as oi
+import iot_to_linkml.sheet2yaml as s2y
+
+# the Index of Terms -> LinkML transformation itself, from the fetched tabs and a MIxS index to iot.yaml
+#   shared by becli's one-off runs and becli watch
+
+dupe_unresolved_filename = "iot_duplciated_names.tsv"
+
+
+# def coalesce_package_names(df, orig_col_name,
+#                            repaired_col_name,
+#                            coalesced="coalesced", ):
+#     df[coalesced] = df[repaired_col_name]
+#     df[coalesced].loc[
+#         df[coalesced] == ""
+#         ] = df[orig_col_name].loc[df[coalesced] == ""]
+#     return df
+
+
+def fetch_tabs(session, metrics, concurrent=False):
+    with metrics.stage("sheet_fetch", concurrent=concurrent):
+        return session.get_iot_tabs()
+
+
+def load_inputs(session, mixs_path, cache_dir, metrics, overlap=True):
+    """Loads the MIxS index and fetches the glossary and controlled terms tabs.
+
+    With overlap, the tabs are fetched in a thread while the main thread loads (and if need be, indexes) MIxS,
+    so that the Sheets API round trips and the parsing of the MIxS sources don't wait for each other.
+    Either way, the "inputs" overlap in the metrics shows how much that saved.
+
+    Returns the MIxS index, the glossary tab and the controlled terms tab."""
+    with metrics.overlapping("inputs", ["mixs_index", "sheet_fetch"]):
+        if overlap:
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                fetch = executor.submit(fetch_tabs, session, metrics, concurrent=True)
+                # only re-parses mixs.yaml and its imports if they have changed since the index in cache_dir
+                with metrics.stage("mixs_index"):
+                    mixs_index = mi.load_mixs_index(mixs_path, cache_dir=cache_dir)
+                # re-raises anything the fetch raised
+                glossary_tab, ct_tab = fetch.result()
+        else:
+            with metrics.stage("mixs_index"):
+                mixs_index = mi.load_mixs_index(mixs_path, cache_dir=cache_dir)
+            glossary_tab, ct_tab = fetch_tabs(session, metrics)
+    return mixs_index, glossary_tab, ct_tab
+
+
+def glossary_from_frames(glossary_tab, ct_tab, metrics, dupes_out=dupe_unresolved_filename):
+    """Turns the Index of Terms tabs into pandas frames, expands the package lists and resolves duplicate names,
+    writing the rows whose names couldn't be resolved to dupes_out.
+
+    Returns the packages, the controlled terms, the deduplicated glossary rows as dicts,
+    the duplicate name report, every row's Category and the PackageMembership the rows' packmask values index."""
+    with metrics.stage("sheet_parse"):
+        my_iot_glossary_frame = s2y.tab_to_frame(glossary_tab)
+        ct_dol = s2y.get_ct_dol(s2y.tab_to_frame(ct_tab))
+    metrics.count("glossary_rows", len(my_iot_glossary_frame.index))
+
+    # # TIDY UP SLOT NAMES AND RECONCILE WITH MIXS (PREFERRING MIXS)
+    # # SHOULD USE coalesced FROM HERE ON OUT
+    # # replace leading ?s in slot names with Q
+    # # apply any other name tidying?
+    # my_iot_glossary_frame['no_quest'] = my_iot_glossary_frame['name'].str.replace(r'^\?+', 'Q', regex=True)
+    # my_iot_glossary_frame = coalesce_package_names(my_iot_glossary_frame, "no_quest", "mixs_6_slot_name", "coalesced")
+
+    # CONVERT PACKAGE "LIST" string, INCLUDING "all" ALIAS
+    # TO REAL LISTS
+    # CHECK FOR DUPLICATE NAMES AFTER THAT
+    # AND THEN EXPLODE FOR UNIQUE SLOT NAME/PACKAGE ROWS
+    # (now as one bitmask per row, see glossary.PackageMembership; the lists are only spelled out for writing rows)
+    with metrics.stage("package_expansion"):
+        iot_packages = gl.list_packages(my_iot_glossary_frame['Associated Packages'].unique())
+        membership = gl.PackageMembership(iot_packages)
+        gl.add_package_mask_column(my_iot_glossary_frame, membership)
+
+    # are there any rows that share names?
+    # could also use slot_usages to customize per-class (package) slot usage
+    with metrics.stage("dedup"):
+        dupe_no_frame, dupe_unresolved_frame, dupe_report = dd.resolve_duplicate_names(my_iot_glossary_frame,
+                                                                                       membership=membership)
+        # dupe_unresolved_frame can be used to update or delete rows
+        dupe_unresolved_frame = dupe_unresolved_frame.drop(columns='packmask')
+        gl.add_packlist_columns(dupe_unresolved_frame, iot_packages)
+        dupe_unresolved_frame.to_csv(dupes_out, index=False, sep="\t")
+        dupe_no_records = dupe_no_frame.to_dict(orient="records")
+
+    return iot_packages, ct_dol, dupe_no_records, dupe_report, list(my_iot_glossary_frame['Category']), membership
+
+
+def glossary_from_records(glossary_tab, ct_tab, metrics, dupes_out=dupe_unresolved_filename):
+    """glossary_from_frames without pandas, working on the rows of the Sheets API values as plain dicts."""
+    with metrics.stage("sheet_parse"):
+        glossary_records = s2y.tab_to_records(glossary_tab)
+        ct_dol = s2y.get_ct_dol(s2y.tab_to_columns(ct_tab))
+    metrics.count("glossary_rows", len(glossary_records))
+
+    with metrics.stage("package_expansion"):
+        iot_packages = gl.list_packages(record['Associated Packages'] for record in glossary_records)
+        membership = gl.PackageMembership(iot_packages)
+        gl.add_package_masks(glossary_records, membership)
+
+    with metrics.stage("dedup"):
+        dupe_no_records, dupe_unresolved_records, dupe_report = dd.resolve_duplicate_records(glossary_records,
+                                                                                             membership=membership)
+        # same columns as the frame, which got explicit_packs and packlist after the sheet's own columns
+        columns = glossary_tab["values"][0] + ['explicit_packs', 'packlist']
+        gl.add_packlists(dupe_unresolved_records, iot_packages)
+        dd.write_records_tsv(dupe_unresolved_records, columns, dupes_out)
+
+    return (iot_packages, ct_dol, dupe_no_records, dupe_report, [record['Category'] for record in glossary_records],
+            membership)
+
+
+def build_iot_yaml(glossary_tab, ct_tab, mixs_index, yamlout, idcol='Globally Unique ID', cache_dir='.iot_cache',
+                   incremental=False, engine='pandas', metrics=None, intern_enums=False,
+                   artifacts=(), induced_slots=None, self_contained=False, ontologies=(),
+                   dupes_out=dupe_unresolved_filename):
+    """Converts the glossary and controlled terms tabs (Sheets API value ranges) into LinkML and writes yamlout,
+    along with the unresolved duplicate names in dupes_out.
+
+    With intern_enums, slots whose controlled terms are the same set of values share one enum.
+    artifacts are the kinds of faster-loading copies of yamlout to write next to it, see artifacts.py.
+    induced_slots "artifact" writes every package's slots with their inheritance resolved next to yamlout,
+    and "inline" writes them into yamlout, as the slot_usage of each package class.
+    With self_contained, everything the pulled in MIxS classes, slots and enums refer to is pulled in too,
+    transitively, so that yamlout can be used without MIxS.
+    ontologies are OBO, OBO Graphs JSON or TSV files of terms, indexed in cache_dir, that the slots with
+    {termLabel} {[termID]} syntax get enums from, see ontology_index.py.
+
+    Returns True if yamlout was (re)written, False if its content didn't change."""
+    if metrics is None:
+        metrics = mt.RunMetrics()
+    mixs_slotnames = mixs_index.slot_names
+
+    if engine == "records":
+        glossary = glossary_from_records(glossary_tab, ct_tab, metrics, dupes_out)
+    else:
+        glossary = glossary_from_frames(glossary_tab, ct_tab, metrics, dupes_out)
+    iot_packages, ct_dol, dupe_no_records, dupe_report, iot_categories, membership = glossary
+    print("\n")
+    print(dd.summarize_duplicate_report(dupe_report))
+    print("\n")
+
+    # DUPLICATE SLOT NAME/PACKAGE ROWS HAVE BEEN RESOLVED, SO NOW INDEX
+    #   name -> row and package -> slots, in one pass instead of one frame scan per slot or package
+    with metrics.stage("glossary_index"):
+        glossary_index = gl.GlossaryIndex(dupe_no_records, iot_packages, mixs_slotnames, membership)
+
+    made_yaml = s2y.initialize_yaml()
+
+    # create YAML that says which slots go with which packages
+    # we are looping over the IoT slots
+    # and what are we gathering in all_used_iot_slots?
+    collected_classes = {}
+    for package in iot_packages:
+        # slot_usages = {}
+        collected_classes[package] = {'slots': list(glossary_index.package_slots[package])}
+
+    made_yaml['classes'] = collected_classes
+    # how is this different from the mixs slot list or the IoT slot list?
+    all_used_iot_slots = glossary_index.used_slots()
+
+    manifest = None
+    if incremental:
+        # only slots whose inputs changed since the last run are rebuilt
+        manifest = inc.IncrementalManifest(inc.manifest_path_for(yamlout, cache_dir))
+
+    with metrics.stage("slot_build"):
+        model_slots, enums, ranges = gen.build_slots(all_used_iot_slots, glossary_index, mixs_index, ct_dol, idcol,
+                                                     manifest=manifest)
+    print("\n")
+    if manifest is not None:
+        print(f"{manifest.hits} slots unchanged since the last run, {manifest.misses} rebuilt")
+        manifest.save()
+
+    made_yaml['slots'] = model_slots
+    made_yaml['enums'] = enums
+
+    with metrics.stage("range_pull_in"):
+        gen.pull_in_ranges(made_yaml, ranges, mixs_index)
+
+    print("\n")
+
+    term_enums = {}
+    if ontologies:
+        # before interning, which would otherwise share the controlled terms enums these replace
+        with metrics.stage("ontology_index"):
+            ontology_index = oi.open_ontology_index(ontologies, cache_dir)
+        with metrics.stage("ontology_enums"):
+            term_enums, unresolved_terms = oi.build_term_enums(made_yaml, ontology_index, ct_dol)
+        ontology_index.close()
+        for slot, values in unresolved_terms.items():
+            print(f"{slot} keeps its controlled terms, these aren't in the ontologies: {', '.join(values)}")
+        print(f"{len(term_enums)} slots get their enums from the ontologies")
+        print("\n")
+
+    replaced_enums = {}
+    if intern_enums:
+        with metrics.stage("enum_intern"):
+            replaced_enums = gen.intern_enums(made_yaml['slots'], made_yaml['enums'])
+        for shared_name, enum_names in replaced_enums.items():
+            print(f"{shared_name} replaces {', '.join(enum_names)}")
+        print(f"{sum(len(enum_names) for enum_names in replaced_enums.values())} enums interned")
+        print("\n")
+
+    # use slot usage in cases where a slot name appears on two rows,
+    #   with completely different packages on the two rows?
+    # made_yaml['classes']['soil']['slot_usage'] = {"samp_name": {'required': True, 'aliases': ['specimen moniker 2']}}
+
+    for k, v in gen.hardcoded_prefixes.items():
+        print(f"expanding prefix {k} as {v}")
+        made_yaml['prefixes'][k] = v
+    print("\n")
+
+    # iot_parent_slots = list(iot_parent_slots)
+
+    iot_parent_slots = list(set(iot_categories))
+    iot_parent_slots = [slot for slot in iot_parent_slots if slot != "" and slot is not None]
+
+    iot_parent_slots.sort()
+    print("parent slots:")
+    for one_parent in iot_parent_slots:
+        print(f"  {one_parent}")
+        made_yaml['slots'][one_parent] = {}
+
+    if self_contained:
+        # after the parent slots, so that the slots' is_a categories don't count as missing
+        with metrics.stage("dependency_closure"):
+            closure, resolver = gen.close_over_references(made_yaml, mixs_index)
+        print(f"pulled in {len(closure['classes'])} classes, {len(closure['slots'])} slots, "
+              f"{len(closure['enums'])} enums and {len(closure['types'])} types from MIxS, "
+              f"with {resolver.misses} lookups ({resolver.hits} more answered from memory)")
+        if closure['imported_types']:
+            print(f"types left to the linkml:types import: {', '.join(closure['imported_types'])}")
+        if closure['unresolved']:
+            print(f"referred to but not defined anywhere: {', '.join(closure['unresolved'])}")
+        print("\n")
+        for section in ["classes", "slots", "enums", "types", "unresolved"]:
+            metrics.count(f"closure_{section}", len(closure[section]))
+        metrics.cache("dependency_closure_lookups", resolver.hits, resolver.misses)
+
+    induced_classes = None
+    if induced_slots is not None:
+        # after the parent slots, which are what the slots inherit from
+        with metrics.stage("slot_induction"):
+            induced_classes = gen.induce_class_slots(made_yaml, iot_packages)
+        if induced_slots == "inline":
+            for package, package_slots in induced_classes.items():
+                # copied, since the induced slots are shared between packages and yaml.dump would alias them
+                made_yaml['classes'][package]['slot_usage'] = copy.deepcopy(package_slots)
+
+    with metrics.stage("yaml_dump"):
+        written = gen.write_yaml_if_changed(made_yaml, yamlout)
+    if written:
+        print(f"wrote {yamlout}")
+    else:
+        print(f"{yamlout} is unchanged")
+    if artifacts or induced_slots == "artifact":
+        with metrics.stage("artifacts"):
+            for artifact_path in art.write_artifacts(made_yaml, yamlout, artifacts):
+                print(f"wrote {artifact_path}")
+            if induced_slots == "artifact":
+                print(f"wrote {art.write_induced_slots(induced_classes, yamlout)}")
+
+    metrics.count("packages", len(iot_packages))
+    metrics.count("glossary_rows_deduplicated", len(dupe_no_records))
+    metrics.count("duplicated_names", len(dupe_report))
+    metrics.count("unresolved_duplicated_names", len([group for group in dupe_report if not group['resolved']]))
+    metrics.count("slots", len(all_used_iot_slots))
+    metrics.count("mixs_slots", len([slot for slot in all_used_iot_slots if glossary_index.is_mixs_slot(slot)]))
+    metrics.count("controlled_terms_columns", len(ct_dol))
+    metrics.count("enums", len(made_yaml['enums']))
+    if ontologies:
+        metrics.count("ontology_enums", len(term_enums))
+    if intern_enums:
+        metrics.count("interned_enums", sum(len(enum_names) for enum_names in replaced_enums.values()))
+    metrics.count("classes", len(made_yaml['classes']))
+    if induced_classes is not None:
+        metrics.count("induced_slots", sum(len(package_slots) for package_slots in induced_classes.values()))
+    metrics.count("output_bytes", os.path.getsize(yamlout))
+    if manifest is not None:
+        metrics.cache("incremental_slots", manifest.hits, manifest.misses)
+    return written
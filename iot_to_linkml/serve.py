@@ -0,0 +1,267 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+import yaml
+
+import iot_to_linkml.artifacts as art
+import iot_to_linkml.incremental as inc
+import iot_to_linkml.mixs_index as mi
+import iot_to_linkml.pipeline as pl
+
+# becli serve: the pipeline behind a small local HTTP API, for tools that would otherwise each run becli
+#   GET /schema.yaml, /schema.json               the whole generated schema
+#   GET /classes/<package>.yaml, .json           one package class, with the slots and enums it uses
+#   GET /status                                  the current inputs and the cache's counters
+# schemas are cached, least recently used first out, keyed on (spreadsheet revision, MIxS source hash),
+#   and the key is only checked every check_interval seconds, rather than on every request
+# the key is checked outside the lock on the cache, since that can mean a round trip to the Sheets API,
+#   by one thread at a time, and the requests that come in meanwhile use what it finds
+# requests for a key that's being built wait for that build instead of starting their own,
+#   and builds run one at a time, into the same files in cache_dir/serve,
+#   so that --incremental's manifest carries over from one build to the next
+
+
+def key_digest(key):
+    return hashlib.sha256(json.dumps(key).encode("utf-8")).hexdigest()[:16]
+
+
+class CachedSchema:
+    """One generated schema, with its JSON and per-class renderings made on first use."""
+
+    def __init__(self, key, yaml_text):
+        self.key = key
+        self.etag = f'"{key_digest(key)}"'
+        self.yaml_text = yaml_text
+        self.schema = yaml.load(yaml_text, Loader=art.FastLoader)
+        self.renderings = {}
+
+    def package_schema(self, package):
+        # the package class, and the definitions of its slots and of the enums they use
+        class_def = (self.schema.get('classes') or {}).get(package)
+        if class_def is None:
+            return None
+        slot_defs = self.schema.get('slots') or {}
+        enum_defs = self.schema.get('enums') or {}
+        slots = {slot: slot_defs.get(slot) for slot in class_def.get('slots') or []}
+        enums = {}
+        for slot_def in slots.values():
+            enum_name = (slot_def or {}).get('range')
+            if enum_name in enum_defs:
+                enums[enum_name] = enum_defs[enum_name]
+        return {"name": package, "class": class_def, "slots": slots, "enums": enums}
+
+    def render(self, package, form):
+        """The schema, or one package class of it, as "yaml" or "json" text, or None if there's no such package."""
+        if (package, form) not in self.renderings:
+            if package is None:
+                content = self.schema
+            else:
+                content = self.package_schema(package)
+                if content is None:
+                    return None
+            if form == "json":
+                text = json.dumps(content, ensure_ascii=False)
+            elif package is None:
+                text = self.yaml_text
+            else:
+                text = yaml.dump(content, sort_keys=False, allow_unicode=True)
+            self.renderings[(package, form)] = text
+        return self.renderings[(package, form)]
+
+
+class SchemaService:
+    """Builds and caches generated schemas for becli serve.
+
+    build_options are passed on to pipeline.build_iot_yaml.
+    clock is only there so that tests can stand in for time.monotonic."""
+
+    def __init__(self, session, mixs_path, cache_dir='.iot_cache', cache_size=4, check_interval=30.0,
+                 clock=time.monotonic, **build_options):
+        self.session = session
+        self.mixs_path = mixs_path
+        self.cache_dir = cache_dir
+        self.cache_size = cache_size
+        self.check_interval = check_interval
+        self.clock = clock
+        self.build_options = build_options
+        self.build_dir = os.path.join(cache_dir, "serve")
+        self.mixs_index = None
+        self.mixs_stat = None
+        # (revision, tabs) of the last fetch, guarded by tabs_lock
+        self.last_tabs = None
+        # (key, when it was checked, the MIxS index for it), guarded by lock
+        self.last_key = None
+        # key: CachedSchema, least recently used first
+        self.cache = OrderedDict()
+        # key: Future of the CachedSchema being built
+        self.building = {}
+        # the cache, building, last_key and the counters
+        self.lock = threading.Lock()
+        # one check of the key at a time, with mixs_index and mixs_stat
+        self.check_lock = threading.Lock()
+        self.tabs_lock = threading.Lock()
+        # one build at a time
+        self.build_lock = threading.Lock()
+        self.builds = 0
+        self.hits = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def check_mixs(self):
+        mixs_stat = mi.stat_mixs_sources(self.mixs_path)
+        if mixs_stat != self.mixs_stat:
+            self.mixs_index = mi.load_mixs_index(self.mixs_path, cache_dir=self.cache_dir)
+            self.mixs_stat = mixs_stat
+        return self.mixs_index.source_hash
+
+    def check_sheet(self):
+        revision = self.session.get_revision()
+        if revision is None:
+            # without a revision, only the content can tell whether the sheet changed
+            tabs = self.session.get_iot_tabs()
+            revision = "content-" + inc.hash_json(tabs)
+            with self.tabs_lock:
+                self.last_tabs = (revision, tabs)
+        return revision
+
+    def fresh_key(self):
+        # the last key and its MIxS index, or None if it's due to be checked again
+        with self.lock:
+            if self.last_key is None or self.clock() - self.last_key[1] >= self.check_interval:
+                return None
+            return self.last_key[0], self.last_key[2]
+
+    def current_key(self):
+        # returns the key and the MIxS index for it
+        fresh = self.fresh_key()
+        if fresh is not None:
+            return fresh
+        with self.check_lock:
+            # another thread may have checked while this one waited
+            fresh = self.fresh_key()
+            if fresh is not None:
+                return fresh
+            now = self.clock()
+            key = (self.check_sheet(), self.check_mixs())
+            with self.lock:
+                self.last_key = (key, now, self.mixs_index)
+            return key, self.mixs_index
+
+    def get_schema(self):
+        """The CachedSchema for the current inputs, built if it isn't cached, or waited for if it's being built."""
+        key, mixs_index = self.current_key()
+        with self.lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                self.hits += 1
+                return self.cache[key]
+            future = self.building.get(key)
+            builder = future is None
+            if builder:
+                future = Future()
+                self.building[key] = future
+            else:
+                self.coalesced += 1
+        if not builder:
+            return future.result()
+        try:
+            cached = self.build(key, mixs_index)
+        except BaseException as e:
+            with self.lock:
+                del self.building[key]
+            future.set_exception(e)
+            raise
+        with self.lock:
+            del self.building[key]
+            self.cache[key] = cached
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+                self.evictions += 1
+        future.set_result(cached)
+        return cached
+
+    def build(self, key, mixs_index):
+        with self.build_lock:
+            revision = key[0]
+            with self.tabs_lock:
+                last_tabs = self.last_tabs
+            if last_tabs is None or last_tabs[0] != revision:
+                last_tabs = (revision, self.session.get_iot_tabs())
+                with self.tabs_lock:
+                    self.last_tabs = last_tabs
+            glossary_tab, ct_tab = last_tabs[1]
+            os.makedirs(self.build_dir, exist_ok=True)
+            # the same files every time, with the schema itself kept in the cache
+            yamlout = os.path.join(self.build_dir, "schema.yaml")
+            pl.build_iot_yaml(glossary_tab, ct_tab, mixs_index, yamlout, cache_dir=self.cache_dir,
+                              dupes_out=os.path.join(self.build_dir, pl.dupe_unresolved_filename),
+                              **self.build_options)
+            with open(yamlout) as yaml_file:
+                cached = CachedSchema(key, yaml_file.read())
+            self.builds += 1
+            return cached
+
+    def status(self):
+        with self.lock:
+            key = self.last_key[0] if self.last_key is not None else None
+            return {"revision": key and key[0], "mixs_source_hash": key and key[1], "cached": len(self.cache),
+                    "cache_size": self.cache_size, "building": len(self.building), "builds": self.builds,
+                    "hits": self.hits, "coalesced": self.coalesced, "evictions": self.evictions}
+
+
+content_types = {"yaml": "application/yaml; charset=utf-8", "json": "application/json; charset=utf-8"}
+
+
+class SchemaRequestHandler(BaseHTTPRequestHandler):
+    # the server's service attribute is the SchemaService
+
+    def do_GET(self):
+        path = unquote(urlsplit(self.path).path)
+        if path == "/status":
+            self.respond(200, json.dumps(self.server.service.status()), content_types["json"])
+            return
+        package = None
+        if path.startswith("/classes/"):
+            path, package = "/schema" + os.path.splitext(path)[1], os.path.splitext(path[len("/classes/"):])[0]
+        form = os.path.splitext(path)[1].lstrip(".")
+        if os.path.splitext(path)[0] != "/schema" or form not in content_types:
+            self.respond(404, "try /schema.yaml, /schema.json, /classes/<package>.yaml, /classes/<package>.json "
+                              "or /status\n", "text/plain; charset=utf-8")
+            return
+        try:
+            cached = self.server.service.get_schema()
+        except Exception as e:
+            self.respond(500, f"building the schema failed: {e!r}\n", "text/plain; charset=utf-8")
+            return
+        if self.headers.get("If-None-Match") == cached.etag:
+            self.respond(304, "", content_types[form], cached.etag)
+            return
+        text = cached.render(package, form)
+        if text is None:
+            self.respond(404, f"{package} is not a class in the schema\n", "text/plain; charset=utf-8")
+            return
+        self.respond(200, text, content_types[form], cached.etag)
+
+    def respond(self, status, text, content_type, etag=None):
+        body = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if etag is not None:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        if status != 304:
+            self.wfile.write(body)
+
+
+def make_server(service, host="127.0.0.1", port=8000):
+    server = ThreadingHTTPServer((host, port), SchemaRequestHandler)
+    server.service = service
+    return server
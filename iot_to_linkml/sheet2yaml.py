@@ -1,18 +1,18 @@
+import hashlib
+import json
 import os
 
-import pandas as pd
-# pip install --upgrade google-api-python-client
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-# sudo pip install google-auth-oauthlib
-from google_auth_oauthlib.flow import InstalledAppFlow
-# AttributeError: module 'pyparsing' has no attribute 'downcaseTokens'
-# ERROR: httplib2 0.20.1 has requirement pyparsing<3,>=2.4.2, but you'll have pyparsing 3.0.3 which is incompatible.
-from googleapiclient.discovery import build
+import iot_to_linkml.sheet_cache as sc
+
+# pandas and the Google client libraries are imported where they're used,
+#   so that importing this module (e.g. for becli --help, or offline runs) stays cheap
 
 # from shutil import copyfile
 
-SCOPES = ["https://www.googleapis.com/auth/spreadsheets.readonly"]
+# drive.metadata.readonly is only used to look up the revision of the spreadsheet
+#   for keying the local snapshot cache
+SCOPES = ["https://www.googleapis.com/auth/spreadsheets.readonly",
+          "https://www.googleapis.com/auth/drive.metadata.readonly"]
 
 # The ID and range of a sample spreadsheet.
 IOT_SPREADSHEET_ID = "1lj4OuEE4IYwy2v7RzcG79lHjNdFwmDETMDTDaRAWojY"
@@ -26,6 +26,12 @@ CV_RANGE_NAME = "Controlled Terms!A1:Z"
 
 
 def get_creds(client_secret_file="../google_api_credentials.json"):
+    # pip install --upgrade google-api-python-client
+    from google.auth.transport.requests import Request
+    from google.oauth2.credentials import Credentials
+    # sudo pip install google-auth-oauthlib
+    from google_auth_oauthlib.flow import InstalledAppFlow
+
     creds = None
     # The file token.json stores the user's access and refresh tokens, and is
     # created automatically when the authorization flow completes for the first
@@ -46,41 +52,234 @@ def get_creds(client_secret_file="../google_api_credentials.json"):
 
 
 def get_sheet_service(creds):
+    # AttributeError: module 'pyparsing' has no attribute 'downcaseTokens'
+    # ERROR: httplib2 0.20.1 has requirement pyparsing<3,>=2.4.2, but you'll have pyparsing 3.0.3 which is incompatible.
+    from googleapiclient.discovery import build
+
     service = build("sheets", "v4", credentials=creds)
     # Call the Sheets API
     sheet_service = service.spreadsheets()
     return sheet_service
 
 
-def get_gsheet_tab(sheet_service, sheet_id, range_name):
-    result = (
-        sheet_service.values().get(spreadsheetId=sheet_id, range=range_name).execute()
-    )
-    return result
+def get_drive_service(creds):
+    from googleapiclient.discovery import build
+
+    return build("drive", "v3", credentials=creds)
+
+
+def get_sheet_revision(creds, sheet_id, drive_service=None):
+    # the Sheets API doesn't expose revisions, but Drive does
+    # returns None if the revision can't be determined,
+    #   e.g. because token.json was authorised before the drive.metadata.readonly scope was added
+    #   (delete token.json to re-authorise)
+    from googleapiclient.errors import HttpError
+
+    try:
+        if drive_service is None:
+            drive_service = get_drive_service(creds)
+        metadata = drive_service.files().get(fileId=sheet_id, fields="modifiedTime,version").execute()
+    except HttpError as e:
+        print(f"Can't determine revision of {sheet_id}, so cached snapshots won't be used: {e}")
+        return None
+    return f"{metadata.get('version')}@{metadata.get('modifiedTime')}"
+
+
+def get_gsheet_tab(sheet_service, sheet_id, range_name, cache_dir=None, revision=None, offline=False):
+    # one tab, through a SheetSession and so its snapshot cache, for callers that only want one
+    session = SheetSession(sheet_id=sheet_id, cache_dir=cache_dir, offline=offline, sheet_service=sheet_service,
+                           revision=revision)
+    return session.get_tabs([range_name])[range_name]
+
+
+def tab_rows(tab):
+    # the rows after the header, each exactly as wide as the header
+    #   the Sheets API leaves off trailing empty cells, which are filled with None, as pandas would
+    #   and cells past the last header have no column to go in, so they're dropped, with a note
+    header = tab["values"][0]
+    width = len(header)
+    padding = [None] * width
+    rows = []
+    dropped = 0
+    for row in tab["values"][1:]:
+        if len(row) > width:
+            dropped += any(cell not in ["", None] for cell in row[width:])
+            row = row[:width]
+        rows.append(row + padding[len(row):])
+    if dropped:
+        print(f"Ignoring the cells past the last header column in {dropped} rows of {tab.get('range', 'a tab')}")
+    return header, rows
+
+
+def tab_to_frame(tab):
+    import pandas as pd
+
+    # first row of the tab is the header, and the rows are numbered from 1 after it
+    header, rows = tab_rows(tab)
+    return pd.DataFrame(rows, columns=header, index=range(1, len(rows) + 1))
+
+
+def tab_to_records(tab):
+    # the same rows as tab_to_frame, as plain dicts
+    header, rows = tab_rows(tab)
+    return [dict(zip(header, row)) for row in rows]
+
+
+def tab_to_columns(tab):
+    # {column header: column values}, which get_ct_dol accepts in place of a frame
+    header, rows = tab_rows(tab)
+    return {column: [row[index] for row in rows] for index, column in enumerate(header)}
+
+
+class SheetSession:
+    """Authenticates and builds the Sheets client once,
+    then reads any number of ranges from the spreadsheet in one batchGet round trip.
+
+    Pass sheet_service (and optionally revision) to use a stand-in for the Sheets API."""
+
+    def __init__(self, client_secret_file="../google_api_credentials.json", sheet_id=IOT_SPREADSHEET_ID,
+                 cache_dir=None, offline=False, sheet_service=None, revision=None):
+        self.client_secret_file = client_secret_file
+        self.sheet_id = sheet_id
+        self.cache_dir = cache_dir
+        self.offline = offline
+        self._creds = None
+        self._sheet_service = sheet_service
+        self._drive_service = None
+        self._revision = revision
+        # an injected service comes without credentials for looking up revisions in Drive
+        self._injected = sheet_service is not None
+        # ranges served from cache_dir and ranges fetched from the Sheets API, for run metrics
+        self.snapshot_hits = 0
+        self.snapshot_misses = 0
+
+    @property
+    def creds(self):
+        if self._creds is None:
+            self._creds = get_creds(client_secret_file=self.client_secret_file)
+        return self._creds
+
+    @property
+    def sheet_service(self):
+        if self._sheet_service is None:
+            self._sheet_service = get_sheet_service(self.creds)
+        return self._sheet_service
+
+    @property
+    def drive_service(self):
+        if self._drive_service is None:
+            self._drive_service = get_drive_service(self.creds)
+        return self._drive_service
+
+    def get_revision(self):
+        # asked again on every call, so a long-lived session notices edits
+        if self._revision is not None:
+            return self._revision
+        if self._injected:
+            # stand-ins like LocalSheetService can tell their own revision
+            get_service_revision = getattr(self._sheet_service, "get_revision", None)
+            return get_service_revision() if get_service_revision is not None else None
+        if self.offline:
+            return None
+        return get_sheet_revision(self.creds, self.sheet_id, drive_service=self.drive_service)
+
+    def get_tabs(self, ranges):
+        # returns {range: Sheets API value range} in the order requested
+        tabs = {}
+        revision = None
+        if self.cache_dir is not None:
+            revision = self.get_revision()
+            for range_name in ranges:
+                tab = sc.load_tab_snapshot(self.cache_dir, self.sheet_id, range_name, revision=revision,
+                                           any_revision=self.offline)
+                if tab is not None:
+                    print(f"Using cached snapshot of {range_name}")
+                    tabs[range_name] = tab
+        missing = [range_name for range_name in ranges if range_name not in tabs]
+        self.snapshot_hits += len(tabs)
+        self.snapshot_misses += len(missing)
+        if missing and self.offline:
+            raise FileNotFoundError(f"No cached snapshot of {', '.join(missing)} in {self.cache_dir}")
+        if missing:
+            result = self.sheet_service.values().batchGet(spreadsheetId=self.sheet_id, ranges=missing).execute()
+            # valueRanges come back in request order
+            for range_name, value_range in zip(missing, result["valueRanges"]):
+                tabs[range_name] = value_range
+                if self.cache_dir is not None:
+                    sc.save_tab_snapshot(self.cache_dir, self.sheet_id, range_name, revision, value_range)
+        return {range_name: tabs[range_name] for range_name in ranges}
+
+    def get_frames(self, ranges):
+        return {range_name: tab_to_frame(tab) for range_name, tab in self.get_tabs(ranges).items()}
+
+    def get_iot_frames(self):
+        # glossary and controlled terms frames from one round trip
+        frames = self.get_frames([IOT_RANGE_NAME, CV_RANGE_NAME])
+        return frames[IOT_RANGE_NAME], frames[CV_RANGE_NAME]
+
+    def get_iot_tabs(self):
+        # the raw glossary and controlled terms tabs, for building records instead of frames
+        tabs = self.get_tabs([IOT_RANGE_NAME, CV_RANGE_NAME])
+        return tabs[IOT_RANGE_NAME], tabs[CV_RANGE_NAME]
+
+
+def local_sheet_id(path):
+    # what snapshots of a local file (--sheet-file or --workbook) are kept under, in place of the spreadsheet's ID,
+    #   so that they're never taken for snapshots of the spreadsheet, e.g. by --offline
+    return "file-" + hashlib.sha256(os.path.abspath(path).encode("utf-8")).hexdigest()[:16]
+
+
+class LocalSheetService:
+    """Stand-in for the Sheets API's spreadsheets() resource, serving the tabs in a local JSON file,
+    {range name: {"values": [[cell, ...], ...]}}, for trying out becli watch and for tests.
+
+    The revision is a hash of the file's content, so editing the file is like editing the spreadsheet."""
+
+    def __init__(self, path):
+        self.path = path
+        self.result = None
+
+    def get_revision(self):
+        with open(self.path, "rb") as sheet_file:
+            return "local-" + hashlib.sha256(sheet_file.read()).hexdigest()[:16]
+
+    def read_tabs(self):
+        with open(self.path) as sheet_file:
+            return json.load(sheet_file)
+
+    def values(self):
+        return self
+
+    def get(self, spreadsheetId, range):
+        self.result = self.read_tabs()[range]
+        return self
+
+    def batchGet(self, spreadsheetId, ranges):
+        tabs = self.read_tabs()
+        self.result = {"spreadsheetId": spreadsheetId, "valueRanges": [tabs[range_name] for range_name in ranges]}
+        return self
+
+    def execute(self):
+        return self.result
 
 
 # any benefit to doing this without pandas?
 #  lighter weight?
 #  harder to program?
 
-def get_iot_glossary_frame(client_secret_file="../google_api_credentials.json"):
-    creds = get_creds(client_secret_file=client_secret_file)
-    sheet_service = get_sheet_service(creds)
-    iot_glossary_tab = get_gsheet_tab(sheet_service, IOT_SPREADSHEET_ID, IOT_RANGE_NAME)
-    iot_glossary_frame = pd.DataFrame(iot_glossary_tab["values"], columns=iot_glossary_tab["values"][0]).drop(0)
-    return iot_glossary_frame
+def get_iot_glossary_frame(client_secret_file="../google_api_credentials.json", cache_dir=None, offline=False):
+    session = SheetSession(client_secret_file=client_secret_file, cache_dir=cache_dir, offline=offline)
+    return session.get_frames([IOT_RANGE_NAME])[IOT_RANGE_NAME]
 
 
-def get_iot_controlled_terms_frame(client_secret_file="../google_api_credentials.json"):
-    creds = get_creds(client_secret_file=client_secret_file)
-    sheet_service = get_sheet_service(creds)
-    controlled_terms_tab = get_gsheet_tab(sheet_service, IOT_SPREADSHEET_ID, CV_RANGE_NAME)
-    controlled_terms_frame = pd.DataFrame(controlled_terms_tab["values"],
-                                          columns=controlled_terms_tab["values"][0]).drop(0)
-    return controlled_terms_frame
+def get_iot_controlled_terms_frame(client_secret_file="../google_api_credentials.json", cache_dir=None,
+                                   offline=False):
+    session = SheetSession(client_secret_file=client_secret_file, cache_dir=cache_dir, offline=offline)
+    return session.get_frames([CV_RANGE_NAME])[CV_RANGE_NAME]
 
 
 def get_ct_dol(controlled_terms_frame):
+    # controlled_terms_frame may also be a dict of columns from tab_to_columns
     ct_dol = {k: [i for i in v if i] for (k, v) in controlled_terms_frame.items()}
     return ct_dol
 
@@ -151,131 +350,7 @@ def get_ct_keys(ct_dol):
 #     return slot_to_pack
 #
 #
-# # template_package(
-# #     "soil",
-# #     slot_to_package_df=slot_to_pack_4_dh,
-# #     slot_details_df=slot_details_4_dh,
-# #     enums_dict=ct_dol,
-# #     template_prefix=dh_template_prefix,
-# #     template_suffix=dh_template_suffix,
-# # )
-#
-# # required columns can be asserted without putting them in a section entitled "required" etc.
-# #   ie it might be possible to use the section for something orthogonal
-# # required_sections = ["sample identification", "required", "required where applicable"]
-#
-#
-# def template_package(
-#         current_package,
-#         slot_to_package_df,
-#         slot_details_df,
-#         enums_dict,
-#         template_prefix,
-#         slot_categories,
-#         ct_keys,
-#         required_sections=["sample identification", "required", "required where applicable"],
-#         dh_template_root="../../DataHarmonizer/template/",
-#         ref_temp_filename="reference_template.html",
-#         template_suffix="/data.tsv",
-#         blank_row={
-#             "Ontology ID": "",
-#             "parent class": "",
-#             "label": "",
-#             "datatype": "",
-#             "source": "",
-#             "data status": "",
-#             "requirement": "",
-#             "min value": "",
-#             "max value": "",
-#             "capitalize": "",
-#             "pattern": "",
-#             "description": "",
-#             "guidance": "",
-#             "examples": "",
-#         }
-#
-# ):
-#     print(current_package)
-#
-#     main_row_list = []
-#     enum_row_list = []
-#
-#     for i in slot_categories:
-#         current_row = blank_row.copy()
-#         current_row["label"] = i
-#         main_row_list.append(current_row)
-#
-#     package_slots = slot_to_package_df["slots"].loc[
-#         slot_to_package_df["package"] == current_package
-#         ]
-#     package_slots = package_slots.iloc[0]
-#     package_slots = package_slots.split(";")
-#
-#     for i in package_slots:
-#         current_details = slot_details_df.loc[slot_details_df["repaired_name"] == i]
-#         current_row = blank_row.copy()
-#         #     "Ontology ID"
-#         current_row["parent class"] = current_details["Category"].iloc[0]
-#         current_row["label"] = i
-#         current_row["datatype"] = "xs:token"
-#         # day resolution may not be specific enough
-#         if current_details["syntax"].iloc[0] == "{timestamp}":
-#             current_row["datatype"] = "xs:date"
-#         if current_details["syntax"].iloc[0] == "{float}":
-#             current_row["datatype"] = "xs:decimal"
-#         if current_details["syntax"].iloc[0] == "{value}":
-#             current_row["datatype"] = "xs:decimal"
-#         # {integer} doesn't actually = xs:nonNegativeInteger
-#         if current_details["syntax"].iloc[0] == "{integer}":
-#             current_row["datatype"] = "xs:nonNegativeInteger"
-#         if i == "unique_ID":
-#             current_row["datatype"] = "xs:unique"
-#         if current_details["syntax"].iloc[0] == "{float} {unit}":
-#             current_row["pattern"] = "^[+-]?([0-9]*[.])?[0-9]+ \S+$"
-#         #     "source": "",
-#         #     "data status": "",
-#         if current_details["Category"].iloc[0] in required_sections:
-#             current_row["requirement"] = "required"
-#         #     "min value": "",
-#         #     "max value": "",
-#         #     "capitalize": "",
-#         current_row["description"] = current_details["Column Header"].iloc[0]
-#         current_row["guidance"] = current_details["Guidance"].iloc[0]
-#         current_row["examples"] = current_details["syntax"].iloc[0]
-#         if i in ct_keys:
-#             current_row["datatype"] = "select"
-#             # map?
-#             # indent?
-#             current_enums = enums_dict[i]
-#             current_enums.sort()
-#             for j in current_enums:
-#                 current_enum_row = blank_row.copy()
-#                 current_enum_row["label"] = j
-#                 current_enum_row["parent class"] = i
-#                 enum_row_list.append(current_enum_row)
-#         main_row_list.append(current_row)
-#     print("\n")
-#
-#     current_frame = pd.DataFrame(main_row_list)
-#     enum_frame = pd.DataFrame(enum_row_list)
-#     assembled_frame = pd.concat([current_frame, enum_frame])
-#
-#     # # create directory if necessary
-#     # required_directory = template_prefix + current_package
-#     # # print(required_directory)
-#     # os.makedirs(required_directory, exist_ok=True)
-#     # # copy from soil directory to new required_directory?
-#     # ref_temp_src = dh_template_root + ref_temp_filename
-#     # ref_temp_dest = required_directory + "/" + ref_temp_filename
-#     # copyfile(ref_temp_src, ref_temp_dest)
-#     #
-#     # ref_temp_src = dh_template_root + "export.js"
-#     # ref_temp_dest = required_directory + "/" + "export.js"
-#     # copyfile(ref_temp_src, ref_temp_dest)
-#     #
-#     # # should escape characters that break filenames like whitespaces
-#     # current_template_file = required_directory + template_suffix
-#     # assembled_frame.to_csv(current_template_file, index=False, sep="\t")
+# template_package is now dh_export.TemplateIndex, which works from the generated schema
 
 
 def initialize_yaml():
@@ -0,0 +1,60 @@
+import hashlib
+import json
+import os
+import time
+
+# on-disk snapshots of Google Sheets tabs
+#   one JSON file per (spreadsheet ID, range), exactly as returned by the Sheets API,
+#   so frames built from a snapshot are identical to frames built from a live fetch
+#   manifest.json records which revision of the spreadsheet each snapshot came from
+
+MANIFEST_FILENAME = "manifest.json"
+
+
+def snapshot_key(sheet_id, range_name):
+    return hashlib.sha256(f"{sheet_id}\t{range_name}".encode("utf-8")).hexdigest()[:16]
+
+
+def read_manifest(cache_dir):
+    manifest_path = os.path.join(cache_dir, MANIFEST_FILENAME)
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path) as manifest_file:
+        return json.load(manifest_file)
+
+
+def write_json_atomic(path, content):
+    # write next to the destination and rename, so an interrupted run never leaves half a file
+    temp_path = path + ".tmp"
+    with open(temp_path, "w") as temp_file:
+        json.dump(content, temp_file)
+    os.replace(temp_path, path)
+
+
+def load_tab_snapshot(cache_dir, sheet_id, range_name, revision=None, any_revision=False):
+    """Returns the cached Sheets API result for range_name, or None.
+
+    A snapshot is only used if it was taken at the given revision,
+    unless any_revision is set (offline mode)."""
+    entry = read_manifest(cache_dir).get(snapshot_key(sheet_id, range_name))
+    if entry is None:
+        return None
+    if not any_revision and (revision is None or entry["revision"] != revision):
+        return None
+    snapshot_path = os.path.join(cache_dir, entry["file"])
+    if not os.path.exists(snapshot_path):
+        return None
+    with open(snapshot_path) as snapshot_file:
+        return json.load(snapshot_file)
+
+
+def save_tab_snapshot(cache_dir, sheet_id, range_name, revision, tab):
+    os.makedirs(cache_dir, exist_ok=True)
+    key = snapshot_key(sheet_id, range_name)
+    snapshot_filename = key + ".json"
+    write_json_atomic(os.path.join(cache_dir, snapshot_filename), tab)
+    manifest = read_manifest(cache_dir)
+    manifest[key] = {"sheet_id": sheet_id, "range": range_name, "revision": revision,
+                     "file": snapshot_filename, "rows": len(tab.get("values", [])),
+                     "fetched": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    write_json_atomic(os.path.join(cache_dir, MANIFEST_FILENAME), manifest)
@@ -0,0 +1,165 @@
+import os
+import random
+import time
+
+import yaml
+
+import iot_to_linkml.sheet2yaml as s2y
+
+# synthetic Index of Terms glossary, controlled terms and MIxS schema, for benchmarks and tests
+#   shaped like the real ones: ragged rows, "all" package lists, duplicated names
+#   (half of them resolvable) and controlled terms columns with a few repeated values
+
+glossary_header = ["position", "Column Header", "name", "mixs_6_slot_name", "Definition", "Guidance", "syntax",
+                   "multivalued", "Category", "Associated Packages", "Origin", "Notes", "GitHub Ticket"]
+categories = ["sample identification", "required", "required where applicable", "optional", "treatment", ""]
+syntaxes = ["", "{float} {unit}", "{text}", "{termLabel} {[termID]}", "{timestamp}", "{integer}"]
+mixs_ranges = ["string", "quantity value", "text value", "timestamp value"]
+
+
+def make_mixs_schema(slot_count=400, enum_count=20, enum_size=8, seed=0):
+    """A MIxS-like schema as a dict: slot_count slots named mixs_slot_<n>,
+    ranging over strings, value classes and enum_count enums of enum_size values."""
+    rnd = random.Random(seed)
+    enums = {f"mixs_enum_{index}_enum": {"permissible_values": {f"value {value}": {} for value in range(enum_size)}}
+             for index in range(enum_count)}
+    slots = {}
+    for index in range(slot_count):
+        if enums and rnd.random() < 0.2:
+            slot_range = rnd.choice(list(enums))
+        else:
+            slot_range = rnd.choice(mixs_ranges)
+        slots[f"mixs_slot_{index}"] = {
+            "title": f"mixs slot {index}",
+            "description": f"synthetic MIxS slot number {index}",
+            "comments": [f"comment on mixs slot {index}"],
+            "examples": [{"value": f"example {index}"}],
+            "see_also": [f"MIXS:{index:07d}"],
+            "slot_uri": f"MIXS:{index:07d}",
+            "pattern": rnd.choice(syntaxes[1:]),
+            "range": slot_range,
+            "required": rnd.random() < 0.1,
+            "recommended": rnd.random() < 0.2,
+            "multivalued": rnd.random() < 0.1,
+        }
+    return {
+        "id": "https://example.org/synthetic-mixs",
+        "name": "mixs",
+        "prefixes": {"linkml": "https://w3id.org/linkml/", "MIXS": "https://w3id.org/mixs/"},
+        "default_prefix": "MIXS",
+        "default_range": "string",
+        "imports": ["linkml:types"],
+        "classes": {
+            "attribute value": {},
+            "quantity value": {"is_a": "attribute value"},
+            "text value": {"is_a": "attribute value"},
+            "timestamp value": {"is_a": "attribute value"},
+        },
+        "enums": enums,
+        "slots": slots,
+    }
+
+
+def write_mixs_schema(directory, **kwargs):
+    # returns the path of mixs.yaml, for --mixs or mixs_index.load_mixs_index
+    os.makedirs(directory, exist_ok=True)
+    mixs_path = os.path.join(directory, "mixs.yaml")
+    with open(mixs_path, "w") as mixs_file:
+        yaml.safe_dump(make_mixs_schema(**kwargs), mixs_file, sort_keys=False)
+    return mixs_path
+
+
+def make_tabs(terms=2000, packages=15, all_rate=0.1, dupe_rate=0.02, ct_rate=0.1, enum_size=20, mixs_rate=0.5,
+              mixs_slot_count=400, seed=0):
+    """The glossary and controlled terms tabs, as {range name: Sheets API value range}.
+
+    terms is the number of distinct names, mixs_rate the share of them taken from make_mixs_schema's slots
+    (pass the same mixs_slot_count as its slot_count),
+    all_rate the share of rows associated with "all" packages,
+    dupe_rate the share of names that get a second row and ct_rate the share that get a controlled terms column
+    of enum_size values."""
+    rnd = random.Random(seed)
+    package_names = [f"package_{index}" for index in range(packages)]
+    mixs_names = [f"mixs_slot_{index}" for index in range(mixs_slot_count)]
+    mixs_terms = min(int(terms * mixs_rate), mixs_slot_count)
+    mixs_name_set = set(mixs_names)
+    names = rnd.sample(mixs_names, mixs_terms) + [f"iot_slot_{index}" for index in range(terms - mixs_terms)]
+    rnd.shuffle(names)
+
+    def associated_packages(chosen):
+        # the sheet isn't consistent about the space after the separator
+        return rnd.choice(["; ", ";"]).join(chosen)
+
+    def glossary_row(position, name, packs):
+        row = [str(position), name.replace("_", " "), name, name if name in mixs_name_set else "",
+               f"definition of {name}", rnd.choice(["", f"guidance for {name}"]), rnd.choice(syntaxes), "",
+               rnd.choice(categories), packs, rnd.choice(["MIxS", "EMSL", ""]), rnd.choice(["", "a note"]),
+               rnd.choice(["", "https://github.com/microbiomedata/IoT_to_linkml/issues/1"])]
+        # the Sheets API leaves off trailing empty cells
+        while row and row[-1] == "":
+            row.pop()
+        return row
+
+    rows = [glossary_header]
+    for name in names:
+        if rnd.random() < all_rate:
+            rows.append(glossary_row(len(rows), name, "all"))
+            continue
+        chosen = rnd.sample(package_names, rnd.randint(1, min(3, packages)))
+        rows.append(glossary_row(len(rows), name, associated_packages(chosen)))
+        if rnd.random() < dupe_rate:
+            # a subset of the first row's packages resolves in its favour, another package doesn't
+            others = [package for package in package_names if package not in chosen]
+            if others and rnd.random() < 0.5:
+                chosen = chosen[1:] + [rnd.choice(others)]
+            else:
+                chosen = chosen[:1]
+            rows.append(glossary_row(len(rows), name, associated_packages(chosen)))
+
+    ct_names = [name for name in names if rnd.random() < ct_rate]
+    ct_columns = []
+    for name in ct_names:
+        values = [f"{name} term {index}" for index in range(enum_size)]
+        # the occasional repeated value, which make_iot_yaml reports
+        if values and rnd.random() < 0.1:
+            values.append(values[0])
+        ct_columns.append(values)
+    ct_rows = [ct_names]
+    for index in range(max([len(column) for column in ct_columns], default=0)):
+        ct_row = [column[index] if index < len(column) else "" for column in ct_columns]
+        while ct_row and ct_row[-1] == "":
+            ct_row.pop()
+        ct_rows.append(ct_row)
+
+    return {s2y.IOT_RANGE_NAME: {"range": s2y.IOT_RANGE_NAME, "values": rows},
+            s2y.CV_RANGE_NAME: {"range": s2y.CV_RANGE_NAME, "values": ct_rows}}
+
+
+class FakeSheetService:
+    """In-process stand-in for the Sheets API's spreadsheets() resource, serving tabs from make_tabs.
+
+    delay seconds are spent on every request, to mimic the network round trip."""
+
+    def __init__(self, tabs, delay=0.0):
+        self.tabs = tabs
+        self.delay = delay
+        self.calls = []
+        self.result = None
+
+    def values(self):
+        return self
+
+    def get(self, spreadsheetId, range):
+        self.calls.append(("get", range))
+        self.result = self.tabs[range]
+        return self
+
+    def batchGet(self, spreadsheetId, ranges):
+        self.calls.append(("batchGet", tuple(ranges)))
+        self.result = {"spreadsheetId": spreadsheetId, "valueRanges": [self.tabs[r] for r in ranges]}
+        return self
+
+    def execute(self):
+        if self.delay:
+            time.sleep(self.delay)
+        return self.result
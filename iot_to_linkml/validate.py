@@ -0,0 +1,335 @@
+import csv
+import hashlib
+import re
+import sys
+from collections import Counter
+
+import iot_to_linkml.dh_export as dh
+import iot_to_linkml.ontology_index as oi
+
+# validates sample metadata TSVs against the schema that becli make writes,
+#   without going through generic LinkML validation
+# the schema is compiled once into a plan: a regex, a frozenset of permissible values and a required flag per slot
+# the TSV is read chunk_size rows at a time, and each chunk is checked a column at a time,
+#   and the result for each distinct value is remembered, so a value that repeats down a column
+#   (which most do) is only checked once
+# with an ontology index, {termLabel} {[termID]} values are also looked up in it, once per distinct value
+
+# the pattern of an IoT slot is the IoT syntax column, a template like {float} {unit}, not a regex,
+#   and so is the pattern of a MIxS slot here, the MIxS string serialization, like {PMID}|{DOI}|{URL}
+# these are the regexes for their placeholders
+syntax_placeholders = {
+    "float": r"[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?",
+    "value": r"[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?",
+    "integer": r"[+-]?\d+",
+    "unit": r"\S+",
+    "text": r".+",
+    "boolean": r"(?i:true|false|yes|no)",
+    "timestamp": r"\d{4}-\d{2}-\d{2}(?:[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:Z|[+-]\d{2}:?\d{2})?)?",
+    "date": r"\d{4}-\d{2}-\d{2}",
+    "termLabel": r"[^\[\]]+?",
+    "termID": r"[A-Za-z][\w.]*:[\w.\-]+",
+    "PMID": r"(?:PMID: *)?\d+",
+    "DOI": r"(?:doi: *)?10\.\d{4,9}/\S+",
+    "URL": r"https?://\S+",
+    "NCBI taxid": r"\d+",
+}
+# a placeholder is braces around a name, or around a bracketed name like {[termID]}
+placeholder = re.compile(r"\{(\[?[\w /.-]+\]?)\}")
+# cells are split into multiple values on this when the slot is multivalued
+multivalue_separator = re.compile(r" *[;|] *")
+# once a column has remembered this many distinct values, it starts again, to keep the memory bounded
+value_memo_limit = 100000
+# identifiers have to be remembered for the whole file to find repeats, so they're kept as 64-bit hashes,
+#   a few dozen bytes each however long the identifier is; 10 million rows take several hundred MB,
+#   and a collision, a false "is not unique", is about a 3 in a million chance at 10 million distinct identifiers
+
+
+class UntranslatableSyntax(Exception):
+    pass
+
+
+def syntax_regex(syntax):
+    """Translates an IoT or MIxS syntax template into a compiled regex for whole values,
+    or returns None if it has no placeholders or choice lists, or a placeholder that isn't in syntax_placeholders,
+    in which case the values aren't checked.
+
+    {[termID]} is a placeholder in literal brackets, | separates alternatives, [a|b|c] is a choice of literals,
+    {...} around anything but a placeholder groups it, and a space has to be there, as one or more spaces,
+    so that {float} {unit} doesn't take 15 or 12m."""
+    try:
+        regex, position, checked = syntax_part(syntax, 0)
+    except UntranslatableSyntax:
+        return None
+    if position != len(syntax) or not checked:
+        return None
+    try:
+        return re.compile(regex)
+    except re.error:
+        return None
+
+
+def syntax_part(syntax, position, closing=None):
+    # translates syntax from position up to the unmatched closing character (or the end),
+    #   returning the regex, the position after it, and whether it has anything other than literal text
+    alternatives = [[]]
+    checked = False
+    literal_start = position
+    while position < len(syntax):
+        character = syntax[position]
+        if character == closing:
+            break
+        if character in "{[|":
+            alternatives[-1].append(literal_regex(syntax[literal_start:position]))
+        if character == "{":
+            match = placeholder.match(syntax, position)
+            if match is not None:
+                alternatives[-1].append(placeholder_regex(match.group(1)))
+                position = match.end()
+            else:
+                group, position, _ = syntax_part(syntax, position + 1, "}")
+                if position >= len(syntax):
+                    raise UntranslatableSyntax(syntax)
+                alternatives[-1].append("(?:" + group + ")")
+                position += 1
+            checked = True
+        elif character == "[":
+            end = syntax.find("]", position)
+            if end < 0:
+                raise UntranslatableSyntax(syntax)
+            choices = [choice.strip() for choice in syntax[position + 1:end].split("|")]
+            alternatives[-1].append("(?:" + "|".join(literal_regex(choice) for choice in choices) + ")")
+            position = end + 1
+            checked = True
+        elif character == "|":
+            alternatives.append([])
+            position += 1
+        else:
+            position += 1
+            continue
+        literal_start = position
+    alternatives[-1].append(literal_regex(syntax[literal_start:position]))
+    return "|".join("(?:" + "".join(parts) + ")" for parts in alternatives), position, checked
+
+
+def placeholder_regex(name):
+    name = name.strip()
+    bracketed = name.startswith("[") and name.endswith("]")
+    if bracketed:
+        name = name[1:-1]
+    if name not in syntax_placeholders:
+        raise UntranslatableSyntax(name)
+    part = syntax_placeholders[name]
+    return r"\[" + part + r"\]" if bracketed else "(?:" + part + ")"
+
+
+def literal_regex(text):
+    return "".join(r"\s+" if part.isspace() else re.escape(part) for part in re.split(r"(\s+)", text) if part)
+
+
+def slot_regex(slot_def):
+    pattern = dh.cell_text(slot_def.get('pattern'))
+    if pattern == "":
+        return None
+    if pattern.startswith("^") or pattern.endswith("$"):
+        # a real regex, as some MIxS versions have
+        try:
+            return re.compile(pattern)
+        except re.error:
+            return None
+    # IoT syntax, and the MIxS string serializations that this tree's MIxS puts in pattern, are both templates
+    # the ontology prefix in CHEBI {termLabel} {[termID]} isn't part of the value, see SlotCheck.term_problem
+    return syntax_regex(oi.term_syntax.sub("{termLabel} {[termID]}", pattern))
+
+
+class SlotCheck:
+    """What a submitted value for one slot has to satisfy."""
+
+    def __init__(self, slot, slot_def, enums, ontology_index=None):
+        self.slot = slot
+        self.required = bool(slot_def.get('required'))
+        self.identifier = bool(slot_def.get('identifier'))
+        self.multivalued = dh.cell_text(slot_def.get('multivalued')) in ["True", "true"]
+        self.enum = None
+        enum_name = slot_def.get('range')
+        if enum_name in enums:
+            self.enum = frozenset(str(value) for value in dh.permissible_values(enums[enum_name] or {}))
+        self.regex = None if self.enum is not None else slot_regex(slot_def)
+        self.ontology_index = None
+        # the ontologies the terms have to come from, or empty for any
+        self.term_prefixes = None
+        if self.regex is not None and ontology_index is not None:
+            self.term_prefixes = oi.term_prefixes(dh.cell_text(slot_def.get('pattern')))
+            if self.term_prefixes is not None:
+                self.ontology_index = ontology_index
+
+    def term_problem(self, value):
+        # checks every "label [CURIE]" in the value, since the term can be one part of a compound syntax
+        for match in oi.term_in_value.finditer(value):
+            label, curie = match.group("label"), match.group("id")
+            prefix = oi.curie_prefix(curie)
+            if self.term_prefixes and prefix not in self.term_prefixes:
+                return f"not a term from {', '.join(sorted(self.term_prefixes))}"
+            if not self.ontology_index.has_prefix(prefix):
+                # nothing to check it against
+                continue
+            term = self.ontology_index.get_term(curie)
+            if term is None:
+                return "not a term in the ontologies"
+            if term[2]:
+                return "an obsolete term"
+            if label.strip().lower() != term[1].lower():
+                return f"doesn't have the term's label, {term[1]}"
+        return None
+
+    def problem(self, value):
+        """Returns what's wrong with a non-empty value, or None."""
+        values = [value]
+        if self.multivalued and self.one_problem(value) is not None:
+            # the separators can be part of a single value too, e.g. {text};{float} {unit}
+            values = multivalue_separator.split(value)
+        for one_value in values:
+            problem = self.one_problem(one_value)
+            if problem is not None:
+                return problem
+        return None
+
+    def one_problem(self, one_value):
+        if self.enum is not None and one_value not in self.enum:
+            return "not a permissible value"
+        if self.regex is not None and not self.regex.fullmatch(one_value):
+            return "doesn't match the pattern"
+        if self.ontology_index is not None:
+            return self.term_problem(one_value)
+        return None
+
+
+class ValidationPlan:
+    """A generated schema compiled for validating submissions, once per schema rather than once per row."""
+
+    def __init__(self, schema, ontology_index=None):
+        enums = schema.get('enums') or {}
+        self.packages = {name: list(class_def.get('slots') or []) for name, class_def in
+                         (schema.get('classes') or {}).items() if dh.is_package(class_def or {})}
+        self.checks = {slot: SlotCheck(slot, slot_def or {}, enums, ontology_index)
+                       for slot, slot_def in (schema.get('slots') or {}).items()}
+
+    def required_slots(self, package):
+        return [slot for slot in self.packages[package] if slot in self.checks and self.checks[slot].required]
+
+
+class ValidationReport:
+    def __init__(self, max_errors=100):
+        self.max_errors = max_errors
+        self.rows = 0
+        self.error_count = 0
+        self.errors = []
+        self.column_errors = Counter()
+        self.unknown_columns = []
+        self.missing_columns = []
+
+    def add(self, row_number, column, value, message):
+        self.error_count += 1
+        self.column_errors[column] += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append((row_number, column, value, message))
+
+    @property
+    def valid(self):
+        return self.error_count == 0 and not self.missing_columns
+
+    def summary(self):
+        lines = [f"{self.rows} rows, {self.error_count} invalid values"]
+        if self.missing_columns:
+            lines.append(f"missing required columns: {', '.join(self.missing_columns)}")
+        if self.unknown_columns:
+            lines.append(f"columns that aren't slots, not checked: {', '.join(self.unknown_columns)}")
+        for row_number, column, value, message in self.errors:
+            lines.append(f"  row {row_number}, {column}: {value!r} {message}")
+        if self.error_count > len(self.errors):
+            lines.append(f"  ... and {self.error_count - len(self.errors)} more")
+        for column, count in self.column_errors.most_common():
+            lines.append(f"{column}: {count} invalid")
+        return "\n".join(lines)
+
+
+def read_chunks(reader, chunk_size):
+    chunk = []
+    for row in reader:
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def id_hash(value):
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def check_column(check, column, values, first_row, memo, seen_ids, report):
+    # memo maps each distinct value this column has already checked to its problem
+    # seen_ids is the id_hash of every identifier seen so far in the column
+    if len(memo) > value_memo_limit:
+        memo.clear()
+    for offset, value in enumerate(values):
+        if value == "":
+            if check.required:
+                report.add(first_row + offset, column, value, "is required")
+            continue
+        if value not in memo:
+            memo[value] = check.problem(value)
+        if memo[value] is not None:
+            report.add(first_row + offset, column, value, memo[value])
+        if check.identifier:
+            value_hash = id_hash(value)
+            if value_hash in seen_ids:
+                report.add(first_row + offset, column, value, "is not unique")
+            seen_ids.add(value_hash)
+
+
+def validate_tsv(plan, tsv_file, package=None, chunk_size=10000, max_errors=100):
+    """Checks a submission TSV (an open file) against a ValidationPlan, a chunk of rows at a time.
+
+    With a package, the package's required slots must have columns too.
+    Returns a ValidationReport."""
+    report = ValidationReport(max_errors)
+    reader = csv.reader(tsv_file, delimiter="\t")
+    header = next(reader, [])
+    columns = {}
+    for index, column in enumerate(header):
+        if column in plan.checks:
+            columns[index] = column
+        else:
+            report.unknown_columns.append(column)
+    if package is not None:
+        report.missing_columns = [slot for slot in plan.required_slots(package) if slot not in header]
+
+    memos = {index: {} for index in columns}
+    seen_ids = {index: set() for index in columns if plan.checks[columns[index]].identifier}
+    # row numbers count the header as row 1, like a spreadsheet
+    first_row = 2
+    for chunk in read_chunks(reader, chunk_size):
+        for index, column in columns.items():
+            values = [row[index] if index < len(row) else "" for row in chunk]
+            check_column(plan.checks[column], column, values, first_row, memos[index], seen_ids.get(index), report)
+        first_row += len(chunk)
+        report.rows += len(chunk)
+    return report
+
+
+def validate_file(schema_path, tsv_path, package=None, chunk_size=10000, max_errors=100, ontologies=(),
+                  cache_dir='.iot_cache'):
+    ontology_index = oi.open_ontology_index(ontologies, cache_dir) if ontologies else None
+    try:
+        plan = ValidationPlan(dh.load_schema(schema_path), ontology_index)
+        if package is not None and package not in plan.packages:
+            raise ValueError(f"{package} is not a package in {schema_path}")
+        # csv needs the fields to be able to hold long free text
+        csv.field_size_limit(sys.maxsize)
+        with open(tsv_path, newline="") as tsv_file:
+            return validate_tsv(plan, tsv_file, package=package, chunk_size=chunk_size, max_errors=max_errors)
+    finally:
+        if ontology_index is not None:
+            ontology_index.close()
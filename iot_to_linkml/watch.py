@@ -0,0 +1,105 @@
+import time
+
+import iot_to_linkml.incremental as inc
+import iot_to_linkml.mixs_index as mi
+import iot_to_linkml.pipeline as pl
+
+# becli watch: one long-running process instead of a cron job,
+#   so credentials, the Sheets client and the MIxS index are only set up once
+# every poll asks Drive for the spreadsheet's revision and stats the MIxS sources,
+#   and only regenerates iot.yaml when one of them has changed and then stayed put for the debounce period
+
+
+class Watcher:
+    """Regenerates yamlout when the spreadsheet's revision or the MIxS sources change.
+
+    The tabs of the last revision are kept in memory, so a MIxS-only change doesn't refetch them.
+    clock is only there so that tests can stand in for time.monotonic."""
+
+    def __init__(self, session, mixs_path, yamlout, idcol='Globally Unique ID', cache_dir='.iot_cache',
+                 incremental=False, engine='pandas', intern_enums=False, artifacts=(),
+                 induced_slots=None, self_contained=False, ontologies=(), debounce=10.0, clock=time.monotonic):
+        self.session = session
+        self.mixs_path = mixs_path
+        self.yamlout = yamlout
+        self.idcol = idcol
+        self.cache_dir = cache_dir
+        self.incremental = incremental
+        self.engine = engine
+        self.intern_enums = intern_enums
+        self.artifacts = artifacts
+        self.induced_slots = induced_slots
+        self.self_contained = self_contained
+        self.ontologies = ontologies
+        self.debounce = debounce
+        self.clock = clock
+        self.mixs_index = None
+        self.mixs_stat = None
+        # (revision, tabs) of the last fetch
+        self.last_tabs = None
+        # (revision, MIxS source hash) that yamlout was last built from
+        self.built_inputs = None
+        self.pending_inputs = None
+        self.pending_since = None
+        self.builds = 0
+
+    def check_mixs(self):
+        # statting is cheap; the sources are only hashed (and the index only reloaded) when a file was touched
+        mixs_stat = mi.stat_mixs_sources(self.mixs_path)
+        if mixs_stat != self.mixs_stat:
+            self.mixs_index = mi.load_mixs_index(self.mixs_path, cache_dir=self.cache_dir)
+            self.mixs_stat = mixs_stat
+        return self.mixs_index.source_hash
+
+    def get_tabs(self, revision):
+        if self.last_tabs is None or self.last_tabs[0] != revision:
+            self.last_tabs = (revision, self.session.get_iot_tabs())
+        return self.last_tabs[1]
+
+    def check_sheet(self):
+        revision = self.session.get_revision()
+        if revision is None:
+            # without a revision, only the content can tell whether the sheet changed
+            tabs = self.session.get_iot_tabs()
+            revision = "content-" + inc.hash_json(tabs)
+            self.last_tabs = (revision, tabs)
+        return revision
+
+    def poll(self):
+        """Checks for changes once, and regenerates yamlout if it's time to.
+
+        Returns True if yamlout was regenerated."""
+        inputs = (self.check_sheet(), self.check_mixs())
+        if inputs == self.built_inputs:
+            self.pending_inputs = None
+            return False
+        # the first build doesn't wait
+        if self.built_inputs is not None and self.debounce > 0:
+            now = self.clock()
+            if inputs != self.pending_inputs:
+                print(f"Change detected, regenerating once nothing has changed for {self.debounce} seconds")
+                self.pending_inputs = inputs
+                self.pending_since = now
+                return False
+            if now - self.pending_since < self.debounce:
+                return False
+
+        glossary_tab, ct_tab = self.get_tabs(inputs[0])
+        pl.build_iot_yaml(glossary_tab, ct_tab, self.mixs_index, self.yamlout, idcol=self.idcol,
+                          cache_dir=self.cache_dir, incremental=self.incremental, engine=self.engine,
+                          intern_enums=self.intern_enums, artifacts=self.artifacts, induced_slots=self.induced_slots,
+                          self_contained=self.self_contained, ontologies=self.ontologies)
+        self.built_inputs = inputs
+        self.pending_inputs = None
+        self.builds += 1
+        return True
+
+    def run(self, interval):
+        print(f"Watching for changes every {interval} seconds, stop with Ctrl-C")
+        while True:
+            try:
+                self.poll()
+            except Exception as e:
+                # e.g. a network error; try again at the next poll rather than stopping the watch
+                print(f"Check failed, will retry: {e!r}")
+            time.sleep(interval)
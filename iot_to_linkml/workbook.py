@@ -0,0 +1,170 @@
+import datetime
+import hashlib
+import zipfile
+from xml.etree.ElementTree import iterparse
+
+# reads the Index of Terms tabs from an XLSX or ODS export of the spreadsheet, instead of from the Sheets API
+# the sheets are read a row at a time (openpyxl's read-only mode, or the ODS content.xml as a stream of XML events),
+#   so the workbook is never all in memory, and only the sheets that are asked for are turned into rows
+# every column is read, whatever the A1:Z in the range name says
+# the rows come out as the Sheets API returns them: cells as strings, without trailing empty cells or rows
+
+ods_table = "{urn:oasis:names:tc:opendocument:xmlns:table:1.0}"
+ods_text = "{urn:oasis:names:tc:opendocument:xmlns:text:1.0}"
+
+
+def sheet_name(range_name):
+    # "Glossary of terms!A1:Z" -> Glossary of terms
+    return range_name.split("!", 1)[0].strip("'")
+
+
+def cell_string(value):
+    # roughly how Google Sheets would show a cell from an XLSX
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, datetime.datetime) and value.time() == datetime.time(0):
+        return value.date().isoformat()
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return str(value)
+
+
+def trim_rows(repeated_rows):
+    # takes (row, times repeated) and drops the trailing empty cells of every row and the trailing empty rows,
+    #   holding back runs of empty rows until a non-empty row shows they aren't trailing
+    empty_rows = 0
+    for row, repeat in repeated_rows:
+        while row and row[-1] == "":
+            row.pop()
+        if not row:
+            empty_rows += repeat
+            continue
+        for _ in range(empty_rows):
+            yield []
+        empty_rows = 0
+        for _ in range(repeat):
+            yield list(row)
+
+
+def read_xlsx_rows(path, sheet):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        if sheet not in workbook.sheetnames:
+            raise KeyError(f"{path} has no sheet named {sheet}")
+        for row in trim_rows(([cell_string(value) for value in values], 1)
+                             for values in workbook[sheet].iter_rows(values_only=True)):
+            yield row
+    finally:
+        workbook.close()
+
+
+def ods_text_of(element):
+    # an ODS paragraph's text, with <text:s text:c="3"/> as spaces, through any spans and links in it
+    parts = [element.text or ""]
+    for child in element:
+        if child.tag == ods_text + "s":
+            parts.append(" " * int(child.get(ods_text + "c", "1")))
+        elif child.tag == ods_text + "tab":
+            parts.append("\t")
+        elif child.tag == ods_text + "line-break":
+            parts.append("\n")
+        else:
+            parts.append(ods_text_of(child))
+        parts.append(child.tail or "")
+    return "".join(parts)
+
+
+def ods_cell_text(cell):
+    # only the cell's own paragraphs, not those of any comment on it
+    return "\n".join(ods_text_of(paragraph) for paragraph in cell.findall(ods_text + "p"))
+
+
+def ods_row(row_element):
+    cells = []
+    for cell in row_element:
+        if cell.tag not in [ods_table + "table-cell", ods_table + "covered-table-cell"]:
+            continue
+        repeat = int(cell.get(ods_table + "number-columns-repeated", "1"))
+        cells.append((ods_cell_text(cell), repeat))
+    # ODS pads rows out to the last column of the sheet with one repeated empty cell, which isn't expanded
+    while cells and cells[-1][0] == "":
+        cells.pop()
+    return [text for text, repeat in cells for _ in range(repeat)]
+
+
+def read_ods_rows(path, sheet):
+    def rows():
+        found = False
+        current = None
+        with zipfile.ZipFile(path) as ods_zip, ods_zip.open("content.xml") as content:
+            for event, element in iterparse(content, events=("start", "end")):
+                if event == "start":
+                    if element.tag == ods_table + "table":
+                        current = element.get(ods_table + "name")
+                        found = found or current == sheet
+                    continue
+                if element.tag == ods_table + "table-row":
+                    if current == sheet:
+                        # a run of empty rows, e.g. down to the bottom of the sheet, is one repeated row
+                        yield ods_row(element), int(element.get(ods_table + "number-rows-repeated", "1"))
+                    element.clear()
+                elif element.tag == ods_table + "table":
+                    if current == sheet:
+                        return
+                    element.clear()
+        if not found:
+            raise KeyError(f"{path} has no sheet named {sheet}")
+
+    return trim_rows(rows())
+
+
+def read_sheet_rows(path, sheet):
+    """Yields the rows of one sheet of an .xlsx or .ods workbook, as lists of strings."""
+    if path.endswith(".ods"):
+        return read_ods_rows(path, sheet)
+    if path.endswith((".xlsx", ".xlsm")):
+        return read_xlsx_rows(path, sheet)
+    raise ValueError(f"don't know how to read {path}; expected .xlsx or .ods")
+
+
+class WorkbookSheetService:
+    """Stand-in for the Sheets API's spreadsheets() resource, like sheet2yaml.LocalSheetService,
+    serving the sheets of an XLSX or ODS export of the Index of Terms.
+
+    The revision is a hash of the file's content, so a new export is like an edit to the spreadsheet."""
+
+    def __init__(self, path):
+        self.path = path
+        self.result = None
+
+    def get_revision(self):
+        workbook_hash = hashlib.sha256()
+        with open(self.path, "rb") as workbook_file:
+            for block in iter(lambda: workbook_file.read(1 << 20), b""):
+                workbook_hash.update(block)
+        return "workbook-" + workbook_hash.hexdigest()[:16]
+
+    def value_range(self, range_name):
+        return {"range": range_name, "majorDimension": "ROWS",
+                "values": list(read_sheet_rows(self.path, sheet_name(range_name)))}
+
+    def values(self):
+        return self
+
+    def get(self, spreadsheetId, range):
+        self.result = self.value_range(range)
+        return self
+
+    def batchGet(self, spreadsheetId, ranges):
+        self.result = {"spreadsheetId": spreadsheetId,
+                       "valueRanges": [self.value_range(range_name) for range_name in ranges]}
+        return self
+
+    def execute(self):
+        return self.result
@@ -0,0 +1,30 @@
+import json
+
+import pytest
+
+import iot_to_linkml.synthetic as sy
+
+
+class FakeClock:
+    # stands in for time.monotonic; tests move it on by setting now
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def write_synthetic_sheet(path, terms):
+    # a --sheet-file JSON of a small synthetic Index of Terms, for LocalSheetService
+    with open(path, "w") as sheet_file:
+        json.dump(sy.make_tabs(terms=terms, packages=3, mixs_slot_count=20), sheet_file)
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def write_sheet():
+    return write_synthetic_sheet
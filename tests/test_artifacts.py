@@ -0,0 +1,83 @@
+import ast
+
+import yaml
+
+import iot_to_linkml.artifacts as art
+import iot_to_linkml.emitter as em
+import iot_to_linkml.mixs_index as mi
+import iot_to_linkml.pipeline as pl
+import iot_to_linkml.sheet2yaml as s2y
+import iot_to_linkml.synthetic as sy
+
+made_yaml = {
+    "name": "IndexOfTerms", "id": "http://example.com/IoT",
+    "prefixes": {"linkml": "https://w3id.org/linkml/"}, "imports": ["linkml:types"], "default_range": "string",
+    "classes": {"soil": {"slots": ["depth", "tillage"]}},
+    "slots": {"depth": {"description": "how deep", "required": True}, "tillage": {"range": "tillage_enum"}},
+    "enums": {"tillage_enum": {"permissible_values": ["cutting disc", "drill"]}},
+}
+
+
+def write_schema(path, schema):
+    with open(path, "w") as schema_file:
+        em.dump_schema(schema, schema_file)
+
+
+def test_artifacts_match_the_yaml(tmp_path):
+    yaml_path = str(tmp_path / "iot.yaml")
+    write_schema(yaml_path, made_yaml)
+    assert art.write_artifacts(made_yaml, yaml_path, ["json", "pickle"]) == [str(tmp_path / "iot.json"),
+                                                                            str(tmp_path / "iot.pickle")]
+
+    schema, source_path = art.load_schema_dict(yaml_path)
+    assert source_path == str(tmp_path / "iot.json")
+    assert schema == yaml.safe_load(open(yaml_path))
+    schema_definition, source_path = art.load_schema_definition(yaml_path)
+    assert source_path == str(tmp_path / "iot.pickle")
+    assert sorted(schema_definition.slots) == ["depth", "tillage"]
+    assert art.load_schema_view(yaml_path).get_slot("depth").required is True
+
+    # once the YAML changes, the artifacts are stale and the YAML itself is read
+    changed = dict(made_yaml, name="Changed")
+    write_schema(yaml_path, changed)
+    assert art.load_schema_dict(yaml_path) == (changed, yaml_path)
+    assert art.load_schema_definition(yaml_path)[0].name == "Changed"
+
+
+def test_generated_schema_round_trips(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    mixs_path = sy.write_mixs_schema(str(tmp_path / "mixs"), slot_count=20, enum_count=2)
+    tabs = sy.make_tabs(terms=30, packages=3, mixs_slot_count=20)
+    glossary_tab, ct_tab = s2y.SheetSession(revision="rev1", sheet_service=sy.FakeSheetService(tabs)).get_iot_tabs()
+    yaml_path = str(tmp_path / "iot.yaml")
+    pl.build_iot_yaml(glossary_tab, ct_tab, mi.load_mixs_index(mixs_path, cache_dir=str(tmp_path / "cache")),
+                      yaml_path, cache_dir=str(tmp_path / "cache"), artifacts=("json", "pickle"))
+    generated = yaml.safe_load(open(yaml_path))
+    # the YAML keeps see_also as generate.build_slot writes it, but the SchemaDefinition has the list
+    mixs_slot, see_also = next((slot, slot_def["see_also"]) for slot, slot_def in generated["slots"].items()
+                               if "see_also" in slot_def)
+    assert see_also.startswith("['MIXS:")
+
+    schema_definition, source_path = art.load_schema_definition(yaml_path)
+    assert source_path == str(tmp_path / "iot.pickle")
+    assert sorted(schema_definition.slots) == sorted(generated["slots"])
+    assert schema_definition.slots[mixs_slot].see_also == ast.literal_eval(see_also)
+    schema_view = art.load_schema_view(yaml_path)
+    assert sorted(schema_view.all_classes()) == sorted(generated["classes"])
+
+    # and without the pickle, the same comes from the YAML
+    (tmp_path / "iot.pickle").unlink()
+    schema_definition, source_path = art.load_schema_definition(yaml_path)
+    assert source_path == str(tmp_path / "iot.json")
+    assert schema_definition.slots[mixs_slot].see_also == ast.literal_eval(see_also)
+
+
+def test_induced_slots_artifact(tmp_path):
+    yaml_path = str(tmp_path / "iot.yaml")
+    write_schema(yaml_path, made_yaml)
+    assert art.load_induced_slots(yaml_path) is None
+    induced = {"soil": {"depth": {"required": True, "recommended": False, "range": "string"}}}
+    assert art.write_induced_slots(induced, yaml_path) == str(tmp_path / "iot.induced.json")
+    assert art.load_induced_slots(yaml_path) == induced
+    write_schema(yaml_path, dict(made_yaml, name="Changed"))
+    assert art.load_induced_slots(yaml_path) is None
@@ -0,0 +1,25 @@
+import sys
+
+from click.testing import CliRunner
+
+from iot_to_linkml.becli import cli
+
+
+def test_default_command():
+    runner = CliRunner()
+    for help_option in ["--help", "-h"]:
+        result = runner.invoke(cli, [help_option])
+        assert result.exit_code == 0
+        assert "Commands:" in result.output and "validate" in result.output
+    # an option goes to make, but a name that isn't a command is an error
+    result = runner.invoke(cli, ["--yamlout", "x.yaml", "--help"])
+    assert result.exit_code == 0 and "--sequential-inputs" in result.output
+    result = runner.invoke(cli, ["nonesuch"])
+    assert result.exit_code != 0 and "No such command" in result.output
+
+
+def test_engine_pandas_needs_pandas(monkeypatch):
+    # None in sys.modules is what an uninstalled package looks like to find_spec
+    monkeypatch.setitem(sys.modules, "pandas", None)
+    result = CliRunner().invoke(cli, ["make", "--engine", "pandas"])
+    assert result.exit_code == 2 and "pandas isn't installed" in result.output
@@ -0,0 +1,68 @@
+import csv
+
+import yaml
+from click.testing import CliRunner
+
+import iot_to_linkml.dh_export as dh
+from iot_to_linkml.becli import cli
+
+schema = {
+    "classes": {
+        "soil": {"slots": ["samp_name", "depth", "tillage", "sample_kind"]},
+        "water": {"slots": ["samp_name", "tillage"]},
+        "quantity value": {"is_a": "attribute value", "from_schema": "https://example.org/core", "slots": ["unit"]},
+    },
+    "slots": {
+        "samp_name": {"is_a": "sample identification", "required": True, "identifier": True, "title": "sample name"},
+        "depth": {"is_a": "optional", "pattern": "{float} {unit}", "comments": ["one", "two"], "range": "None"},
+        "tillage": {"is_a": "optional", "range": "tillage_enum", "comments": "pick one"},
+        "sample_kind": {"is_a": "optional", "range": "sample_kind_enum", "pattern": "None"},
+        "optional": {},
+        "sample identification": {},
+    },
+    "enums": {
+        "tillage_enum": {"permissible_values": ["drill", "cutting disc"]},
+        "sample_kind_enum": {"permissible_values": {"soil": {"text": "soil"}, "water": {"text": "water"}}},
+    },
+}
+
+
+def read_template(path):
+    with open(path, newline="") as template_file:
+        return list(csv.DictReader(template_file, delimiter="\t"))
+
+
+def test_template_rows():
+    template_index = dh.TemplateIndex(schema)
+    assert list(template_index.packages) == ["soil", "water"]
+
+    rows = list(csv.DictReader(template_index.template("soil").splitlines(), delimiter="\t"))
+    assert list(rows[0]) == dh.template_columns
+    assert [(row["parent class"], row["label"]) for row in rows] == [
+        ("", "optional"), ("", "sample identification"),
+        ("sample identification", "samp_name"), ("optional", "depth"), ("optional", "tillage"),
+        ("optional", "sample_kind"),
+        ("tillage", "cutting disc"), ("tillage", "drill"), ("sample_kind", "soil"), ("sample_kind", "water")]
+    by_label = {row["label"]: row for row in rows}
+    assert (by_label["samp_name"]["datatype"], by_label["samp_name"]["requirement"]) == ("xs:unique", "required")
+    assert by_label["depth"]["pattern"] == dh.syntax_patterns["{float} {unit}"]
+    assert by_label["depth"]["guidance"] == "one|two"
+    assert (by_label["tillage"]["datatype"], by_label["sample_kind"]["examples"]) == ("select", "")
+
+
+def test_becli_templates(tmp_path):
+    schema_path = tmp_path / "iot.yaml"
+    schema_path.write_text(yaml.safe_dump(schema))
+    out_dir = tmp_path / "templates"
+    result = CliRunner().invoke(cli, ["templates", "--yamlout", str(schema_path), "--out-dir", str(out_dir)])
+    assert result.exit_code == 0, result.output
+    water = read_template(out_dir / "water" / dh.template_filename)
+    assert [row["label"] for row in water] == ["optional", "sample identification", "samp_name", "tillage",
+                                              "cutting disc", "drill"]
+    assert (out_dir / "soil" / dh.template_filename).exists()
+    assert not (out_dir / "quantity_value").exists()
+
+    result = CliRunner().invoke(cli, ["templates", "--yamlout", str(schema_path), "--out-dir", str(out_dir),
+                                      "--package", "sediment"])
+    assert result.exit_code == 2
+    assert "sediment" in result.output
@@ -0,0 +1,52 @@
+import pandas as pd
+
+from iot_to_linkml.duplicates import resolve_duplicate_names, resolve_duplicate_records
+from iot_to_linkml.glossary import PackageMembership
+
+rows = [
+    {'name': 'samp_name', 'Guidance': 'only row', 'packlist': ['soil']},
+    {'name': 'depth', 'Guidance': 'fewer', 'packlist': ['soil']},
+    {'name': 'depth', 'Guidance': 'more', 'packlist': ['soil', 'water']},
+    {'name': 'temp', 'Guidance': 'a', 'packlist': ['soil']},
+    {'name': 'temp', 'Guidance': 'b', 'packlist': ['water']},
+    {'name': 'ph', 'Guidance': 'c', 'packlist': ['soil', 'water', 'sediment']},
+    {'name': 'ph', 'Guidance': 'd', 'packlist': ['water']},
+    {'name': 'ph', 'Guidance': 'e', 'packlist': float('nan')},
+    {'name': 'ph', 'Guidance': 'f', 'packlist': ['sediment', 'soil']},
+]
+
+
+def test_resolve_duplicate_names():
+    frame = pd.DataFrame(rows)
+    dupe_no_frame, dupe_unresolved_frame, report = resolve_duplicate_names(frame)
+    kept = dict(zip(dupe_no_frame['name'], dupe_no_frame['Guidance']))
+    assert kept == {'samp_name': 'only row', 'depth': 'more', 'ph': 'c'}
+    assert list(dupe_unresolved_frame['Guidance']) == ['a', 'b']
+    assert [(group['name'], group['rows'], group['resolved']) for group in report] == [
+        ('depth', 2, True), ('ph', 4, True), ('temp', 2, False)]
+    assert report[2]['packages_only_in_other_rows'] == ['water']
+
+
+def test_resolve_without_duplicates():
+    frame = pd.DataFrame(rows[:2])
+    dupe_no_frame, dupe_unresolved_frame, report = resolve_duplicate_names(frame)
+    assert len(dupe_no_frame.index) == 2
+    assert dupe_unresolved_frame.empty
+    assert report == []
+
+
+def test_resolve_with_package_masks():
+    membership = PackageMembership(['sediment', 'soil', 'water'])
+    frame = pd.DataFrame(rows)
+    frame['packmask'] = pd.Series([membership.mask(packlist) for packlist in frame.pop('packlist')], dtype=object)
+    dupe_no_frame, dupe_unresolved_frame, report = resolve_duplicate_names(frame, membership=membership)
+    assert dict(zip(dupe_no_frame['name'], dupe_no_frame['Guidance'])) == {'samp_name': 'only row', 'depth': 'more',
+                                                                            'ph': 'c'}
+    assert report[2]['packages_only_in_other_rows'] == ['water']
+
+    records = frame.to_dict(orient="records")
+    dupe_no_records, dupe_unresolved_records, records_report = resolve_duplicate_records(records,
+                                                                                         membership=membership)
+    assert [record['Guidance'] for record in dupe_unresolved_records] == ['a', 'b']
+    assert [group['packages_only_in_other_rows'] for group in records_report] == [
+        group['packages_only_in_other_rows'] for group in report]
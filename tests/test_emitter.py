@@ -0,0 +1,48 @@
+import io
+import os
+
+import yaml
+
+from iot_to_linkml import emitter
+
+
+def reference_dump(made_yaml):
+    return yaml.dump(made_yaml, default_flow_style=False, sort_keys=False)
+
+
+def streamed_dump(made_yaml):
+    stream = io.StringIO()
+    emitter.dump_schema(made_yaml, stream)
+    return stream.getvalue()
+
+
+def test_committed_iot_yaml_round_trips_byte_for_byte():
+    iot_yaml_path = os.path.join(os.path.dirname(__file__), os.pardir, "iot.yaml")
+    with open(iot_yaml_path) as iot_yaml_file:
+        iot_yaml = iot_yaml_file.read()
+    assert streamed_dump(yaml.safe_load(iot_yaml)) == iot_yaml
+
+
+def test_matches_yaml_dump():
+    long_words = "Measurement of the culture rooting medium macronutrients (N,P, K, Ca, Mg, S); " * 3
+    made_yaml = {
+        "name": "IndexOfTerms",
+        "imports": ["linkml:types"],
+        "slots": {
+            "plain": {"description": long_words, "annotations": []},
+            "unicode": {"description": long_words + "e.g. KH2PO4 (170¬†mg/L).",
+                        "examples": [{"value": "KH2PO4;170¬†milligram per liter"}]},
+            "block": {"comments": "first line\n\nthird line\n", "pattern": "{float} {unit}", "required": True},
+            "empty": {},
+            "needs quotes": {"title": "yes", "notes": "None", "range": "'quoted'"},
+        },
+        "enums": {"e_enum": {"permissible_values": ["no", "yes", "a: b", " leading space"]}},
+    }
+    assert streamed_dump(made_yaml) == reference_dump(made_yaml)
+
+
+def test_shared_values_keep_their_anchors():
+    shared = {"permissible_values": ["a", "b"]}
+    made_yaml = {"enums": {"first_enum": shared, "second_enum": shared}}
+    assert streamed_dump(made_yaml) == reference_dump(made_yaml)
+    assert "&id001" in streamed_dump(made_yaml)
@@ -0,0 +1,83 @@
+import iot_to_linkml.generate as gen
+
+
+def test_intern_enums():
+    ct_dol = {"wet": ["yes", "no"], "dry": ["no", "yes", "yes"], "colour": ["red"], "cloudy": ["no", "yes"]}
+    model_slots = {}
+    enums = {"sample_kind_enum": {"permissible_values": {"no": {}, "yes": {}}}}
+    for slot in ["wet", "colour", "dry", "cloudy", "kind"]:
+        if slot in ct_dol:
+            enum, _ = gen.build_enum(slot, ct_dol[slot])
+            enums[enum[0]] = enum[1]
+            model_slots[slot] = {"range": enum[0]}
+        else:
+            model_slots[slot] = {"range": "sample_kind_enum"}
+
+    assert gen.intern_enums(model_slots, enums) == {"wet_enum": ["dry_enum", "cloudy_enum"]}
+    assert {slot: model_slot["range"] for slot, model_slot in model_slots.items()} == {
+        "wet": "wet_enum", "colour": "colour_enum", "dry": "wet_enum", "cloudy": "wet_enum",
+        "kind": "sample_kind_enum"}
+    # enums pulled in from MIxS are left alone, even with the same values
+    assert list(enums) == ["sample_kind_enum", "wet_enum", "colour_enum"]
+
+
+def test_induce_class_slots_matches_schemaview():
+    from linkml_runtime.linkml_model.meta import SchemaDefinition
+    from linkml_runtime.utils.schemaview import SchemaView
+
+    made_yaml = {
+        "name": "test", "id": "http://example.com/test", "default_range": "string",
+        "prefixes": {"linkml": "https://w3id.org/linkml/"}, "imports": ["linkml:types"],
+        "classes": {"soil": {"slots": ["depth", "ph", "samp_name"], "slot_usage": {"ph": {"recommended": True}}},
+                    "water": {"slots": ["depth"]}},
+        "slots": {"depth": {"is_a": "measurement", "description": "how deep"},
+                  "ph": {"is_a": "measurement", "range": "float"},
+                  "samp_name": {"is_a": "sample identification", "identifier": True},
+                  "measurement": {"is_a": "required", "pattern": r"\d+ \S+"},
+                  "required": {"required": True},
+                  "sample identification": {}},
+    }
+    induced = gen.induce_class_slots(made_yaml, ["soil", "water"])
+    assert list(induced["soil"]) == ["depth", "ph", "samp_name"]
+    assert induced["soil"]["depth"] == {"is_a": "measurement", "description": "how deep", "pattern": r"\d+ \S+",
+                                        "required": True, "range": "string", "recommended": False}
+    # the slot's own values win over inherited ones, and slot_usage wins over both
+    assert (induced["soil"]["ph"]["range"], induced["soil"]["ph"]["recommended"]) == ("float", True)
+    assert induced["water"]["depth"] is induced["soil"]["depth"]
+
+    view = SchemaView(SchemaDefinition(**made_yaml))
+    for class_name, class_slots in induced.items():
+        for slot, induced_slot in class_slots.items():
+            view_slot = view.induced_slot(slot, class_name)
+            for metaslot in ["range", "required", "recommended", "pattern", "identifier"]:
+                # SchemaView leaves unset flags as None rather than False
+                assert induced_slot.get(metaslot) == (getattr(view_slot, metaslot) or induced_slot.get(metaslot))
+                assert bool(induced_slot.get(metaslot)) == bool(getattr(view_slot, metaslot))
+
+
+def test_close_over_references():
+    from iot_to_linkml.mixs_index import MixsIndex
+
+    mixs_index = MixsIndex({
+        "source_hash": None, "slots": {}, "class_parents": {},
+        "classes": {"quantity value": {"is_a": "attribute value", "slots": ["has_unit", "has_raw_value"]},
+                    "attribute value": {"slots": ["has_raw_value"]},
+                    "unused": {}},
+        "enums": {"unit_enum": {"permissible_values": {"m": {"text": "m"}}}},
+        "slot_definitions": {"has_unit": {"range": "unit_enum"}, "has_raw_value": {"range": "unit"}},
+        "types": ["string", "unit"],
+        "type_definitions": {"string": {"from_schema": gen.linkml_types_uri},
+                             "unit": {"typeof": "string", "from_schema": "https://example.org/core"}},
+    })
+    made_yaml = {"classes": {"soil": {"slots": ["depth"]}, "quantity value": mixs_index.classes["quantity value"]},
+                 "slots": {"depth": {"range": "quantity value", "is_a": "required"}, "required": {},
+                           "other": {"range": "None"}, "lost": {"range": "nowhere"}},
+                 "enums": {}}
+
+    added, resolver = gen.close_over_references(made_yaml, mixs_index)
+    assert added == {"classes": ["attribute value"], "slots": ["has_unit", "has_raw_value"], "enums": ["unit_enum"],
+                     "types": ["unit"], "imported_types": ["string"], "unresolved": ["nowhere"]}
+    assert list(made_yaml["types"]) == ["unit"]
+    assert "unused" not in made_yaml["classes"]
+    # has_raw_value is referred to twice, but only looked up once
+    assert resolver.misses == 7
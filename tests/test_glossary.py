@@ -0,0 +1,49 @@
+import pandas as pd
+
+from iot_to_linkml.glossary import GlossaryIndex, PackageMembership, add_package_masks, add_packlist_columns
+
+records = [
+    {'name': 'samp_name', 'packlist': ['soil', 'water']},
+    {'name': 'depth', 'packlist': ['soil']},
+    {'name': 'iot_only', 'packlist': ['water']},
+    {'name': 'no_packages', 'packlist': float('nan')},
+    {'name': 'blank_packages', 'packlist': ['']},
+]
+
+
+def test_glossary_index():
+    glossary_index = GlossaryIndex(records, ['soil', 'water'], ['depth', 'samp_name', 'temp'])
+    assert glossary_index.package_slots == {'soil': ['depth', 'samp_name'], 'water': ['iot_only', 'samp_name']}
+    assert glossary_index.used_slots() == ['depth', 'iot_only', 'samp_name']
+    assert glossary_index.slot_details('depth') == [records[1]]
+    assert glossary_index.slot_details('temp') == []
+    assert glossary_index.is_mixs_slot('samp_name')
+    assert not glossary_index.is_mixs_slot('iot_only')
+    assert not glossary_index.is_mixs_slot('temp')
+
+
+def test_package_membership():
+    membership = PackageMembership(['sediment', 'soil', 'water'])
+    assert membership.parse('all') == 0b111
+    assert membership.parse('water; soil') == membership.parse('soil;water') == 0b110
+    assert membership.parse(None) == 0
+    # names that aren't packages still count as members, after the packages
+    assert membership.parse('soil; ') == 0b1010
+    assert membership.packages(0b1011) == ['sediment', 'soil', '']
+
+    glossary_records = [{'name': 'samp_name', 'Associated Packages': 'all'},
+                        {'name': 'depth', 'Associated Packages': 'soil'},
+                        {'name': 'blank_packages', 'Associated Packages': ''}]
+    add_package_masks(glossary_records, membership)
+    glossary_index = GlossaryIndex(glossary_records, ['sediment', 'soil', 'water'], [], membership)
+    assert glossary_index.package_slots == {'sediment': ['samp_name'], 'soil': ['depth', 'samp_name'],
+                                            'water': ['samp_name']}
+    assert glossary_index.used_slots() == ['depth', 'samp_name']
+
+
+def test_add_packlist_columns_under_copy_on_write():
+    frame = pd.DataFrame({'Associated Packages': ['all', 'soil', 'water; soil']})
+    with pd.option_context("mode.copy_on_write", True):
+        add_packlist_columns(frame, ['soil', 'water'])
+    assert list(frame['explicit_packs']) == ['soil; water', 'soil', 'water; soil']
+    assert list(frame['packlist']) == [['soil', 'water'], ['soil'], ['water', 'soil']]
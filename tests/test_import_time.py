@@ -0,0 +1,26 @@
+import subprocess
+import sys
+
+# becli make --help has to come up without loading the data stack
+heavy_modules = ["pandas", "numpy", "linkml", "linkml_runtime", "googleapiclient", "google.oauth2", "google.auth"]
+# generous, since CI machines are slow; the heavy imports alone take well over a second
+IMPORT_BUDGET_US = 1000000
+
+
+def test_help_skips_heavy_imports():
+    # the same way the becli console script starts up
+    script = "from iot_to_linkml.becli import cli; cli(['make', '--help'])"
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", script],
+                               capture_output=True, text=True, check=True)
+    assert "--yamlout" in completed.stdout
+
+    imported = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative, module = line[len("import time:"):].split("|")
+        imported[module.strip()] = int(cumulative)
+
+    for heavy in heavy_modules:
+        assert heavy not in imported, f"{heavy} is imported by becli make --help"
+    assert imported["iot_to_linkml.becli"] < IMPORT_BUDGET_US
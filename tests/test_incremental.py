@@ -0,0 +1,68 @@
+import iot_to_linkml.generate as gen
+from iot_to_linkml.glossary import GlossaryIndex
+from iot_to_linkml.incremental import IncrementalManifest
+from iot_to_linkml.mixs_index import MixsIndex
+
+columns = ['Column Header', 'Category', 'Notes', 'Origin', 'syntax', 'Definition', 'GitHub Ticket', 'Guidance']
+
+
+def glossary_row(name, **values):
+    row = {column: "" for column in columns}
+    row.update(name=name, packlist=['soil'], **values)
+    return row
+
+
+mixs_index = MixsIndex({
+    "source_hash": None, "class_parents": {}, "classes": {}, "enums": {}, "types": [], "slot_definitions": {},
+    "type_definitions": {},
+    "slots": {"depth": {"comments": [], "description": "depth of the sample", "examples": ["10 m"], "notes": [],
+                        "required": None, "recommended": True, "range": "quantity value", "slot_uri": "MIXS:0000018",
+                        "see_also": [], "title": "depth", "pattern": "{float} {unit}", "multivalued": False}},
+})
+
+
+def build(records, ct_dol, manifest):
+    glossary_index = GlossaryIndex(records, ['soil'], mixs_index.slot_names)
+    return gen.build_slots(glossary_index.used_slots(), glossary_index, mixs_index, ct_dol, 'Globally Unique ID',
+                           manifest=manifest)
+
+
+def test_incremental_rebuilds_only_changed_slots(tmp_path):
+    records = [glossary_row('depth', Category='required'), glossary_row('tillage', Definition='tillage practice')]
+    ct_dol = {'tillage': ['drill', 'cutting disc', 'drill']}
+    full = build(records, ct_dol, None)
+    assert full[1] == {'tillage_enum': {'permissible_values': ['cutting disc', 'drill']}}
+
+    manifest_path = str(tmp_path / "iot.yaml.manifest.json")
+    manifest = IncrementalManifest(manifest_path)
+    assert build(records, ct_dol, manifest) == full
+    assert (manifest.hits, manifest.misses) == (0, 2)
+    manifest.save()
+
+    manifest = IncrementalManifest(manifest_path)
+    assert build(records, ct_dol, manifest) == full
+    assert (manifest.hits, manifest.misses) == (2, 0)
+    manifest.save()
+
+    # a new package changes every row's package columns, but not what the slots are built from
+    for record in records:
+        record.update(packlist=['soil', 'water'], packmask=3)
+    manifest = IncrementalManifest(manifest_path)
+    assert build(records, ct_dol, manifest) == full
+    assert (manifest.hits, manifest.misses) == (2, 0)
+    manifest.save()
+
+    ct_dol = {'tillage': ['drill', 'ridge till']}
+    manifest = IncrementalManifest(manifest_path)
+    model_slots, enums, ranges = build(records, ct_dol, manifest)
+    assert (manifest.hits, manifest.misses) == (1, 1)
+    assert enums == {'tillage_enum': {'permissible_values': ['drill', 'ridge till']}}
+    assert ranges == ['quantity value']
+
+
+def test_write_yaml_if_changed(tmp_path):
+    yamlout = str(tmp_path / "iot.yaml")
+    assert gen.write_yaml_if_changed({'name': 'IndexOfTerms'}, yamlout)
+    assert not gen.write_yaml_if_changed({'name': 'IndexOfTerms'}, yamlout)
+    assert gen.write_yaml_if_changed({'name': 'IoT'}, yamlout)
+    assert open(yamlout).read() == "name: IoT\n"
@@ -0,0 +1,91 @@
+import functools
+import json
+import pstats
+import time
+
+from click.testing import CliRunner
+
+import iot_to_linkml.sheet2yaml as s2y
+import iot_to_linkml.synthetic as sy
+from iot_to_linkml.becli import make_iot_yaml
+from iot_to_linkml.metrics import RunMetrics
+
+
+def test_run_metrics(tmp_path):
+    metrics = RunMetrics(memory=True, profile=True)
+    metrics.start()
+    with metrics.stage("quick"):
+        pass
+    with metrics.stage("slow"):
+        kept = [bytearray(100000)]
+        time.sleep(0.01)
+    # a stage in another thread would need a second profiler running at once
+    with metrics.stage("fetch", concurrent=True):
+        pass
+    metrics.stop()
+    metrics.cache("snapshots", 3, 1)
+
+    report = metrics.write(str(tmp_path / "metrics.json"), engine="records")
+    assert report == json.loads((tmp_path / "metrics.json").read_text())
+    assert report["slowest_stage"] == "slow"
+    assert report["stages"]["slow"]["peak_memory_bytes"] >= len(kept[0])
+    assert report["total"]["wall_seconds"] >= report["stages"]["slow"]["wall_seconds"]
+    assert report["caches"] == {"snapshots": {"hits": 3, "misses": 1, "hit_rate": 0.75}}
+    assert report["engine"] == "records"
+
+    assert sorted(metrics.profiles) == ["quick", "slow"]
+    assert metrics.dump_profile(str(tmp_path / "slow.prof")) == "slow"
+    assert pstats.Stats(str(tmp_path / "slow.prof")).total_calls > 0
+
+
+def test_becli_metrics_out(tmp_path, monkeypatch):
+    mixs_path = sy.write_mixs_schema(str(tmp_path / "mixs"), slot_count=30, enum_count=3)
+    tabs = sy.make_tabs(terms=60, packages=4, dupe_rate=0.1, mixs_slot_count=30)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(s2y, "SheetSession", functools.partial(s2y.SheetSession, revision="rev1",
+                                                               sheet_service=sy.FakeSheetService(tabs)))
+
+    args = ["--cred", mixs_path, "--mixs", mixs_path, "--cache-dir", "cache", "--metrics-out", "metrics.json"]
+    for _ in range(2):
+        result = CliRunner().invoke(make_iot_yaml, args)
+        assert result.exit_code == 0, result.output
+
+    report = json.loads((tmp_path / "metrics.json").read_text())
+    assert set(report["stages"]) == {"mixs_index", "sheet_fetch", "sheet_parse", "package_expansion", "dedup",
+                                     "glossary_index", "slot_build", "range_pull_in", "yaml_dump"}
+    assert report["counts"]["glossary_rows"] == len(tabs[s2y.IOT_RANGE_NAME]["values"]) - 1
+    assert report["counts"]["slots"] == 60 - report["counts"]["unresolved_duplicated_names"]
+    assert report["mixs_lookups"]["slot"]["lookups"] == report["counts"]["mixs_slots"]
+    # the second run reuses the snapshots and the compiled MIxS index from the first
+    assert report["caches"]["sheet_snapshots"]["hit_rate"] == 1.0
+    assert report["caches"]["mixs_index"]["hit_rate"] == 1.0
+    assert report["output_written"] is False
+
+
+def test_load_inputs_overlaps_mixs_and_sheet_fetch(tmp_path, monkeypatch):
+    import iot_to_linkml.mixs_index as mi
+    import iot_to_linkml.pipeline as pl
+
+    mixs_path = sy.write_mixs_schema(str(tmp_path / "mixs"), slot_count=10, enum_count=1)
+    tabs = sy.make_tabs(terms=20, mixs_slot_count=10)
+    load_mixs_index = mi.load_mixs_index
+
+    def slow_load_mixs_index(*args, **kwargs):
+        # stands in for a slow first parse of the MIxS sources
+        time.sleep(0.3)
+        return load_mixs_index(*args, **kwargs)
+
+    monkeypatch.setattr(mi, "load_mixs_index", slow_load_mixs_index)
+    overlaps = {}
+    for overlap in [True, False]:
+        session = s2y.SheetSession(revision="rev1", sheet_service=sy.FakeSheetService(tabs, delay=0.3))
+        metrics = RunMetrics()
+        mixs_index, glossary_tab, ct_tab = pl.load_inputs(session, mixs_path, str(tmp_path / "cache"), metrics,
+                                                          overlap=overlap)
+        assert glossary_tab == tabs[s2y.IOT_RANGE_NAME] and ct_tab == tabs[s2y.CV_RANGE_NAME]
+        assert mixs_index.slot_names
+        overlaps[overlap] = metrics.report()["overlaps"]["inputs"]
+
+    assert overlaps[True]["sequential_wall_seconds"] >= 0.6
+    assert overlaps[True]["saved_seconds"] > 0.2
+    assert abs(overlaps[False]["saved_seconds"]) < 0.1
@@ -0,0 +1,79 @@
+import iot_to_linkml.mixs_index as mi
+
+mixs_yaml = """id: https://example.org/mixs
+name: mixs
+imports:
+  - linkml:types
+prefixes:
+  linkml: https://w3id.org/linkml/
+default_range: string
+enums:
+  rel_to_oxygen_enum:
+    permissible_values:
+      aerobe: {}
+      anaerobe: {}
+classes:
+  attribute value: {}
+  quantity value:
+    is_a: attribute value
+slots:
+  rel_to_oxygen:
+    description: Is this organism an aerobe, anaerobe?
+    range: rel_to_oxygen_enum
+    required: true
+    examples:
+      - value: aerobe
+  depth:
+    range: quantity value
+"""
+
+
+def test_index_is_reused_until_mixs_changes(tmp_path, monkeypatch):
+    schema_dir = tmp_path / "schema"
+    schema_dir.mkdir()
+    mixs_path = schema_dir / "mixs.yaml"
+    mixs_path.write_text(mixs_yaml)
+    cache_dir = tmp_path / "cache"
+
+    builds = []
+    build = mi.build_mixs_index_content
+
+    def counting_build(*args, **kwargs):
+        builds.append(args)
+        return build(*args, **kwargs)
+
+    monkeypatch.setattr(mi, "build_mixs_index_content", counting_build)
+
+    mixs_index = mi.load_mixs_index(str(mixs_path), cache_dir=str(cache_dir))
+    assert mixs_index.slot_names == ["depth", "rel_to_oxygen"]
+    assert mixs_index.get_slot("rel_to_oxygen")["required"] is True
+    assert mixs_index.get_slot("rel_to_oxygen")["examples"] == ["aerobe"]
+    assert mixs_index.get_enum("rel_to_oxygen_enum")["permissible_values"] == {"aerobe": {"text": "aerobe"},
+                                                                                "anaerobe": {"text": "anaerobe"}}
+    assert mixs_index.get_class("quantity value")["is_a"] == "attribute value"
+    assert mixs_index.get_type("string") == "string"
+    assert mixs_index.get_type("quantity value") is None
+
+    mi.load_mixs_index(str(mixs_path), cache_dir=str(cache_dir))
+    assert len(builds) == 1
+
+    mixs_path.write_text(mixs_yaml.replace("required: true", "recommended: true"))
+    mixs_index = mi.load_mixs_index(str(mixs_path), cache_dir=str(cache_dir))
+    assert len(builds) == 2
+    assert mixs_index.get_slot("rel_to_oxygen")["recommended"] is True
+
+
+def test_element_converter_matches_yaml_round_trip(tmp_path):
+    import yaml
+    from linkml.generators import yamlgen
+    from linkml_runtime.utils.schemaview import SchemaView
+
+    mixs_path = tmp_path / "mixs.yaml"
+    mixs_path.write_text(mixs_yaml)
+    mixs_view = SchemaView(str(mixs_path))
+    element_to_dict = mi.ElementConverter()
+    elements = list(mixs_view.all_enums().values()) + list(mixs_view.all_classes().values())
+    elements += list(mixs_view.all_slots().values())
+    for element in elements:
+        assert element_to_dict(element) == yaml.safe_load(yamlgen.as_yaml(element))
+    assert element_to_dict(elements[0]) is element_to_dict(elements[0])
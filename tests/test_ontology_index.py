@@ -0,0 +1,119 @@
+import io
+import json
+
+import iot_to_linkml.ontology_index as oi
+import iot_to_linkml.validate as va
+
+obo = """format-version: 1.2
+
+[Term]
+id: ENVO:00001998
+name: soil
+def: "..." []
+
+[Term]
+id: ENVO:00002006
+name: liquid water
+is_a: ENVO:00002297 ! environmental material
+
+[Term]
+id: ENVO:01000000
+name: old soil
+is_obsolete: true
+
+[Typedef]
+id: part_of
+name: part of
+"""
+
+obographs = {"graphs": [{"nodes": [
+    {"id": "http://purl.obolibrary.org/obo/CHEBI_15377", "lbl": "water", "type": "CLASS"},
+    {"id": "http://purl.obolibrary.org/obo/CHEBI_0", "lbl": "gone", "type": "CLASS", "meta": {"deprecated": True}},
+    {"id": "http://purl.obolibrary.org/obo/RO_0000050", "lbl": "part of", "type": "PROPERTY"},
+]}]}
+
+
+def make_index(tmp_path):
+    (tmp_path / "envo.obo").write_text(obo)
+    (tmp_path / "chebi.json").write_text(json.dumps(obographs))
+    (tmp_path / "extra.tsv").write_text("label\tid\ndrill\tAGRO:00000001\n")
+    paths = [str(tmp_path / name) for name in ["envo.obo", "chebi.json", "extra.tsv"]]
+    return oi.open_ontology_index(paths, str(tmp_path / "cache")), paths
+
+
+def test_index_and_resolve(tmp_path):
+    ontology_index, paths = make_index(tmp_path)
+    assert list(oi.read_obo(paths[0])) == [("ENVO:00001998", "soil", False), ("ENVO:00002006", "liquid water", False),
+                                           ("ENVO:01000000", "old soil", True)]
+    assert ontology_index.get_term("CHEBI:15377") == ("CHEBI:15377", "water", False)
+    assert ontology_index.get_term("RO:0000050") is None
+    assert ontology_index.resolve("Soil") == ("ENVO:00001998", "soil")
+    assert ontology_index.resolve("ENVO:00002006") == ("ENVO:00002006", "liquid water")
+    assert ontology_index.resolve("water [CHEBI:15377]") == ("CHEBI:15377", "water")
+    assert ontology_index.resolve("drill") == ("AGRO:00000001", "drill")
+    assert ontology_index.resolve("old soil") is None
+    assert ontology_index.resolve("CHEBI:0") is None
+    # unchanged files aren't read again, and a file that's no longer given is forgotten
+    assert ontology_index.update(paths) == []
+    assert ontology_index.update(paths[:2]) == []
+    assert ontology_index.resolve("drill") is None
+    ontology_index.close()
+
+    reopened = oi.open_ontology_index(paths[:2], str(tmp_path / "cache"))
+    assert reopened.update(paths[:2]) == []
+    assert reopened.resolve("soil") == ("ENVO:00001998", "soil")
+    reopened.close()
+
+
+def test_build_term_enums(tmp_path):
+    ontology_index, _ = make_index(tmp_path)
+    made_yaml = {"slots": {"env_medium": {"pattern": "{termLabel} {[termID]}", "range": "env_medium_enum"},
+                           "env_broad": {"pattern": "{termLabel} {[termID]}", "range": "env_broad_enum"},
+                           "depth": {"pattern": "{float} {unit}", "range": "depth_enum"},
+                           "solvent": {"pattern": "CHEBI {termLabel} {[termID]}", "range": "solvent_enum"},
+                           "chem_soil": {"pattern": "CHEBI {termLabel} {[termID]}", "range": "chem_soil_enum"},
+                           "growth_medium": {"pattern": "{text}|{termLabel} {[termID]};{timestamp}"}},
+                 "enums": {}}
+    ct_dol = {"env_medium": ["soil", "water [CHEBI:15377]", "ENVO:00002006"], "env_broad": ["soil", "moon rock"],
+              "depth": ["1 m"], "solvent": ["water"], "chem_soil": ["soil"], "growth_medium": ["drill"]}
+    converted, unresolved = oi.build_term_enums(made_yaml, ontology_index, ct_dol)
+    assert converted == {"env_medium": "env_medium_enum", "solvent": "solvent_enum",
+                         "growth_medium": "growth_medium_enum"}
+    # soil is an ENVO term, not a CHEBI one
+    assert unresolved == {"env_broad": ["moon rock"], "chem_soil": ["soil"]}
+    assert made_yaml["enums"]["solvent_enum"]["permissible_values"] == {
+        "water [CHEBI:15377]": {"meaning": "CHEBI:15377"}}
+    assert made_yaml["enums"]["env_medium_enum"] == {"permissible_values": {
+        "liquid water [ENVO:00002006]": {"meaning": "ENVO:00002006"},
+        "soil [ENVO:00001998]": {"meaning": "ENVO:00001998"},
+        "water [CHEBI:15377]": {"meaning": "CHEBI:15377"}}}
+    ontology_index.close()
+
+
+def test_term_prefixes():
+    assert oi.term_prefixes("{termLabel} {[termID]}") == frozenset()
+    assert oi.term_prefixes("CHEBI {termLabel} {[termID]}") == {"CHEBI"}
+    assert oi.term_prefixes("{text}|ENVO {termLabel} {[termID]};{timestamp}") == {"ENVO"}
+    assert oi.term_prefixes("{float} {unit}") is None
+
+
+def test_validate_terms(tmp_path):
+    ontology_index, _ = make_index(tmp_path)
+    schema = {"classes": {}, "slots": {"env_medium": {"pattern": "{termLabel} {[termID]}"}}}
+    plan = va.ValidationPlan(schema, ontology_index)
+    rows = ["env_medium", "soil [ENVO:00001998]", "dirt [ENVO:00001998]", "soil [ENVO:99999999]",
+            "old soil [ENVO:01000000]", "rock [XYZ:1]"]
+    report = va.validate_tsv(plan, io.StringIO("\n".join(rows) + "\n"))
+    assert report.errors == [(3, "env_medium", "dirt [ENVO:00001998]", "doesn't have the term's label, soil"),
+                             (4, "env_medium", "soil [ENVO:99999999]", "not a term in the ontologies"),
+                             (5, "env_medium", "old soil [ENVO:01000000]", "an obsolete term")]
+
+    schema = {"classes": {}, "slots": {"solvent": {"pattern": "CHEBI {termLabel} {[termID]}"},
+                                       "sampled": {"pattern": "{text}|{termLabel} {[termID]};{timestamp}"}}}
+    plan = va.ValidationPlan(schema, ontology_index)
+    rows = ["solvent\tsampled", "water [CHEBI:15377]\tsoil [ENVO:00001998];2022-03-01",
+            "soil [ENVO:00001998]\tdirt [ENVO:00001998];2022-03-01", "\tjust text"]
+    report = va.validate_tsv(plan, io.StringIO("\n".join(rows) + "\n"))
+    assert report.errors == [(3, "solvent", "soil [ENVO:00001998]", "not a term from CHEBI"),
+                             (3, "sampled", "dirt [ENVO:00001998];2022-03-01", "doesn't have the term's label, soil")]
+    ontology_index.close()
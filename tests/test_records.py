@@ -0,0 +1,71 @@
+import functools
+
+from click.testing import CliRunner
+
+import iot_to_linkml.sheet2yaml as s2y
+import iot_to_linkml.synthetic as sy
+from iot_to_linkml.becli import make_iot_yaml
+from iot_to_linkml.pipeline import dupe_unresolved_filename
+from tests.test_mixs_index import mixs_yaml
+
+header = ["name", "Column Header", "Definition", "Guidance", "syntax", "Category", "Associated Packages", "Origin",
+          "Notes", "GitHub Ticket"]
+# ragged like the Sheets API returns them, with trailing empty cells left off
+glossary_values = [
+    header,
+    ["samp_name", "Globally Unique ID", "sample name", "", "", "sample identification", "all"],
+    ["rel_to_oxygen", "", "", "", "", "required", "soil; water", "MIxS", "", "https://example.org/1"],
+    ["depth", "depth", "", "at least 0", "{float} {unit}", "optional", "soil;sediment"],
+    ["tillage", "tillage", "tillage practice", "", "", "", "soil", "EMSL", "a note"],
+    ["no_packages", "no packages", "not in any package"],
+    ["blank_packages", "", "", "", "", "optional", ""],
+    ["dup_ok", "kept", "", "", "", "optional", "soil; water; sediment"],
+    ["dup_ok", "dropped", "", "", "", "optional", "water"],
+    ["dup_bad", "first", "", "", "", "required", "soil"],
+    ["dup_bad", "second", "", "", "", "required", "water", "", "has\ttab"],
+]
+ct_values = [["tillage", "rel_to_oxygen", "unused"], ["drill", "aerobe", "x"], ["cutting disc", "anaerobe"],
+             ["drill"]]
+
+
+tabs = {s2y.IOT_RANGE_NAME: {"values": glossary_values}, s2y.CV_RANGE_NAME: {"values": ct_values}}
+
+
+def test_records_engine_matches_pandas_engine(tmp_path, monkeypatch):
+    mixs_path = tmp_path / "mixs.yaml"
+    mixs_path.write_text(mixs_yaml)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(s2y, "SheetSession",
+                        functools.partial(s2y.SheetSession, sheet_service=sy.FakeSheetService(tabs)))
+
+    outputs = {}
+    for engine in ["pandas", "records"]:
+        yamlout = tmp_path / f"{engine}.yaml"
+        result = CliRunner().invoke(make_iot_yaml, ["--cred", str(mixs_path), "--mixs", str(mixs_path),
+                                                    "--yamlout", str(yamlout), "--cache-dir", str(tmp_path / engine),
+                                                    "--engine", engine])
+        assert result.exit_code == 0, result.output
+        outputs[engine] = (yamlout.read_text(), (tmp_path / dupe_unresolved_filename).read_text(),
+                           result.output.replace(str(yamlout), "iot.yaml"))
+
+    assert outputs["records"] == outputs["pandas"]
+    schema, unresolved, _ = outputs["records"]
+    assert "dup_ok" in schema and "dup_bad" not in schema
+    assert unresolved.count("dup_bad") == 2
+
+
+def test_tab_to_records_pads_like_tab_to_frame():
+    tab = {"values": glossary_values}
+    assert s2y.tab_to_records(tab) == s2y.tab_to_frame(tab).to_dict(orient="records")
+    assert s2y.get_ct_dol(s2y.tab_to_columns({"values": ct_values})) == s2y.get_ct_dol(
+        s2y.tab_to_frame({"values": ct_values}))
+
+
+def test_cells_past_the_last_header_are_dropped(capsys):
+    tab = {"range": "Glossary of terms!A1:Z", "values": [["name", "notes"], ["depth"], ["elev", "m", "stray"]]}
+    frame = s2y.tab_to_frame(tab)
+    assert list(frame.columns) == ["name", "notes"]
+    assert s2y.tab_to_records(tab) == frame.to_dict(orient="records") == [{"name": "depth", "notes": None},
+                                                                         {"name": "elev", "notes": "m"}]
+    assert s2y.tab_to_columns(tab) == {"name": ["depth", "elev"], "notes": [None, "m"]}
+    assert "in 1 rows of Glossary of terms!A1:Z" in capsys.readouterr().out
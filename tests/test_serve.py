@@ -0,0 +1,84 @@
+import json
+import re
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+import yaml
+
+import iot_to_linkml.pipeline as pl
+import iot_to_linkml.sheet2yaml as s2y
+import iot_to_linkml.synthetic as sy
+from iot_to_linkml.serve import SchemaService, make_server
+
+
+def test_concurrent_requests_share_one_build(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    mixs_path = sy.write_mixs_schema(str(tmp_path / "mixs"), slot_count=20, enum_count=2)
+    tabs = sy.make_tabs(terms=30, packages=3, mixs_slot_count=20)
+    # the fetch is slow enough that every request arrives while the first build is still running
+    session = s2y.SheetSession(revision="rev1", sheet_service=sy.FakeSheetService(tabs, delay=0.3))
+    service = SchemaService(session, mixs_path, cache_dir=str(tmp_path / "cache"))
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(service.get_schema())) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert service.builds == 1
+    assert service.coalesced == 4
+    assert all(cached is results[0] for cached in results)
+
+
+def test_serve_over_http(tmp_path, monkeypatch, capsys, clock, write_sheet):
+    monkeypatch.chdir(tmp_path)
+    mixs_path = sy.write_mixs_schema(str(tmp_path / "mixs"), slot_count=20, enum_count=2)
+    sheet_path = str(tmp_path / "sheet.json")
+    write_sheet(sheet_path, 30)
+    session = s2y.SheetSession(cache_dir=str(tmp_path / "cache"), sheet_service=s2y.LocalSheetService(sheet_path))
+    service = SchemaService(session, mixs_path, cache_dir=str(tmp_path / "cache"), cache_size=1, check_interval=10,
+                            clock=clock, incremental=True)
+    server = make_server(service, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+
+    def get(path, headers=None):
+        with urllib.request.urlopen(urllib.request.Request(base + path, headers=headers or {})) as response:
+            return response.read().decode("utf-8"), response.headers
+
+    try:
+        schema_yaml, headers = get("/schema.yaml")
+        schema = yaml.safe_load(schema_yaml)
+        assert json.loads(get("/schema.json")[0]) == schema
+        package = list(schema["classes"])[0]
+        package_schema = json.loads(get(f"/classes/{package}.json")[0])
+        assert package_schema["class"] == schema["classes"][package]
+        assert list(package_schema["slots"]) == schema["classes"][package]["slots"]
+        assert (service.builds, service.hits) == (1, 2)
+        with pytest.raises(urllib.error.HTTPError) as not_modified:
+            get("/schema.yaml", {"If-None-Match": headers["ETag"]})
+        assert not_modified.value.code == 304
+        with pytest.raises(urllib.error.HTTPError) as not_found:
+            get("/classes/nonesuch.yaml")
+        assert not_found.value.code == 404
+
+        # an edit isn't noticed until the next check, and then replaces the cached schema
+        with open(sheet_path) as sheet_file:
+            tabs = json.load(sheet_file)
+        tabs["Glossary of terms!A1:Z"]["values"][-1][4] = "edited"
+        with open(sheet_path, "w") as sheet_file:
+            json.dump(tabs, sheet_file)
+        assert get("/schema.yaml")[0] == schema_yaml
+        clock.now += 10
+        assert get("/schema.yaml")[0] != schema_yaml
+        status = json.loads(get("/status")[0])
+        assert (status["builds"], status["cached"], status["evictions"]) == (2, 1, 1)
+        # every build goes to the same files in the cache, so the second reuses the first one's unchanged slots
+        builds = re.findall(r"(\d+) slots unchanged since the last run", capsys.readouterr().out)
+        assert builds[0] == "0" and int(builds[1]) > 1
+        assert (tmp_path / "cache" / "serve" / pl.dupe_unresolved_filename).exists()
+        assert not (tmp_path / pl.dupe_unresolved_filename).exists()
+    finally:
+        server.shutdown()
+        server.server_close()
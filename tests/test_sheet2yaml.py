@@ -0,0 +1,33 @@
+import pytest
+
+import iot_to_linkml.sheet2yaml as s2y
+import iot_to_linkml.synthetic as sy
+
+tabs = {
+    s2y.IOT_RANGE_NAME: {"values": [["name", "Associated Packages"], ["samp_name", "all"], ["depth", "soil"]]},
+    s2y.CV_RANGE_NAME: {"values": [["oxy_stat_samp", "tillage"], ["aerobic", "drill"], ["anaerobic"]]},
+}
+
+
+def test_session_fetches_all_ranges_in_one_batch():
+    service = sy.FakeSheetService(tabs)
+    session = s2y.SheetSession(sheet_service=service)
+    glossary_frame, controlled_terms_frame = session.get_iot_frames()
+    assert service.calls == [("batchGet", (s2y.IOT_RANGE_NAME, s2y.CV_RANGE_NAME))]
+    assert list(glossary_frame['name']) == ["samp_name", "depth"]
+    assert s2y.get_ct_dol(controlled_terms_frame) == {"oxy_stat_samp": ["aerobic", "anaerobic"],
+                                                      "tillage": ["drill"]}
+
+
+def test_session_only_fetches_ranges_missing_from_cache(tmp_path):
+    service = sy.FakeSheetService(tabs)
+    session = s2y.SheetSession(sheet_service=service, cache_dir=tmp_path, revision="rev1")
+    session.get_tabs([s2y.IOT_RANGE_NAME])
+    session.get_tabs([s2y.IOT_RANGE_NAME, s2y.CV_RANGE_NAME])
+    assert service.calls == [("batchGet", (s2y.IOT_RANGE_NAME,)), ("batchGet", (s2y.CV_RANGE_NAME,))]
+
+    offline_session = s2y.SheetSession(cache_dir=tmp_path, offline=True)
+    assert offline_session.get_tabs([s2y.CV_RANGE_NAME, s2y.IOT_RANGE_NAME]) == {
+        s2y.CV_RANGE_NAME: tabs[s2y.CV_RANGE_NAME], s2y.IOT_RANGE_NAME: tabs[s2y.IOT_RANGE_NAME]}
+    with pytest.raises(FileNotFoundError):
+        offline_session.get_tabs(["Somewhere else!A1:Z"])
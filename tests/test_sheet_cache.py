@@ -0,0 +1,39 @@
+import pytest
+
+import iot_to_linkml.sheet2yaml as s2y
+import iot_to_linkml.sheet_cache as sc
+import iot_to_linkml.synthetic as sy
+
+tab = {"range": "Glossary of terms!A1:Z1000", "values": [["name", "Category"], ["samp_name", "required"]]}
+
+
+def test_snapshot_keyed_by_revision(tmp_path):
+    sc.save_tab_snapshot(tmp_path, "sheet", "range", "rev1", tab)
+    assert sc.load_tab_snapshot(tmp_path, "sheet", "range", revision="rev1") == tab
+    assert sc.load_tab_snapshot(tmp_path, "sheet", "range", revision="rev2") is None
+    assert sc.load_tab_snapshot(tmp_path, "sheet", "range", revision=None) is None
+    assert sc.load_tab_snapshot(tmp_path, "sheet", "range", any_revision=True) == tab
+    assert sc.load_tab_snapshot(tmp_path, "sheet", "other range", any_revision=True) is None
+
+
+def test_session_reuses_snapshot(tmp_path):
+    service = sy.FakeSheetService({"range": tab})
+    for _ in range(2):
+        session = s2y.SheetSession(sheet_id="sheet", cache_dir=tmp_path, sheet_service=service, revision="rev1")
+        assert session.get_tabs(["range"]) == {"range": tab}
+    assert service.calls == [("batchGet", ("range",))]
+    assert (session.snapshot_hits, session.snapshot_misses) == (1, 0)
+
+    session = s2y.SheetSession(sheet_id="sheet", cache_dir=tmp_path, sheet_service=service, revision="rev2")
+    session.get_tabs(["range"])
+    assert len(service.calls) == 2
+    assert s2y.get_gsheet_tab(service, "sheet", "range", cache_dir=tmp_path, revision="rev2") == tab
+    assert len(service.calls) == 2
+
+
+def test_session_offline(tmp_path):
+    session = s2y.SheetSession(sheet_id="sheet", cache_dir=tmp_path, offline=True)
+    with pytest.raises(FileNotFoundError):
+        session.get_tabs(["range"])
+    sc.save_tab_snapshot(tmp_path, "sheet", "range", "rev1", tab)
+    assert session.get_tabs(["range"]) == {"range": tab}
@@ -0,0 +1,48 @@
+import functools
+
+from click.testing import CliRunner
+
+import iot_to_linkml.sheet2yaml as s2y
+import iot_to_linkml.synthetic as sy
+from benchmarks.bench_stages import run_benchmark, stages
+from iot_to_linkml.becli import make_iot_yaml
+
+
+def test_make_tabs():
+    tabs = sy.make_tabs(terms=100, packages=4, all_rate=0.0, dupe_rate=1.0, ct_rate=0.5, enum_size=3,
+                        mixs_slot_count=20)
+    rows = tabs[s2y.IOT_RANGE_NAME]["values"]
+    names = [row[2] for row in rows[1:]]
+    assert len(set(names)) == 100
+    assert len(names) == 200
+    assert len([name for name in set(names) if name.startswith("mixs_slot_")]) == 20
+    packages = {package for row in rows[1:] for package in row[9].replace(" ", "").split(";")}
+    assert packages == {"package_0", "package_1", "package_2", "package_3"}
+    ct_dol = s2y.get_ct_dol(s2y.tab_to_columns(tabs[s2y.CV_RANGE_NAME]))
+    assert ct_dol and all(len(set(values)) == 3 for values in ct_dol.values())
+
+
+def test_engines_agree_on_synthetic_data(tmp_path, monkeypatch):
+    mixs_path = sy.write_mixs_schema(str(tmp_path / "mixs"), slot_count=50, enum_count=5)
+    tabs = sy.make_tabs(terms=300, packages=6, dupe_rate=0.1, mixs_slot_count=50)
+    monkeypatch.chdir(tmp_path)
+
+    outputs = []
+    for engine in ["pandas", "records"]:
+        service = sy.FakeSheetService(tabs)
+        monkeypatch.setattr(s2y, "SheetSession", functools.partial(s2y.SheetSession, sheet_service=service))
+        yamlout = tmp_path / f"{engine}.yaml"
+        result = CliRunner().invoke(make_iot_yaml, ["--cred", mixs_path, "--mixs", mixs_path, "--yamlout", str(yamlout),
+                                                    "--cache-dir", str(tmp_path / engine), "--engine", engine])
+        assert result.exit_code == 0, result.output
+        assert service.calls == [("batchGet", (s2y.IOT_RANGE_NAME, s2y.CV_RANGE_NAME))]
+        outputs.append(yamlout.read_text())
+    assert outputs[0] == outputs[1]
+
+
+def test_benchmark_times_every_stage():
+    parameters = {"terms": 50, "packages": 3, "all_rate": 0.1, "dupe_rate": 0.1, "ct_rate": 0.2, "enum_size": 4,
+                  "mixs_rate": 0.5, "mixs_slot_count": 20, "mixs_enum_count": 2, "seed": 1}
+    results = run_benchmark(parameters, ["pandas", "records"], 1)
+    assert list(results) == ["pandas", "records"]
+    assert all(list(timings) == stages for timings in results.values())
@@ -0,0 +1,91 @@
+import io
+import os
+
+import yaml
+from click.testing import CliRunner
+
+import iot_to_linkml.validate as va
+from iot_to_linkml.becli import cli
+
+schema = {
+    "classes": {"soil": {"slots": ["samp_name", "depth", "tillage", "env_medium", "elev"]}},
+    "slots": {
+        "samp_name": {"is_a": "sample identification", "required": True, "identifier": True},
+        "depth": {"is_a": "required", "required": True, "pattern": "{float} {unit}"},
+        "tillage": {"is_a": "optional", "range": "tillage_enum", "multivalued": "True"},
+        "env_medium": {"is_a": "optional", "pattern": "{termLabel} {[termID]}"},
+        "elev": {"is_a": "optional", "conforms_to": "https://gensc.org/mixs/", "pattern": r"^\d+ m$",
+                 "multivalued": "False"},
+    },
+    "enums": {"tillage_enum": {"permissible_values": ["drill", "cutting disc"]}},
+}
+
+
+def test_syntax_regex():
+    assert va.syntax_regex("{float} {unit}").fullmatch("-1.5e3 mg/L")
+    assert not va.syntax_regex("{float} {unit}").fullmatch("deep")
+    # the space is required, so a missing unit or space isn't taken as a one digit unit
+    for value in ["1.5", "15", "12m"]:
+        assert not va.syntax_regex("{float} {unit}").fullmatch(value)
+    assert va.syntax_regex("{termLabel} {[termID]}").fullmatch("soil [ENVO:00001998]")
+    assert not va.syntax_regex("{termLabel} {[termID]}").fullmatch("soil")
+    assert va.syntax_regex("{timestamp}").fullmatch("2022-03-01T10:00Z")
+    # free text and unknown placeholders aren't checked
+    assert va.syntax_regex("free text") is None
+    assert va.syntax_regex("{float} {furlong}") is None
+
+
+def test_mixs_slot_patterns():
+    # MIxS patterns are string serializations, with | for alternatives and [a|b] for a choice, not regexes
+    with open(os.path.join(os.path.dirname(__file__), os.pardir, "iot.yaml")) as iot_file:
+        slots = yaml.load(iot_file, Loader=yaml.CSafeLoader)["slots"]
+    checks = {slot: va.SlotCheck(slot, slots[slot], {}) for slot in
+              ["alkalinity_method", "al_sat_meth", "air_temp_regm", "tidal_stage"]}
+    assert checks["alkalinity_method"].problem("some free text") is None
+    assert checks["al_sat_meth"].problem("10.1038/nature12345") is None
+    assert checks["al_sat_meth"].problem("PMID:12345") is None
+    assert checks["al_sat_meth"].problem("https://example.org/method") is None
+    assert checks["al_sat_meth"].problem("ask Bob") == "doesn't match the pattern"
+    assert checks["air_temp_regm"].problem("5 m") is None
+    assert checks["air_temp_regm"].problem("25 degree Celsius;R2/2018-05-11T14:30/2018-05-11T19:30/P1H30M") is None
+    assert checks["tidal_stage"].problem("ebb tide") is None
+    assert checks["tidal_stage"].problem("low") == "doesn't match the pattern"
+    # a compound grouped with braces, and a template that can't be translated isn't checked
+    assert va.syntax_regex("{{text}|{float} {unit}};{float} {unit}").fullmatch("sand;2 m")
+    assert va.syntax_regex("{{float} {unit}") is None
+
+
+def test_validate_tsv():
+    plan = va.ValidationPlan(schema)
+    rows = ["samp_name\tdepth\ttillage\tenv_medium\telev\tnotes",
+            "s1\t1 m\tdrill; cutting disc\tsoil [ENVO:00001998]\t10 m\tanything",
+            "s2\t\tplough\tsoil\t10 ft",
+            "s1\tdeep\t\t\t",
+            "s3\t2 m\tdrill"]
+    report = va.validate_tsv(plan, io.StringIO("\n".join(rows) + "\n"), package="soil", chunk_size=2)
+    assert report.rows == 4
+    assert report.unknown_columns == ["notes"]
+    assert report.missing_columns == []
+    assert sorted(report.errors) == [
+        (3, "depth", "", "is required"), (3, "elev", "10 ft", "doesn't match the pattern"),
+        (3, "env_medium", "soil", "doesn't match the pattern"), (3, "tillage", "plough", "not a permissible value"),
+        (4, "depth", "deep", "doesn't match the pattern"), (4, "samp_name", "s1", "is not unique")]
+    assert not report.valid
+
+    report = va.validate_tsv(plan, io.StringIO("samp_name\ttillage\ns1\tdrill\n"), package="soil")
+    assert report.missing_columns == ["depth"]
+    assert report.error_count == 0 and not report.valid
+
+
+def test_becli_validate(tmp_path):
+    (tmp_path / "iot.yaml").write_text(yaml.safe_dump(schema))
+    (tmp_path / "good.tsv").write_text("samp_name\tdepth\ns1\t1 m\ns2\t2 m\n")
+    (tmp_path / "bad.tsv").write_text("samp_name\tdepth\ns1\t1 m\ns1\t2 m\n")
+    runner = CliRunner()
+    base = ["validate", "--yamlout", str(tmp_path / "iot.yaml"), "--package", "soil"]
+    result = runner.invoke(cli, base + [str(tmp_path / "good.tsv")])
+    assert result.exit_code == 0, result.output
+    assert "2 rows, 0 invalid values" in result.output
+    result = runner.invoke(cli, base + [str(tmp_path / "bad.tsv")])
+    assert result.exit_code == 1
+    assert "'s1' is not unique" in result.output
@@ -0,0 +1,61 @@
+import os
+
+from click.testing import CliRunner
+
+import iot_to_linkml.sheet2yaml as s2y
+import iot_to_linkml.synthetic as sy
+from iot_to_linkml.becli import cli
+from iot_to_linkml.watch import Watcher
+
+
+def test_watcher_regenerates_after_changes_settle(tmp_path, monkeypatch, clock, write_sheet):
+    monkeypatch.chdir(tmp_path)
+    mixs_path = sy.write_mixs_schema(str(tmp_path / "mixs"), slot_count=20, enum_count=2)
+    sheet_path = str(tmp_path / "sheet.json")
+    write_sheet(sheet_path, 30)
+    yamlout = str(tmp_path / "iot.yaml")
+
+    session = s2y.SheetSession(cache_dir=str(tmp_path / "cache"), sheet_service=s2y.LocalSheetService(sheet_path))
+    fetches = []
+    get_iot_tabs = session.get_iot_tabs
+    monkeypatch.setattr(session, "get_iot_tabs", lambda: fetches.append(1) or get_iot_tabs())
+    watcher = Watcher(session, mixs_path, yamlout, cache_dir=str(tmp_path / "cache"), debounce=5, clock=clock)
+
+    assert watcher.poll()
+    assert not watcher.poll()
+    first = open(yamlout).read()
+
+    write_sheet(sheet_path, 40)
+    assert not watcher.poll()
+    clock.now += 3
+    assert not watcher.poll()
+    clock.now += 3
+    assert watcher.poll()
+    assert open(yamlout).read() != first
+    assert (watcher.builds, len(fetches)) == (2, 2)
+
+    # touching the MIxS sources without changing them doesn't count as a change
+    os.utime(mixs_path, ns=(1, 1))
+    assert not watcher.poll()
+
+    with open(mixs_path, "a") as mixs_file:
+        mixs_file.write("description: changed\n")
+    assert not watcher.poll()
+    clock.now += 6
+    assert watcher.poll()
+    # a MIxS-only change reuses the tabs already in memory
+    assert (watcher.builds, len(fetches)) == (3, 2)
+
+
+def test_make_from_sheet_file(tmp_path, monkeypatch, write_sheet):
+    monkeypatch.chdir(tmp_path)
+    mixs_path = sy.write_mixs_schema(str(tmp_path / "mixs"), slot_count=20, enum_count=2)
+    write_sheet(str(tmp_path / "sheet.json"), 30)
+    result = CliRunner().invoke(cli, ["--mixs", mixs_path, "--sheet-file", "sheet.json", "--cred", "missing.json"])
+    assert result.exit_code == 0, result.output
+    assert "wrote iot.yaml" in result.output
+    # the file's snapshots are its own, and aren't taken for the spreadsheet's when working offline
+    result = CliRunner().invoke(cli, ["--mixs", mixs_path, "--offline", "--cred", "missing.json"])
+    assert result.exit_code != 0 and "No cached snapshot" in str(result.exception)
+    result = CliRunner().invoke(cli, ["--mixs", mixs_path, "--sheet-file", "sheet.json", "--offline"])
+    assert result.exit_code == 0, result.output
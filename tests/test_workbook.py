@@ -0,0 +1,78 @@
+import zipfile
+
+from click.testing import CliRunner
+
+import iot_to_linkml.sheet2yaml as s2y
+import iot_to_linkml.synthetic as sy
+import iot_to_linkml.workbook as wb
+from iot_to_linkml.becli import cli
+
+ods_content = """<?xml version="1.0" encoding="UTF-8"?>
+<office:document-content xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0"
+    xmlns:table="urn:oasis:names:tc:opendocument:xmlns:table:1.0"
+    xmlns:text="urn:oasis:names:tc:opendocument:xmlns:text:1.0">
+<office:body><office:spreadsheet>
+<table:table table:name="Other"><table:table-row><table:table-cell><text:p>skip</text:p></table:table-cell>
+</table:table-row></table:table>
+<table:table table:name="Controlled Terms">
+<table:table-row>
+  <table:table-cell><text:p>tillage</text:p></table:table-cell>
+  <table:table-cell table:number-columns-repeated="26"/>
+  <table:table-cell><text:p>past<text:s text:c="2"/>column <text:span>Z</text:span></text:p></table:table-cell>
+  <table:table-cell table:number-columns-repeated="16000"/>
+</table:table-row>
+<table:table-row><table:table-cell><text:p>drill</text:p></table:table-cell></table:table-row>
+<table:table-row table:number-rows-repeated="2"><table:table-cell table:number-columns-repeated="1024"/>
+</table:table-row>
+<table:table-row table:number-rows-repeated="2"><table:table-cell><text:p>cutting disc</text:p></table:table-cell>
+</table:table-row>
+<table:table-row table:number-rows-repeated="1048000"><table:table-cell table:number-columns-repeated="1024"/>
+</table:table-row>
+</table:table>
+</office:spreadsheet></office:body></office:document-content>
+"""
+
+
+def trimmed(rows):
+    return list(wb.trim_rows((list(row), 1) for row in rows))
+
+
+def write_xlsx(path, tabs):
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    for range_name, tab in tabs.items():
+        sheet = workbook.create_sheet(wb.sheet_name(range_name))
+        for row in tab["values"]:
+            sheet.append(row)
+    workbook.save(path)
+
+
+def test_read_ods(tmp_path):
+    path = str(tmp_path / "iot.ods")
+    with zipfile.ZipFile(path, "w") as ods_zip:
+        ods_zip.writestr("content.xml", ods_content)
+    service = wb.WorkbookSheetService(path)
+    values = service.values().get(spreadsheetId="x", range=s2y.CV_RANGE_NAME).execute()["values"]
+    # nothing is cut off at column Z, and the empty rows at the bottom of the sheet are dropped
+    assert values == [["tillage"] + [""] * 26 + ["past  column Z"], ["drill"], [], [], ["cutting disc"],
+                      ["cutting disc"]]
+
+
+def test_make_from_workbook(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    mixs_path = sy.write_mixs_schema(str(tmp_path / "mixs"), slot_count=20, enum_count=2)
+    tabs = sy.make_tabs(terms=30, packages=3, mixs_slot_count=20)
+    write_xlsx("iot.xlsx", tabs)
+    service = wb.WorkbookSheetService("iot.xlsx")
+    value_ranges = service.values().batchGet(spreadsheetId="x", ranges=list(tabs)).execute()["valueRanges"]
+    assert [value_range["values"] for value_range in value_ranges] == [trimmed(tab["values"]) for tab in tabs.values()]
+
+    sheet_session = s2y.SheetSession(revision="rev1", sheet_service=sy.FakeSheetService(tabs))
+    workbook_session = s2y.SheetSession(sheet_service=service)
+    for sheet_tab, workbook_tab in zip(sheet_session.get_iot_tabs(), workbook_session.get_iot_tabs()):
+        assert s2y.tab_to_records(workbook_tab) == s2y.tab_to_records(sheet_tab)
+
+    result = CliRunner().invoke(cli, ["--mixs", mixs_path, "--workbook", "iot.xlsx", "--cred", "missing.json"])
+    assert result.exit_code == 0, result.output
+    assert "wrote iot.yaml" in result.output